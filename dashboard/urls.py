@@ -23,6 +23,7 @@ urlpatterns = [
     path("sesiones/<int:pk>/", views.sesion_evaluacion_detalle, name="sesion_detalle"),
     path("api/mis-sesiones/", views.api_mis_sesiones, name="api_mis_sesiones"),
     path("evaluacion/<int:cuestionario_id>/", views.responder_evaluacion, name="responder_evaluacion"),
+    path("api/sesion/<int:sesion_id>/autoguardar/", views.api_autoguardar_respuestas, name="api_autoguardar_respuestas"),
 
     # Psicólogo (TRIAGE)
     path("api/psico/sesiones/", views.api_psico_sesiones, name="api_psico_sesiones"),
@@ -44,10 +45,14 @@ urlpatterns = [
     path('api/scoring/profile/<int:profile_id>/rule/<int:rule_id>/delete/', views.api_scoring_rule_delete, name='api_scoring_rule_delete'),
     path('api/scoring/preview/', views.api_scoring_preview, name='api_scoring_preview'),
     path('api/scoring/apply/', views.api_scoring_apply, name='api_scoring_apply'),
+    path('api/scoring/apply/bulk/', views.api_scoring_apply_bulk, name='api_scoring_apply_bulk'),
+    path('api/scoring/trabajo/<int:trabajo_id>/', views.api_scoring_trabajo, name='api_scoring_trabajo'),
+    path('api/scoring/simular/', views.api_scoring_simular, name='api_scoring_simular'),
     path('api/scoring/quick-spec/<int:cuestionario_id>/', views.api_scoring_quick_spec, name='api_scoring_quick_spec'),
 
     path('admin/calificaciones/', v.calificaciones_list, name='admin_calificaciones'),
     path('admin/calificaciones/<int:pk>/', v.calificacion_detalle, name='admin_calificacion_detalle'),
+    path('admin/calificaciones/export.csv', v.calificaciones_export_csv, name='admin_calificaciones_export_csv'),
     path(
         'admin/cuestionarios/export/full/',
         views.export_full_database,
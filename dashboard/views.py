@@ -25,6 +25,7 @@ from django.contrib.auth import logout
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.utils.timezone import localdate, localtime
 from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from forms.models import SesionEvaluacion, Perfil
@@ -40,7 +41,6 @@ from resultados.services import (
 from forms.models import (
     CalificacionSesion,
     Cuestionario,
-    Opcion,
     Perfil,
     Pregunta,
     ReporteEvaluacion,
@@ -48,11 +48,25 @@ from forms.models import (
     ScoringProfile,
     ScoringRule,
     SesionEvaluacion,
+    TrabajoScoring,
     Usuario,
 )
 from forms.services.scoring import compute_auto_sum_for_session
+from forms.services.scoring_bulk import algoritmo_auto, perfil_auto
+from forms.services.preguntas import CACHE_SECONDS as PREGUNTAS_CACHE_SECONDS
+from forms.services.preguntas import clave_render, preguntas_para_responder
+from forms.services.respuestas import (
+    autoguardar_respuestas,
+    guardar_respuestas,
+    preguntas_faltantes,
+    respuestas_de_sesion,
+    valores_guardados,
+    valores_post,
+)
+from forms.services.scoring_plan import compactar_detalle, get_scoring_plan
+from forms.services.scoring_rules import get_rule_plan, score_profile_for_session
+from forms.services.simulacion import simular_scoring
 from forms.utils import asignar_sesion_a
-from forms.services.scoring import compute_score_for_session
 
 logger = logging.getLogger(__name__)
 
@@ -73,19 +87,6 @@ def _is_psico_or_admin(u):
     return u.is_authenticated and (u.is_superuser or rol in {'ADMIN','PSICOLOGO'})
 
 
-def _norm_tipo(tipo: str) -> str:
-    t = (tipo or "").upper().strip()
-    MAP = {
-        "OPCION": "OPCION_UNICA",
-        "RADIO": "OPCION_UNICA",
-        "CHECKBOX": "OPCION_MULTIPLE",
-        "LIKERT": "ESCALA",
-        "ESCALA_NUMERICA": "ESCALA",
-        "ESCALA NUMERICA": "ESCALA",
-    }
-    return MAP.get(t, t)
-
-
 # ===== Vistas de panel =====
 @login_required
 @user_passes_test(_is_app_admin)
@@ -359,26 +360,8 @@ def responder_evaluacion(request, cuestionario_id):
         activo=True,
     )
 
-    # 3) Preguntas
-    preguntas = list(
-        cuestionario.preguntas
-        .prefetch_related("opciones")
-        .order_by("orden")
-    )
-
-    # 4) Normalizar config
-    for p in preguntas:
-        cfg = getattr(p, "config", None) or {}
-        if isinstance(cfg, str):
-            try:
-                p.config = json.loads(cfg) if cfg.strip() else {}
-            except Exception:
-                try:
-                    p.config = ast.literal_eval(cfg)
-                except Exception:
-                    p.config = {}
-        if not isinstance(p.config, dict):
-            p.config = {}
+    # 3-4) Preguntas con opciones y config normalizado (cacheadas por cuestionario/version)
+    preguntas = preguntas_para_responder(cuestionario)
 
     # 5) Ya completado
     if SesionEvaluacion.objects.filter(
@@ -420,135 +403,53 @@ def responder_evaluacion(request, cuestionario_id):
             estado="PENDIENTE",
         )
 
+    # Lo ya autoguardado: se combina con el POST y precarga el formulario
+    guardadas = respuestas_de_sesion(sesion)
+
+    contexto = {
+        "sesion": sesion,
+        "preguntas": preguntas,
+        # Llave y vigencia del {% cache %} del bloque de preguntas
+        "render_clave": clave_render(cuestionario),
+        "render_segundos": PREGUNTAS_CACHE_SECONDS,
+        "respuestas_guardadas": valores_guardados(preguntas, guardadas),
+    }
+
     # =========================
     # 7) POST
     # =========================
     if request.method == "POST":
 
         # 🔥 LIMPIEZA REAL DEL POST
-        raw_post = dict(request.POST)
-        clean_post = {}
-
-        for key, values in raw_post.items():
-            if not key.startswith("preg_"):
-                continue
-            cleaned = [v for v in values if v not in ("", None)]
-            if cleaned:
-                clean_post[key] = cleaned
+        # Con las vacías: lo que el estudiante limpió borra lo autoguardado
+        clean_post = valores_post(request.POST, con_vacios=True)
 
         print("🧼 POST LIMPIO:", clean_post)
 
-        # 7.1 Validación
-        faltantes = []
-
-        for pregunta in preguntas:
-            if not pregunta.requerido:
-                continue
-
-            tipo = _norm_tipo(pregunta.tipo_respuesta)
-            name = f"preg_{pregunta.id}"
-
-            if tipo in ("OPCION_UNICA", "ESCALA", "SI_NO"):
-                if name not in clean_post:
-                    faltantes.append(pregunta.orden)
-
-            elif tipo == "OPCION_MULTIPLE":
-                if name not in clean_post or len(clean_post[name]) == 0:
-                    faltantes.append(pregunta.orden)
-
-            elif tipo == "TEXTO":
-                if name not in clean_post or not clean_post[name][0].strip():
-                    faltantes.append(pregunta.orden)
-
-            elif tipo == "NUMERICA":
-                if name not in clean_post:
-                    faltantes.append(pregunta.orden)
-                else:
-                    try:
-                        float(clean_post[name][0])
-                    except ValueError:
-                        faltantes.append(pregunta.orden)
+        # 7.1 Validación (en memoria, sobre lo autoguardado + el POST; también
+        # garantiza que la sesión puede completarse)
+        enviado = {**contexto["respuestas_guardadas"], **clean_post}
+        faltantes = [p.orden for p in preguntas_faltantes(preguntas, enviado)]
 
         if faltantes:
             messages.error(
                 request,
                 "Faltan preguntas obligatorias: " + ", ".join(map(str, sorted(faltantes))),
             )
-            return render(
-                request,
-                "dashboard/responder_cuestionario.html",
-                {"sesion": sesion, "preguntas": preguntas},
-            )
+            return render(request, "dashboard/responder_cuestionario.html", contexto)
 
         # 7.2 Guardado
         try:
             with transaction.atomic():
-                for pregunta in preguntas:
-                    tipo = _norm_tipo(pregunta.tipo_respuesta)
-                    name = f"preg_{pregunta.id}"
-
-                    if name not in clean_post:
-                        continue
-
-                    defaults = {
-                        "opcion_seleccionada": None,
-                        "valor_numerico": None,
-                        "valor_texto": None,
-                        "opciones_multiple": [],
-                    }
-
-                    if tipo == "OPCION_UNICA":
-                        val = clean_post[name][0]
-                        opcion = Opcion.objects.filter(pk=val, pregunta=pregunta).first()
-                        if opcion:
-                            defaults["opcion_seleccionada"] = opcion
-                            defaults["valor_texto"] = opcion.texto
-                            try:
-                                defaults["valor_numerico"] = float(opcion.valor)
-                            except Exception:
-                                pass
-
-                    elif tipo == "OPCION_MULTIPLE":
-                        defaults["opciones_multiple"] = clean_post[name]
-
-                    elif tipo in ("TEXTO", "SI_NO"):
-                        defaults["valor_texto"] = clean_post[name][0].strip()
-
-                    elif tipo in ("NUMERICA", "ESCALA"):
-                        try:
-                            defaults["valor_numerico"] = float(clean_post[name][0])
-                        except Exception:
-                            pass
-
-                    Respuesta.objects.update_or_create(
-                        sesion=sesion,
-                        pregunta=pregunta,
-                        defaults=defaults,
-                    )
-
-                if not sesion.puede_completarse():
-                    raise ValueError("La sesión no tiene respuestas suficientes.")
+                # Solo lo que difiere de lo autoguardado, en un solo upsert
+                guardar_respuestas(sesion, preguntas, clean_post, guardadas)
 
                 sesion.estado = "COMPLETADA"
                 sesion.fecha_fin = timezone.now()
+                # CALIFICACIÓN + PREDICCIÓN: la señal post_save encola la tarea
+                # durable resultados.tasks.post_envio (corre tras el commit)
                 sesion.save(update_fields=["estado", "fecha_fin"])
 
-                # ============================
-                # 🔥 CALCULAR CALIFICACIÓN AUTOMÁTICA
-                # ============================
-
-                total, detalle = compute_score_for_session(sesion)
-
-                CalificacionSesion.objects.update_or_create(
-                    sesion=sesion,
-                    profile=None,  # scoring automático por config
-                    defaults={
-                        "total": total,
-                        "detalle": detalle
-                    }
-                )
-
-
             messages.success(request, "Cuestionario enviado correctamente.")
             return redirect("dashboard:dashboard")
 
@@ -561,11 +462,37 @@ def responder_evaluacion(request, cuestionario_id):
         sesion.estado = "EN_CURSO"
         sesion.save(update_fields=["estado"])
 
-    return render(
-        request,
-        "dashboard/responder_cuestionario.html",
-        {"sesion": sesion, "preguntas": preguntas},
+    return render(request, "dashboard/responder_cuestionario.html", contexto)
+
+
+@login_required
+@user_passes_test(_is_student)
+@require_POST
+def api_autoguardar_respuestas(request, sesion_id):
+    """
+    Autoguardado de una sesión abierta. Recibe solo los preg_<id> que cambiaron
+    (form-encoded; vacío = respuesta borrada) y escribe solo esos.
+    """
+    sesion = (
+        SesionEvaluacion.objects
+        .select_related("cuestionario")
+        .filter(
+            pk=sesion_id,
+            estudiante__usuario=request.user,
+            estado__in=["PENDIENTE", "EN_CURSO"],
+        )
+        .first()
     )
+    if sesion is None:
+        return JsonResponse({"ok": False, "error": "Sesión no encontrada o ya cerrada"}, status=404)
+
+    cambios = valores_post(request.POST, con_vacios=True)
+    if not cambios:
+        return JsonResponse({"ok": True, "guardadas": 0, "borradas": 0})
+
+    preguntas = preguntas_para_responder(sesion.cuestionario)
+    guardadas, borradas = autoguardar_respuestas(sesion, preguntas, cambios)
+    return JsonResponse({"ok": True, "guardadas": guardadas, "borradas": borradas})
 
 
 @login_required
@@ -1019,8 +946,8 @@ from django.http import HttpResponseForbidden
 from django.shortcuts import get_object_or_404, render
 from resultados.services import build_ml_explanation
 from resultados.models import PrediccionRiesgo
-from resultados.services import actualizar_prediccion_estudiante  # <-- IMPORTANTE
 from resultados.services import score_summary_for_session
+from resultados.tasks import encolar_scoring_bulk, programar_recalculo
 
 
 @login_required
@@ -1083,34 +1010,41 @@ def psico_sesion_detalle(request, pk):
     ml_ready, nreq, nreq_total = ml_ready_for_estudiante(s.estudiante)
 
     ml = None
+    ml_pendiente = False
     ml_explanation = []
     ml_narrative = ""
     ml_chart = ""
 
     if ml_ready:
+        # La predicción se recalcula al completar la sesión (resultados.signals);
+        # aquí solo se lee, nunca se corre inferencia en el request.
         pred = PrediccionRiesgo.objects.filter(estudiante=s.estudiante).first()
 
-        if pred is None or pred.nivel == "SIN_DATOS" or pred.probabilidad is None:
-            pred = actualizar_prediccion_estudiante(s.estudiante)
-
-        if pred and pred.probabilidad is not None and pred.nivel != "SIN_DATOS":
-
-            ml_data = build_ml_explanation(pred)
+        desactualizada = (
+            pred is None
+            or (s.fecha_fin is not None and pred.actualizado < s.fecha_fin)
+        )
+        if desactualizada:
+            # Datos previos al recálculo por eventos: se agenda en segundo plano
+            ml_pendiente = True
+            programar_recalculo(s.estudiante_id)
+        elif pred.nivel != "SIN_DATOS" and pred.probabilidad is not None:
+            ml_data = {}
             try:
                 ml_data = build_ml_explanation(pred)
             except Exception as e:
-                print("ML explanation error:", e)
-
-        ml = {
-            "nivel": pred.nivel.upper(),
-            "probabilidad": float(pred.probabilidad) * 100,
-            "actualizado": pred.actualizado,
-            "modelo_version": pred.modelo_version,
-            "risk_factors": ml_data.get("risk_factors", []),
-            "protective_factors": ml_data.get("protective_factors", []),
-            "narrative": ml_data.get("narrative", ""),
-            "recommendation": ml_data.get("recommendation", ""),
-        }
+                logger.exception("ML explanation error: %s", e)
+
+            ml = {
+                "nivel": pred.nivel.upper(),
+                "probabilidad": float(pred.probabilidad) * 100,
+                "actualizado": pred.actualizado,
+                "modelo_version": pred.modelo_version,
+                "risk_factors": ml_data.get("risk_factors", []),
+                "protective_factors": ml_data.get("protective_factors", []),
+                "narrative": ml_data.get("narrative", ""),
+                "recommendation": ml_data.get("recommendation", ""),
+            }
 
 
     context = {
@@ -1125,6 +1059,7 @@ def psico_sesion_detalle(request, pk):
         "required_total": nreq_total,
 
         "ml": ml,
+        "ml_pendiente": ml_pendiente,
         "ml_explanation": ml_explanation,
         "ml_narrative": ml_narrative,
         "ml_chart": ml_chart,
@@ -1558,8 +1493,11 @@ def api_scoring_rule_upsert(request, profile_id):
     }
 
     if rid:
-        ScoringRule.objects.filter(profile=prof, pk=rid).update(**fields)
-        rule = ScoringRule.objects.get(profile=prof, pk=rid)
+        # save() (no .update()) para que corran las señales: cache de reglas y recalificación
+        rule = get_object_or_404(ScoringRule, profile=prof, pk=rid)
+        for k, v in fields.items():
+            setattr(rule, k, v)
+        rule.save()
     else:
         rule = ScoringRule.objects.create(profile=prof, **fields)
 
@@ -1596,7 +1534,7 @@ def api_scoring_preview(request):
     """
     Acepta:
       - mode='AUTO'  -> usa auto-suma sin perfiles
-      - mode='PROFILE' + profile_id -> usa tu lógica actual (si la mantienes)
+      - mode='PROFILE' + profile_id -> evalúa las ScoringRule del perfil
     """
     try:
         body = json.loads(request.body.decode() or "{}")
@@ -1618,10 +1556,35 @@ def api_scoring_preview(request):
         total, breakdown = compute_auto_sum_for_session(sesion)
         return JsonResponse({"ok": True, "mode": "AUTO", "total": total, "breakdown": breakdown})
 
-    # Si aún quisieras soportar “PROFILE”, deja tu bloque de perfiles aquí…
+    if mode == "PROFILE":
+        prof, error = _scoring_profile_de_sesion(body, sesion)
+        if error:
+            return error
+        total, breakdown = score_profile_for_session(prof, sesion)
+        return JsonResponse({"ok": True, "mode": "PROFILE", "total": total, "breakdown": breakdown})
+
     return JsonResponse({"ok": False, "error": "Modo no soportado"}, status=400)
 
 
+def _scoring_profile_de_sesion(body, sesion):
+    """(perfil, None) o (None, JsonResponse de error) para mode='PROFILE'."""
+    try:
+        profile_id = int(body.get("profile_id") or 0)
+    except (TypeError, ValueError):
+        profile_id = 0
+    if not profile_id:
+        return None, JsonResponse({"ok": False, "error": "profile_id requerido"}, status=400)
+
+    prof = ScoringProfile.objects.filter(pk=profile_id).first()
+    if prof is None:
+        return None, JsonResponse({"ok": False, "error": "Perfil inexistente"}, status=404)
+    if prof.cuestionario_id != sesion.cuestionario_id:
+        return None, JsonResponse(
+            {"ok": False, "error": "El perfil no corresponde al cuestionario de la sesión"}, status=400
+        )
+    return prof, None
+
+
 @login_required
 @user_passes_test(_is_app_admin)
 @require_POST
@@ -1642,28 +1605,36 @@ def api_scoring_apply(request):
     except SesionEvaluacion.DoesNotExist:
         return JsonResponse({"ok": False, "error": "Sesión inexistente"}, status=404)
 
+    mode = (body.get("mode") or "AUTO").upper()
+    if mode == "PROFILE":
+        prof, error = _scoring_profile_de_sesion(body, sesion)
+        if error:
+            return error
+        total, breakdown = score_profile_for_session(prof, sesion)
+        cal, _created = CalificacionSesion.objects.update_or_create(
+            sesion=sesion,
+            profile=prof,
+            defaults={"total": float(total), "detalle": breakdown, "config_hash": get_rule_plan(prof).firma},
+        )
+        detail_url = reverse('dashboard:admin_calificacion_detalle', args=[cal.pk])
+        return JsonResponse({"ok": True, "mode": "PROFILE", "total": total, "id": cal.pk, "detail_url": detail_url})
+    if mode != "AUTO":
+        return JsonResponse({"ok": False, "error": "Modo no soportado"}, status=400)
+
     total, breakdown = compute_auto_sum_for_session(sesion)
 
     # 👇 PERFIL AUTO por cuestionario (obligatorio porque CalificacionSesion.profile es requerido)
-    auto_name = "Auto (SUM/AVG)"
-    auto_alg = breakdown.get('scheme', {}).get('mode', 'SUM')  # para dejar rastro del modo vigente
-    profile_auto, _ = ScoringProfile.objects.get_or_create(
-        cuestionario=sesion.cuestionario,
-        nombre=auto_name,
-        defaults={'activo': True, 'algoritmo': auto_alg}
-    )
-    # Si ya existía, actualiza algoritmo por si cambió SUM/AVG en el esquema
-    if profile_auto.algoritmo != auto_alg:
-        profile_auto.algoritmo = auto_alg
-        profile_auto.save(update_fields=['algoritmo'])
+    profile_auto = perfil_auto(sesion.cuestionario, algoritmo_auto(breakdown))
 
     # Guarda/actualiza calificación (cumple unique_together (sesion, profile))
+    plan = get_scoring_plan(sesion.cuestionario)
     cal, _created = CalificacionSesion.objects.update_or_create(
         sesion=sesion,
         profile=profile_auto,
         defaults={
             "total": float(total),
-            "detalle": {"mode": "AUTO", **breakdown},
+            "detalle": compactar_detalle({"mode": "AUTO", **breakdown}, plan),
+            "config_hash": plan.hash_scoring,
         }
     )
 
@@ -1671,6 +1642,129 @@ def api_scoring_apply(request):
     return JsonResponse({"ok": True, "mode": "AUTO", "total": total, "id": cal.pk, "detail_url": detail_url})
 
 
+@login_required
+@user_passes_test(_is_app_admin)
+@require_POST
+def api_scoring_apply_bulk(request):
+    """
+    Califica en segundo plano todas las sesiones de un filtro.
+    Body: {cuestionario_id?, estado? (default COMPLETADA), fecha_desde?, fecha_hasta?,
+           mode? ('AUTO' | 'PROFILE'), profile_id?}
+    Responde con el id del TrabajoScoring para consultar el avance.
+    """
+    try:
+        body = json.loads(request.body.decode() or "{}")
+    except Exception:
+        body = request.POST
+
+    mode = (body.get("mode") or "AUTO").upper()
+    if mode not in ("AUTO", "PROFILE"):
+        return JsonResponse({"ok": False, "error": "Modo no soportado"}, status=400)
+
+    try:
+        cuestionario_id = int(body.get("cuestionario_id") or 0) or None
+    except (TypeError, ValueError):
+        return JsonResponse({"ok": False, "error": "cuestionario_id inválido"}, status=400)
+
+    filtros = {
+        "estado": body.get("estado", "COMPLETADA") or None,
+        "fecha_desde": body.get("fecha_desde") or None,
+        "fecha_hasta": body.get("fecha_hasta") or None,
+    }
+    for k in ("fecha_desde", "fecha_hasta"):
+        if filtros[k] and parse_date(str(filtros[k])) is None:
+            return JsonResponse({"ok": False, "error": f"{k} debe ser YYYY-MM-DD"}, status=400)
+
+    profile = None
+    if mode == "PROFILE":
+        profile = ScoringProfile.objects.filter(pk=body.get("profile_id") or 0).first()
+        if profile is None:
+            return JsonResponse({"ok": False, "error": "Perfil inexistente"}, status=404)
+        if cuestionario_id and cuestionario_id != profile.cuestionario_id:
+            return JsonResponse(
+                {"ok": False, "error": "El perfil no corresponde al cuestionario"}, status=400
+            )
+        cuestionario_id = profile.cuestionario_id
+
+    if not cuestionario_id and not (filtros["fecha_desde"] or filtros["fecha_hasta"]):
+        return JsonResponse(
+            {"ok": False, "error": "Indica cuestionario_id o un rango de fechas"}, status=400
+        )
+    if cuestionario_id and not Cuestionario.objects.filter(pk=cuestionario_id).exists():
+        return JsonResponse({"ok": False, "error": "Cuestionario inexistente"}, status=404)
+
+    trabajo = TrabajoScoring.objects.create(
+        cuestionario_id=cuestionario_id,
+        profile=profile,
+        modo=mode,
+        filtros=filtros,
+        creado_por=request.user,
+    )
+    encolar_scoring_bulk(trabajo.pk)
+
+    return JsonResponse({
+        "ok": True,
+        "trabajo_id": trabajo.pk,
+        "status_url": reverse('dashboard:api_scoring_trabajo', args=[trabajo.pk]),
+    }, status=202)
+
+
+@login_required
+@user_passes_test(_is_app_admin)
+@require_GET
+def api_scoring_trabajo(request, trabajo_id):
+    t = get_object_or_404(TrabajoScoring, pk=trabajo_id)
+    return JsonResponse({
+        "ok": True,
+        "id": t.pk,
+        "estado": t.estado,
+        "modo": t.modo,
+        "total": t.total,
+        "procesados": t.procesados,
+        "creados": t.creados,
+        "actualizados": t.actualizados,
+        "progreso": round(t.progreso, 4),
+        "segundos": t.segundos,
+        "sesiones_por_segundo": (t.procesados / t.segundos) if t.segundos else None,
+        "error": t.error or None,
+    })
+
+
+@login_required
+@user_passes_test(_is_app_admin)
+@require_POST
+def api_scoring_simular(request):
+    """
+    Simula un esquema candidato sobre las sesiones COMPLETADAS sin guardar nada.
+    Body: {cuestionario_id, scoring?: {mode, bands...}, preguntas?: {pregunta_id: {reverse, min, max, ...}}}
+    """
+    try:
+        body = json.loads(request.body.decode() or "{}")
+    except Exception:
+        return JsonResponse({"ok": False, "error": "JSON inválido"}, status=400)
+
+    scoring = body.get("scoring")
+    preguntas = body.get("preguntas") or {}
+    if scoring is not None and not isinstance(scoring, dict):
+        return JsonResponse({"ok": False, "error": "scoring debe ser un objeto JSON"}, status=400)
+    if not isinstance(preguntas, dict) or not all(
+        str(k).isdigit() and isinstance(v, dict) for k, v in preguntas.items()
+    ):
+        return JsonResponse({"ok": False, "error": "preguntas debe ser {pregunta_id: {config}}"}, status=400)
+
+    try:
+        cu = Cuestionario.objects.get(pk=int(body.get("cuestionario_id") or 0))
+    except (TypeError, ValueError, Cuestionario.DoesNotExist):
+        return JsonResponse({"ok": False, "error": "Cuestionario inexistente"}, status=404)
+
+    try:
+        resultado = simular_scoring(cu, scoring=scoring, preguntas=preguntas)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({"ok": False, "error": f"Configuración inválida: {e}"}, status=400)
+
+    return JsonResponse({"ok": True, **resultado})
+
+
 @login_required
 @user_passes_test(_is_app_admin)
 def calificaciones_list(request):
@@ -4,7 +4,7 @@ from django.utils import timezone
 from .models import (
     Cuestionario, Pregunta, Opcion,
     SesionEvaluacion, Respuesta, ReporteEvaluacion,
-    Usuario, Perfil
+    Usuario, Perfil, TrabajoScoring
 )
 
 class OpcionInline(admin.TabularInline):
@@ -154,3 +154,10 @@ admin.site.register(Respuesta)
 admin.site.register(ReporteEvaluacion)
 admin.site.register(Usuario)
 admin.site.register(Perfil)
+
+
+@admin.register(TrabajoScoring)
+class TrabajoScoringAdmin(admin.ModelAdmin):
+    list_display = ('id','modo','cuestionario','estado','procesados','total','creados','actualizados','segundos','creado')
+    list_filter = ('estado','modo')
+    readonly_fields = ('total','procesados','creados','actualizados','segundos','error','iniciado','terminado')
@@ -8,4 +8,13 @@ class FormsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "forms"     # ruta del módulo
     label = "forms"         # 🔴 app label visible para Django (migraciones/FKs)
-    verbose_name = "Forms (Cuestionarios y Evaluación)"
\ No newline at end of file
+    verbose_name = "Forms (Cuestionarios y Evaluación)"
+
+    def ready(self):
+        # Invalida los caches (planes de calificación, reglas, valores de opciones,
+        # preguntas para responder) al editar y agenda la recalificación de las CalificacionSesion afectadas
+        import forms.services.scoring_plan  # noqa: F401
+        import forms.services.scoring_rules  # noqa: F401
+        import forms.services.recalificacion  # noqa: F401
+        import forms.services.opciones  # noqa: F401
+        import forms.services.preguntas  # noqa: F401
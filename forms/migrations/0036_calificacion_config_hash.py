@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0035_trabajoscoring'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calificacionsesion',
+            name='config_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=40),
+        ),
+    ]
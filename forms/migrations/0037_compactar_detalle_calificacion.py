@@ -0,0 +1,140 @@
+# Compacta CalificacionSesion.detalle de la auto-suma: por_pregunta -> arreglos
+# de valores (ver forms.services.scoring_plan.compactar_detalle). Los metadatos
+# por pregunta se rearman al leer con el plan vigente (CalificacionSesion.desglose),
+# así que solo se compactan las filas cuyos metadatos guardados (tipo, min, max,
+# reverse, subescala) coinciden con las preguntas actuales; esas quedan con el
+# hash real del plan (en detalle["plan"] y en config_hash). Las calificadas con
+# otra configuración se dejan completas.
+
+import hashlib
+import json
+import logging
+
+from django.db import migrations
+from django.db.models import F
+
+# Copia fija del formato: la migración no debe depender del código vivo
+DETALLE_COMPACTO = 2
+CHUNK = 500
+TIPOS_SUMABLES = ("ESCALA", "SI_NO")
+
+logger = logging.getLogger(__name__)
+
+
+def _hash_scoring(scoring, items):
+    # Copia de forms.services.scoring_plan._hash_scoring
+    return hashlib.sha1(json.dumps({
+        "scoring": scoring,
+        "items": sorted(items),
+    }, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _items_vigentes(Pregunta, cuestionario_id):
+    items = []
+    for qid, tipo, cfg in Pregunta.objects.filter(cuestionario_id=cuestionario_id).values_list(
+        "id", "tipo_respuesta", "config",
+    ):
+        tipo = (tipo or "").upper()
+        if tipo not in TIPOS_SUMABLES:
+            continue
+        cfg = cfg if isinstance(cfg, dict) else {}
+        items.append((
+            qid, tipo,
+            float(cfg.get("min", 0 if tipo == "SI_NO" else 1)),
+            float(cfg.get("max", 1 if tipo == "SI_NO" else 5)),
+            bool(cfg.get("reverse", False)),
+            tipo == "SI_NO",
+            cfg.get("subscale") or None,
+        ))
+    return sorted(items)
+
+
+def _items_fila(por_pregunta):
+    """Los mismos campos, desde los metadatos guardados en la fila (None si faltan)."""
+    items = []
+    for qid, row in por_pregunta.items():
+        try:
+            tipo = row["tipo"]
+            items.append((
+                int(qid), tipo, float(row["min"]), float(row["max"]), bool(row["reverse"]),
+                tipo == "SI_NO", row.get("subscale") or None,
+            ))
+        except (KeyError, TypeError, ValueError):
+            return None
+    return sorted(items)
+
+
+def _compactar(detalle, plan_hash):
+    por_pregunta = detalle["por_pregunta"]
+    out = {k: v for k, v in detalle.items() if k not in ("por_pregunta", "nota")}
+    out["formato"] = DETALLE_COMPACTO
+    out["plan"] = plan_hash
+    out["items"] = [int(qid) for qid in por_pregunta]
+    out["valores_raw"] = [row.get("valor_raw") for row in por_pregunta.values()]
+    out["valores"] = [row.get("valor") for row in por_pregunta.values()]
+    return out
+
+
+def compactar(apps, schema_editor):
+    CalificacionSesion = apps.get_model("forms", "CalificacionSesion")
+    Cuestionario = apps.get_model("forms", "Cuestionario")
+    Pregunta = apps.get_model("forms", "Pregunta")
+
+    planes = {}  # cuestionario_id -> (items vigentes, hash)
+
+    def plan_de(cid):
+        if cid not in planes:
+            config = Cuestionario.objects.filter(pk=cid).values_list("config", flat=True).first()
+            scoring = dict(((config if isinstance(config, dict) else {}).get("scoring") or {}))
+            items = _items_vigentes(Pregunta, cid)
+            planes[cid] = (items, _hash_scoring(scoring, items))
+        return planes[cid]
+
+    antes = despues = n = conservadas = 0
+    pendientes = []
+    filas = (
+        CalificacionSesion.objects
+        .annotate(cid=F("sesion__cuestionario_id"))
+        .only("id", "detalle", "config_hash")
+        .iterator(chunk_size=CHUNK)
+    )
+    for cal in filas:
+        detalle = cal.detalle
+        if not isinstance(detalle, dict) or detalle.get("mode") == "PROFILE" or "por_pregunta" not in detalle:
+            continue
+        items, plan_hash = plan_de(cal.cid)
+        if _items_fila(detalle["por_pregunta"]) != items:
+            # Calificada con otra configuración: sus metadatos solo están en la fila
+            conservadas += 1
+            continue
+        cal.detalle = _compactar(detalle, plan_hash)
+        cal.config_hash = plan_hash
+        antes += len(json.dumps(detalle))
+        despues += len(json.dumps(cal.detalle))
+        pendientes.append(cal)
+        if len(pendientes) >= CHUNK:
+            CalificacionSesion.objects.bulk_update(pendientes, ["detalle", "config_hash"])
+            n += len(pendientes)
+            pendientes = []
+    if pendientes:
+        CalificacionSesion.objects.bulk_update(pendientes, ["detalle", "config_hash"])
+        n += len(pendientes)
+
+    if n or conservadas:
+        logger.info(
+            "CalificacionSesion.detalle: %s filas compactadas, %s -> %s bytes (%s ahorrados); "
+            "%s con otra configuración se dejan completas",
+            n, antes, despues, antes - despues, conservadas,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0036_calificacion_config_hash'),
+    ]
+
+    operations = [
+        # Hacia atrás las filas quedan compactas: rearmarlas necesita el plan del código vivo
+        migrations.RunPython(compactar, migrations.RunPython.noop),
+    ]
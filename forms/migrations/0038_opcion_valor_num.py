@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:45
+
+import math
+
+from django.db import migrations, models
+
+
+def _a_numero(valor):
+    try:
+        v = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return v if math.isfinite(v) else None
+
+
+def llenar_valor_num(apps, schema_editor):
+    Opcion = apps.get_model("forms", "Opcion")
+    opciones = list(Opcion.objects.only("id", "valor"))
+    for o in opciones:
+        o.valor_num = _a_numero(o.valor)
+    Opcion.objects.bulk_update(opciones, ["valor_num"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0037_compactar_detalle_calificacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opcion',
+            name='valor_num',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(llenar_valor_num, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,13 @@
 # forms/models.py
 import json
+import math
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator
 from django.conf import settings # 👈 Importa esto
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils.functional import cached_property
 # =====================================================
 # USUARIOS / PERFILES
 # =====================================================
@@ -268,6 +270,8 @@ class Opcion(models.Model):
     orden = models.PositiveIntegerField(default=1)
     es_otro = models.BooleanField(default=False, help_text="Marcar si esta opción habilita un campo de texto 'Otro'")
     activo = models.BooleanField(default=True)
+    # float(valor) precalculado en save(); None si valor no es numérico
+    valor_num = models.FloatField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['orden', 'id']
@@ -276,6 +280,21 @@ class Opcion(models.Model):
     def __str__(self):
         return f"{self.texto} ({self.valor})"
 
+    @staticmethod
+    def valor_a_numero(valor) -> float | None:
+        try:
+            v = float(valor)
+        except (TypeError, ValueError):
+            return None
+        return v if math.isfinite(v) else None
+
+    def save(self, *args, **kwargs):
+        self.valor_num = self.valor_a_numero(self.valor)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "valor" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "valor_num"}
+        super().save(*args, **kwargs)
+
 
 
 # =====================================================
@@ -322,9 +341,18 @@ class SesionEvaluacion(models.Model):
             models.Index(fields=['estudiante', 'estado']),
         ]
 
-    def puede_completarse(self):
+    def puede_completarse(self, preguntas=None, post=None):
+        """
+        Con `preguntas` (con opciones precargadas) y el `post` limpio se evalúa en
+        memoria (forms.services.respuestas.preguntas_faltantes); sin ellos se
+        cuenta en la BD.
+        """
         from django.db.models import Q
 
+        if preguntas is not None and post is not None:
+            from forms.services.respuestas import preguntas_faltantes
+            return not preguntas_faltantes(preguntas, post)
+
         total_requeridas = self.cuestionario.preguntas.filter(requerido=True).count()
 
         respondidas = self.respuestas.exclude(
@@ -436,6 +464,9 @@ class CalificacionSesion(models.Model):
     total    = models.FloatField(default=0.0)
     detalle  = models.JSONField(default=dict, blank=True)
     creado   = models.DateTimeField(auto_now_add=True, null=True)
+    # Hash de la configuración con la que se calculó (ScoringPlan.hash_scoring /
+    # RulePlan.firma); si no coincide con el vigente, la fila está desactualizada.
+    config_hash = models.CharField(max_length=40, blank=True, default='', db_index=True)
 
     class Meta:
         unique_together = [('sesion', 'profile')]
@@ -443,4 +474,45 @@ class CalificacionSesion(models.Model):
     def __str__(self):
         return f"Calif S{self.sesion_id} · {self.profile.nombre} = {self.total:.2f}"
 
+    @cached_property
+    def desglose(self) -> dict:
+        """detalle con por_pregunta completo (la auto-suma se guarda compacta)."""
+        from forms.services.scoring_plan import expandir_detalle
+        return expandir_detalle(self.detalle or {}, self.sesion.cuestionario)
+
+
+
 
+class TrabajoScoring(models.Model):
+    """Calificación masiva en segundo plano (ver forms.services.scoring_bulk)."""
+    ESTADOS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_CURSO', 'En curso'),
+        ('COMPLETADO', 'Completado'),
+        ('ERROR', 'Error'),
+    ]
+    cuestionario = models.ForeignKey(Cuestionario, on_delete=models.CASCADE, null=True, blank=True, related_name='trabajos_scoring')
+    profile      = models.ForeignKey(ScoringProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    modo         = models.CharField(max_length=10, choices=[('AUTO', 'Auto'), ('PROFILE', 'Perfil')], default='AUTO')
+    filtros      = models.JSONField(default=dict, blank=True)  # estado, fecha_desde, fecha_hasta
+    estado       = models.CharField(max_length=12, choices=ESTADOS, default='PENDIENTE', db_index=True)
+    total        = models.PositiveIntegerField(default=0)
+    procesados   = models.PositiveIntegerField(default=0)
+    creados      = models.PositiveIntegerField(default=0)
+    actualizados = models.PositiveIntegerField(default=0)
+    segundos     = models.FloatField(null=True, blank=True)
+    error        = models.TextField(blank=True, default='')
+    creado_por   = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    creado       = models.DateTimeField(auto_now_add=True)
+    iniciado     = models.DateTimeField(null=True, blank=True)
+    terminado    = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"Trabajo scoring #{self.pk} {self.estado} {self.procesados}/{self.total}"
+
+    @property
+    def progreso(self) -> float:
+        return (self.procesados / self.total) if self.total else (1.0 if self.estado == 'COMPLETADO' else 0.0)
@@ -1,4 +1,10 @@
 # forms/services/__init__.py
-from .scoring import compute_auto_sum_for_session
+from .scoring import compute_auto_sum_bulk, compute_auto_sum_for_session
+from .scoring_rules import score_profile_bulk, score_profile_for_session
 
-__all__ = ("compute_auto_sum_for_session",)
+__all__ = (
+    "compute_auto_sum_bulk",
+    "compute_auto_sum_for_session",
+    "score_profile_bulk",
+    "score_profile_for_session",
+)
@@ -0,0 +1,72 @@
+# forms/services/opciones.py
+"""
+Valor numérico de las opciones (Opcion.valor_num) por cuestionario.
+
+Opcion.valor es texto ("1", "H", "totalmente_de_acuerdo"); Opcion.save()
+guarda su conversión a float en valor_num. Aquí se cachea, por cuestionario,
+el mapa opcion_id -> valor_num para que los lectores de respuestas usen solo
+opcion_seleccionada_id: sin JOIN a Opcion y sin float() por fila.
+
+El mapa se relee cada PLAN_CHECK_SECONDS (1 consulta ligera) y se invalida en
+este proceso al guardar / borrar una Opcion; la misma señal invalida las
+preguntas cacheadas para responder (forms.services.preguntas).
+"""
+from __future__ import annotations
+
+import threading
+import time
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from forms.models import Opcion, Pregunta
+
+from .preguntas import invalidar_preguntas
+from .scoring_plan import PLAN_CHECK_SECONDS
+
+_lock = threading.Lock()
+_mapas: dict[int, tuple[dict[int, float], float]] = {}   # cuestionario_id -> (mapa, leido_en)
+
+
+def valores_opciones(cuestionario_id: int) -> dict[int, float]:
+    """{opcion_id: valor_num} de las opciones numéricas del cuestionario."""
+    now = time.monotonic()
+    actual = _mapas.get(cuestionario_id)
+    if actual is not None and now - actual[1] < PLAN_CHECK_SECONDS:
+        return actual[0]
+
+    mapa = dict(
+        Opcion.objects
+        .filter(pregunta__cuestionario_id=cuestionario_id, valor_num__isnull=False)
+        .values_list("id", "valor_num")
+    )
+    with _lock:
+        _mapas[cuestionario_id] = (mapa, now)
+    return mapa
+
+
+def valor_opcion(cuestionario_id: int, opcion_id: int | None) -> float | None:
+    """valor_num de la opción; solo consulta el mapa si hay opción."""
+    if opcion_id is None:
+        return None
+    return valores_opciones(cuestionario_id).get(opcion_id)
+
+
+def invalidar_opciones(cuestionario_id=None) -> None:
+    with _lock:
+        if cuestionario_id is None:
+            _mapas.clear()
+        else:
+            _mapas.pop(cuestionario_id, None)
+
+
+def limpiar_opciones() -> None:
+    invalidar_opciones()
+
+
+@receiver([post_save, post_delete], sender=Opcion)
+def _opcion_cambio(sender, instance, **kwargs):
+    # Un solo receptor para los dos caches: una consulta a Pregunta por cambio
+    cid = Pregunta.objects.filter(pk=instance.pregunta_id).values_list("cuestionario_id", flat=True).first()
+    invalidar_opciones(cid)
+    invalidar_preguntas(cid)
@@ -0,0 +1,104 @@
+# forms/services/preguntas.py
+"""
+Preguntas de un cuestionario listas para responder (responder_evaluacion).
+
+Las preguntas con sus opciones precargadas y Pregunta.config ya normalizado a
+dict se guardan en el cache de Django por (cuestionario_id, version,
+generación). La generación es un token que se renueva al guardar / borrar el
+Cuestionario (también al re-publicarlo), una Pregunta o una Opcion (esa
+señal la atiende forms.services.opciones): las entradas viejas dejan de usarse
+y expiran solas. El mismo token entra en la llave del fragmento {% cache %}
+del bloque de preguntas del template.
+
+El token vive en el cache default, así que la invalidación solo llega a todos
+los workers con un backend compartido (CACHE_URL en settings: Redis,
+Memcached o DatabaseCache). Con LocMem (por proceso, el default) cada worker
+conserva sus preguntas hasta que expiran, por eso ahí la vigencia es corta.
+"""
+from __future__ import annotations
+
+import ast
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from forms.models import Cuestionario, Pregunta
+
+_CACHES_POR_PROCESO = ("LocMemCache", "DummyCache")
+
+
+def _cache_compartido() -> bool:
+    backend = (settings.CACHES.get("default") or {}).get("BACKEND", "")
+    return not backend.endswith(_CACHES_POR_PROCESO)
+
+
+# Vigencia máxima de una entrada: con cache por proceso es lo más que otro
+# worker puede servir preguntas viejas tras una edición
+CACHE_SECONDS = getattr(settings, "RESPONDER_CACHE_SECONDS", 600 if _cache_compartido() else 30)
+
+
+def normalizar_config(cfg) -> dict:
+    """Pregunta.config como dict (acepta JSON o literal de Python en texto)."""
+    if isinstance(cfg, str):
+        try:
+            cfg = json.loads(cfg) if cfg.strip() else {}
+        except Exception:
+            try:
+                cfg = ast.literal_eval(cfg)
+            except Exception:
+                cfg = {}
+    return cfg if isinstance(cfg, dict) else {}
+
+
+def _llave_generacion(cuestionario_id) -> str:
+    return f"responder:gen:{cuestionario_id}"
+
+
+def generacion(cuestionario_id) -> str:
+    gen = cache.get(_llave_generacion(cuestionario_id))
+    if gen is None:
+        gen = uuid.uuid4().hex[:12]
+        cache.add(_llave_generacion(cuestionario_id), gen, None)
+        gen = cache.get(_llave_generacion(cuestionario_id), gen)
+    return gen
+
+
+def clave_render(cuestionario) -> str:
+    """(id, version, generación): llave del payload y del fragmento del template."""
+    return f"{cuestionario.pk}:{cuestionario.version}:{generacion(cuestionario.pk)}"
+
+
+def preguntas_para_responder(cuestionario) -> list[Pregunta]:
+    """Preguntas ordenadas, con opciones precargadas y config normalizado."""
+    llave = f"responder:preguntas:{clave_render(cuestionario)}"
+    preguntas = cache.get(llave)
+    if preguntas is None:
+        preguntas = list(
+            cuestionario.preguntas
+            .prefetch_related("opciones")
+            .order_by("orden")
+        )
+        for p in preguntas:
+            p.config = normalizar_config(p.config)
+        cache.set(llave, preguntas, CACHE_SECONDS)
+    return preguntas
+
+
+def invalidar_preguntas(cuestionario_id) -> None:
+    if cuestionario_id:
+        cache.set(_llave_generacion(cuestionario_id), uuid.uuid4().hex[:12], None)
+
+
+@receiver([post_save, post_delete], sender=Cuestionario)
+def _cuestionario_cambio(sender, instance, **kwargs):
+    invalidar_preguntas(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Pregunta)
+def _pregunta_cambio(sender, instance, **kwargs):
+    invalidar_preguntas(instance.cuestionario_id)
+
@@ -0,0 +1,162 @@
+# forms/services/recalificacion.py
+"""
+Recalificación incremental cuando cambia la configuración de un cuestionario.
+
+Cada CalificacionSesion guarda config_hash: el ScoringPlan.hash_scoring
+(auto-suma) o el RulePlan.firma (perfil con reglas) con que se calculó. Al
+guardar / borrar un Cuestionario, Pregunta, ScoringProfile o ScoringRule se
+agenda, tras el commit y en segundo plano, recalificar_desactualizadas():
+solo se recalculan las filas cuyo hash no coincide con el vigente, por chunks
+y con bulk_update.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from forms.models import CalificacionSesion, Cuestionario, Pregunta, ScoringProfile, ScoringRule
+
+from .scoring import compute_auto_sum_bulk
+from .scoring_bulk import AUTO_PROFILE_NOMBRE, CHUNK_SIZE
+from .scoring_plan import compactar_detalle, get_scoring_plan
+from .scoring_rules import get_rule_plan, score_profile_bulk
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_RECALCULO = ["total", "detalle", "config_hash"]
+
+
+def _recalcular(qs, hash_vigente: str, calificar, chunk_size: int) -> int:
+    """
+    Recalcula las filas de qs con otro hash, por chunks.
+    calificar(sesiones) devuelve una función cal -> (total, detalle).
+    """
+    pendientes = list(qs.exclude(config_hash=hash_vigente).order_by("id").values_list("id", flat=True))
+
+    for i in range(0, len(pendientes), chunk_size):
+        cals = list(
+            CalificacionSesion.objects
+            .select_related("sesion__cuestionario")
+            .filter(pk__in=pendientes[i:i + chunk_size])
+        )
+        nuevos = calificar([c.sesion for c in cals])
+        for c in cals:
+            c.total, c.detalle = nuevos(c)
+            c.config_hash = hash_vigente
+        with transaction.atomic():
+            CalificacionSesion.objects.bulk_update(cals, CAMPOS_RECALCULO)
+    return len(pendientes)
+
+
+def recalificar_desactualizadas(cuestionario_id: int, chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Recalcula las CalificacionSesion del cuestionario cuyo config_hash no es el vigente.
+    Retorna {"auto": n, "perfiles": {profile_id: n}}.
+    """
+    cu = Cuestionario.objects.filter(pk=cuestionario_id).first()
+    if cu is None:
+        return {"auto": 0, "perfiles": {}}
+
+    base = CalificacionSesion.objects.filter(sesion__cuestionario_id=cuestionario_id)
+
+    # Auto-suma: profile=None (responder_evaluacion) o el perfil "Auto (SUM/AVG)" (api_scoring_apply)
+    plan = get_scoring_plan(cu)
+
+    def auto(sesiones):
+        res = compute_auto_sum_bulk(sesiones)
+
+        def fila(cal):
+            total, breakdown = res[cal.sesion_id]
+            detalle = breakdown if cal.profile_id is None else {"mode": "AUTO", **breakdown}
+            return float(total), compactar_detalle(detalle, plan)
+        return fila
+
+    stats = {
+        "auto": _recalcular(
+            base.filter(Q(profile__isnull=True) | Q(profile__nombre=AUTO_PROFILE_NOMBRE)),
+            plan.hash_scoring, auto, chunk_size,
+        ),
+        "perfiles": {},
+    }
+
+    for profile in ScoringProfile.objects.filter(cuestionario_id=cuestionario_id).exclude(nombre=AUTO_PROFILE_NOMBRE):
+        def por_reglas(sesiones, profile=profile):
+            res = score_profile_bulk(profile, sesiones)
+            return lambda cal: (float(res[cal.sesion_id][0]), res[cal.sesion_id][1])
+
+        n = _recalcular(base.filter(profile=profile), get_rule_plan(profile).firma, por_reglas, chunk_size)
+        if n:
+            stats["perfiles"][profile.id] = n
+
+    if stats["auto"] or stats["perfiles"]:
+        logger.info("Recalificación cuestionario %s: %s", cuestionario_id, stats)
+    return stats
+
+
+# ============================================================
+# Disparo automático
+# ============================================================
+
+_lock = threading.Lock()
+_en_curso: set[int] = set()
+_repetir: set[int] = set()
+
+
+def _tarea_recalificar(cuestionario_id: int) -> None:
+    # Una sola corrida por cuestionario a la vez; los avisos que lleguen
+    # mientras corre se juntan en una repetición al final.
+    with _lock:
+        if cuestionario_id in _en_curso:
+            _repetir.add(cuestionario_id)
+            return
+        _en_curso.add(cuestionario_id)
+    try:
+        while True:
+            recalificar_desactualizadas(cuestionario_id)
+            with _lock:
+                if cuestionario_id not in _repetir:
+                    break
+                _repetir.discard(cuestionario_id)
+    finally:
+        with _lock:
+            _en_curso.discard(cuestionario_id)
+
+
+def programar_recalificacion(cuestionario_id) -> None:
+    """Agenda la recalificación incremental para después del commit actual."""
+    if not cuestionario_id:
+        return
+    from resultados.tasks import en_segundo_plano
+
+    transaction.on_commit(lambda: en_segundo_plano(_tarea_recalificar, cuestionario_id))
+
+
+@receiver(post_save, sender=Cuestionario)
+def _cuestionario_guardado(sender, instance, created, raw=False, **kwargs):
+    if not (raw or created):
+        programar_recalificacion(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Pregunta)
+def _pregunta_cambio(sender, instance, raw=False, **kwargs):
+    if not raw:
+        programar_recalificacion(instance.cuestionario_id)
+
+
+@receiver(post_save, sender=ScoringProfile)
+def _perfil_guardado(sender, instance, created, raw=False, **kwargs):
+    if not (raw or created):
+        programar_recalificacion(instance.cuestionario_id)
+
+
+@receiver([post_save, post_delete], sender=ScoringRule)
+def _regla_cambio(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cid = ScoringProfile.objects.filter(pk=instance.profile_id).values_list("cuestionario_id", flat=True).first()
+    programar_recalificacion(cid)
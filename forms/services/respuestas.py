@@ -0,0 +1,230 @@
+# forms/services/respuestas.py
+"""
+Validación y escritura de respuestas de una sesión (responder_evaluacion).
+
+Las opciones se resuelven con pregunta.opciones ya precargado
+(prefetch_related("opciones")) y todas las respuestas se guardan con un solo
+INSERT ... ON CONFLICT UPDATE (bulk_create con update_conflicts) sobre
+(sesion, pregunta), en vez de un SELECT + INSERT/UPDATE por pregunta.
+
+La completitud (preguntas_faltantes) se evalúa en memoria con las mismas
+preguntas y el mismo POST, antes de escribir: sin COUNT a la BD.
+
+Autoguardado: el navegador envía solo las preguntas que cambiaron
+(autoguardar_respuestas) y el envío final combina lo ya guardado con el POST,
+escribiendo únicamente las respuestas que difieren de lo guardado y borrando
+las que llegan vacías (el estudiante las limpió después del autoguardado).
+"""
+from __future__ import annotations
+
+from django.db import connection
+
+from forms.models import Respuesta
+
+CAMPOS_RESPUESTA = ["opcion_seleccionada", "valor_numerico", "valor_texto", "opciones_multiple"]
+
+# Alias de tipo_respuesta -> tipo canónico
+_TIPOS_ALIAS = {
+    "OPCION": "OPCION_UNICA",
+    "RADIO": "OPCION_UNICA",
+    "CHECKBOX": "OPCION_MULTIPLE",
+    "LIKERT": "ESCALA",
+    "ESCALA_NUMERICA": "ESCALA",
+    "ESCALA NUMERICA": "ESCALA",
+}
+
+
+def valores_post(data, con_vacios: bool = False) -> dict[str, list[str]]:
+    """
+    {"preg_<id>": [valores]} desde un QueryDict, sin valores vacíos. Los
+    checkbox llegan como "preg_<id>[]". Con con_vacios=True se conservan las
+    preguntas sin valores (lista vacía = el estudiante borró la respuesta).
+    """
+    out = {}
+    for key in data:
+        if not key.startswith("preg_"):
+            continue
+        valores = [v for v in data.getlist(key) if v not in ("", None)]
+        if valores or con_vacios:
+            out.setdefault(key.removesuffix("[]"), []).extend(valores)
+    return out
+
+
+def tipo_normalizado(tipo: str) -> str:
+    t = (tipo or "").upper().strip()
+    return _TIPOS_ALIAS.get(t, t)
+
+
+def _opcion_de(pregunta, valor: str):
+    # pregunta.opciones viene precargado: sin consulta por pregunta
+    return next((o for o in pregunta.opciones.all() if str(o.pk) == valor), None)
+
+
+def _es_numero(valor: str) -> bool:
+    try:
+        float(valor)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def respuesta_valida(pregunta, valores: list[str] | None) -> bool:
+    """¿Los valores enviados cuentan como respuesta a la pregunta?"""
+    if not valores:
+        return False
+    tipo = tipo_normalizado(pregunta.tipo_respuesta)
+    if tipo == "OPCION_UNICA":
+        return _opcion_de(pregunta, valores[0]) is not None
+    if tipo in ("TEXTO", "SI_NO"):
+        return bool(valores[0].strip())
+    if tipo in ("NUMERICA", "ESCALA"):
+        return _es_numero(valores[0])
+    return True
+
+
+def preguntas_faltantes(preguntas, post: dict[str, list[str]]) -> list:
+    """
+    Preguntas requeridas sin respuesta válida en `post` ({"preg_<id>": [valores]}).
+    Lista vacía = la sesión puede completarse con este envío.
+    """
+    return [
+        p for p in preguntas
+        if p.requerido and not respuesta_valida(p, post.get(f"preg_{p.id}"))
+    ]
+
+
+def respuesta_desde_post(sesion, pregunta, valores: list[str]) -> Respuesta:
+    """Respuesta (sin guardar) para los valores enviados de una pregunta."""
+    r = Respuesta(sesion=sesion, pregunta=pregunta, opciones_multiple=[])
+    tipo = tipo_normalizado(pregunta.tipo_respuesta)
+
+    if tipo == "OPCION_UNICA":
+        opcion = _opcion_de(pregunta, valores[0])
+        if opcion:
+            r.opcion_seleccionada = opcion
+            r.valor_texto = opcion.texto
+            r.valor_numerico = opcion.valor_num
+
+    elif tipo == "OPCION_MULTIPLE":
+        r.opciones_multiple = valores
+
+    elif tipo in ("TEXTO", "SI_NO"):
+        r.valor_texto = valores[0].strip()
+
+    elif tipo in ("NUMERICA", "ESCALA"):
+        try:
+            r.valor_numerico = float(valores[0])
+        except (TypeError, ValueError):
+            pass
+
+    return r
+
+
+def _numero_texto(v: float) -> str:
+    return f"{v:g}"
+
+
+def valores_guardados(preguntas, guardadas: dict) -> dict[str, list[str]]:
+    """Respuestas ya guardadas ({pregunta_id: Respuesta}) con la forma del POST."""
+    out = {}
+    for p in preguntas:
+        r = guardadas.get(p.id)
+        if r is None:
+            continue
+        tipo = tipo_normalizado(p.tipo_respuesta)
+        if tipo == "OPCION_UNICA":
+            valores = [str(r.opcion_seleccionada_id)] if r.opcion_seleccionada_id else []
+        elif tipo == "OPCION_MULTIPLE":
+            valores = [str(v) for v in (r.opciones_multiple or [])]
+        elif tipo in ("TEXTO", "SI_NO"):
+            valores = [r.valor_texto] if r.valor_texto else []
+        elif tipo in ("NUMERICA", "ESCALA"):
+            valores = [_numero_texto(r.valor_numerico)] if r.valor_numerico is not None else []
+        else:
+            valores = []
+        if valores:
+            out[f"preg_{p.id}"] = valores
+    return out
+
+
+def respuestas_de_sesion(sesion) -> dict:
+    """{pregunta_id: Respuesta} de la sesión (solo los campos que se comparan)."""
+    return {
+        r.pregunta_id: r
+        for r in Respuesta.objects.filter(sesion=sesion).only(
+            "pregunta_id", "opcion_seleccionada_id", "valor_numerico", "valor_texto", "opciones_multiple",
+        )
+    }
+
+
+def _sin_cambios(nueva: Respuesta, guardada: Respuesta | None) -> bool:
+    if guardada is None:
+        return False
+    return (
+        nueva.opcion_seleccionada_id == guardada.opcion_seleccionada_id
+        and nueva.valor_numerico == guardada.valor_numerico
+        and nueva.valor_texto == guardada.valor_texto
+        and list(nueva.opciones_multiple or []) == list(guardada.opciones_multiple or [])
+    )
+
+
+def upsert_respuestas(respuestas: list[Respuesta]) -> None:
+    """Inserta o actualiza (sesion, pregunta) en un solo statement."""
+    if not respuestas:
+        return
+    kwargs = {"update_conflicts": True, "update_fields": CAMPOS_RESPUESTA}
+    # MySQL (ON DUPLICATE KEY UPDATE) no acepta columnas de conflicto
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs["unique_fields"] = ["sesion", "pregunta"]
+    Respuesta.objects.bulk_create(respuestas, **kwargs)
+
+
+def guardar_respuestas(sesion, preguntas, post: dict[str, list[str]], guardadas: dict | None = None) -> int:
+    """
+    Guarda las respuestas presentes en `post` ({"preg_<id>": [valores]}). Las
+    que vienen vacías (valores_post con con_vacios=True) borran la respuesta
+    guardada; las preguntas que no vienen no se tocan. Con `guardadas`
+    ({pregunta_id: Respuesta}) se omiten las que no cambiaron y solo se borra
+    lo que existe. Retorna cuántas se escribieron.
+    """
+    respuestas, vacias = [], []
+    for p in preguntas:
+        valores = post.get(f"preg_{p.id}")
+        if valores is None:
+            continue
+        if valores:
+            respuestas.append(respuesta_desde_post(sesion, p, valores))
+        elif guardadas is None or p.id in guardadas:
+            vacias.append(p.id)
+
+    if guardadas is not None:
+        respuestas = [r for r in respuestas if not _sin_cambios(r, guardadas.get(r.pregunta_id))]
+    upsert_respuestas(respuestas)
+    if vacias:
+        Respuesta.objects.filter(sesion=sesion, pregunta_id__in=vacias).delete()
+    return len(respuestas)
+
+
+def autoguardar_respuestas(sesion, preguntas, cambios: dict[str, list[str]]) -> tuple[int, int]:
+    """
+    Autoguardado de una sesión abierta: `cambios` trae solo las preguntas que
+    cambiaron en el navegador (valores_post con con_vacios=True). Las válidas se
+    escriben con un upsert; las vacías o inválidas borran la respuesta guardada.
+    Las claves que no son preguntas del cuestionario se ignoran.
+    Retorna (guardadas, borradas).
+    """
+    escribir, borrar = [], []
+    for p in preguntas:
+        valores = cambios.get(f"preg_{p.id}")
+        if valores is None:
+            continue
+        if respuesta_valida(p, valores):
+            escribir.append(respuesta_desde_post(sesion, p, valores))
+        else:
+            borrar.append(p.id)
+
+    upsert_respuestas(escribir)
+    borradas = 0
+    if borrar:
+        borradas, _ = Respuesta.objects.filter(sesion=sesion, pregunta_id__in=borrar).delete()
+    return len(escribir), borradas
@@ -0,0 +1,186 @@
+# forms/services/scoring_bulk.py
+"""
+Calificación masiva de sesiones (TrabajoScoring).
+
+Aplica la auto-suma (AUTO) o un ScoringProfile (PROFILE) a todas las
+sesiones de un filtro — cuestionario, estado, rango de fecha_fin — por
+chunks:
+
+    1 consulta de sesiones + 1 de respuestas (compute_auto_sum_bulk / score_profile_bulk)
+    1 consulta de calificaciones existentes (para contar creadas / actualizadas)
+    1 INSERT ... ON CONFLICT UPDATE (bulk_create con update_conflicts)
+
+El avance se guarda en el TrabajoScoring después de cada chunk. El trabajo
+corre en la cola durable (resultados.tasks.encolar_scoring_bulk): si el
+proceso muere a medias se retoma desde el inicio (el upsert es idempotente).
+"""
+from __future__ import annotations
+
+import logging
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from forms.models import CalificacionSesion, ScoringProfile, SesionEvaluacion, TrabajoScoring
+
+from .scoring import compute_auto_sum_bulk
+from .scoring_plan import compactar_detalle, get_scoring_plan
+from .scoring_rules import get_rule_plan, score_profile_bulk
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+AUTO_PROFILE_NOMBRE = "Auto (SUM/AVG)"
+
+
+def perfil_auto(cuestionario, algoritmo: str = "SUM") -> ScoringProfile:
+    """Perfil "Auto (SUM/AVG)" del cuestionario (CalificacionSesion necesita uno)."""
+    profile, _ = ScoringProfile.objects.get_or_create(
+        cuestionario=cuestionario,
+        nombre=AUTO_PROFILE_NOMBRE,
+        defaults={"activo": True, "algoritmo": algoritmo},
+    )
+    # Si ya existía, actualiza algoritmo por si cambió SUM/AVG en el esquema
+    if profile.algoritmo != algoritmo:
+        profile.algoritmo = algoritmo
+        profile.save(update_fields=["algoritmo"])
+    return profile
+
+
+def algoritmo_auto(breakdown: dict) -> str:
+    return breakdown.get("scheme", {}).get("mode", "SUM")
+
+
+def filtrar_sesiones(cuestionario_id=None, estado=None, fecha_desde=None, fecha_hasta=None):
+    """Sesiones del filtro; fechas como date o 'YYYY-MM-DD' sobre fecha_fin."""
+    qs = SesionEvaluacion.objects.all()
+    if cuestionario_id:
+        qs = qs.filter(cuestionario_id=cuestionario_id)
+    if estado:
+        qs = qs.filter(estado=estado)
+    if fecha_desde:
+        qs = qs.filter(fecha_fin__date__gte=parse_date(str(fecha_desde)))
+    if fecha_hasta:
+        qs = qs.filter(fecha_fin__date__lte=parse_date(str(fecha_hasta)))
+    return qs
+
+
+def upsert_calificaciones(filas: list[CalificacionSesion]) -> tuple[int, int]:
+    """
+    Inserta o actualiza (sesion, profile) en un solo statement.
+    Retorna (creadas, actualizadas).
+    """
+    if not filas:
+        return 0, 0
+
+    existentes = set(
+        CalificacionSesion.objects
+        .filter(sesion_id__in=[f.sesion_id for f in filas], profile_id__in={f.profile_id for f in filas})
+        .values_list("sesion_id", "profile_id")
+    )
+
+    kwargs = {"update_conflicts": True, "update_fields": ["total", "detalle", "config_hash"]}
+    # MySQL (ON DUPLICATE KEY UPDATE) no acepta columnas de conflicto
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs["unique_fields"] = ["sesion", "profile"]
+    CalificacionSesion.objects.bulk_create(filas, **kwargs)
+
+    actualizadas = sum(1 for f in filas if (f.sesion_id, f.profile_id) in existentes)
+    return len(filas) - actualizadas, actualizadas
+
+
+def calificar_chunk(sesiones, modo: str = "AUTO", profile=None) -> tuple[int, int]:
+    if modo == "PROFILE":
+        resultados = score_profile_bulk(profile, sesiones)
+        firma = get_rule_plan(profile).firma
+        filas = [
+            CalificacionSesion(
+                sesion_id=sid, profile=profile, total=float(total), detalle=breakdown, config_hash=firma,
+            )
+            for sid, (total, breakdown) in resultados.items()
+        ]
+        return upsert_calificaciones(filas)
+
+    resultados = compute_auto_sum_bulk(sesiones)
+    perfiles: dict[int, ScoringProfile] = {}
+    filas = []
+    for s in sesiones:
+        total, breakdown = resultados[s.id]
+        if s.cuestionario_id not in perfiles:
+            perfiles[s.cuestionario_id] = perfil_auto(s.cuestionario, algoritmo_auto(breakdown))
+        plan = get_scoring_plan(s.cuestionario)
+        filas.append(CalificacionSesion(
+            sesion_id=s.id,
+            profile=perfiles[s.cuestionario_id],
+            total=float(total),
+            detalle=compactar_detalle({"mode": "AUTO", **breakdown}, plan),
+            config_hash=plan.hash_scoring,
+        ))
+    return upsert_calificaciones(filas)
+
+
+def ejecutar_trabajo(trabajo_id: int, chunk_size: int = CHUNK_SIZE, al_avanzar=None) -> TrabajoScoring | None:
+    """
+    Ejecuta el TrabajoScoring. `al_avanzar()` se llama tras cada chunk
+    (la cola lo usa para renovar el lease). None si el trabajo ya no existe.
+    """
+    trabajo = TrabajoScoring.objects.select_related("profile").filter(pk=trabajo_id).first()
+    if trabajo is None:
+        return None
+
+    # El perfil es SET_NULL: pudo borrarse entre el encolado y la ejecución
+    if trabajo.modo == "PROFILE" and trabajo.profile is None:
+        TrabajoScoring.objects.filter(pk=trabajo.pk).update(
+            estado="ERROR", terminado=timezone.now(),
+            error="El ScoringProfile del trabajo ya no existe (se borró antes de ejecutarlo).",
+        )
+        trabajo.refresh_from_db()
+        return trabajo
+
+    filtros = trabajo.filtros or {}
+
+    sesion_ids = list(
+        filtrar_sesiones(trabajo.cuestionario_id, **filtros)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    t0 = time.perf_counter()
+    TrabajoScoring.objects.filter(pk=trabajo.pk).update(
+        estado="EN_CURSO", total=len(sesion_ids), iniciado=timezone.now(),
+        procesados=0, creados=0, actualizados=0, error="", terminado=None,
+    )
+
+    procesados = creados = actualizados = 0
+    try:
+        for i in range(0, len(sesion_ids), chunk_size):
+            ids = sesion_ids[i:i + chunk_size]
+            sesiones = list(SesionEvaluacion.objects.select_related("cuestionario").filter(pk__in=ids))
+
+            with transaction.atomic():
+                c, a = calificar_chunk(sesiones, trabajo.modo, trabajo.profile)
+
+            procesados += len(ids)
+            creados += c
+            actualizados += a
+            TrabajoScoring.objects.filter(pk=trabajo.pk).update(
+                procesados=procesados, creados=creados, actualizados=actualizados,
+                segundos=time.perf_counter() - t0,
+            )
+            if al_avanzar:
+                al_avanzar()
+    except Exception as e:
+        logger.exception("Trabajo de scoring %s falló", trabajo.pk)
+        TrabajoScoring.objects.filter(pk=trabajo.pk).update(
+            estado="ERROR", error=str(e)[:2000], terminado=timezone.now(),
+            segundos=time.perf_counter() - t0,
+        )
+    else:
+        TrabajoScoring.objects.filter(pk=trabajo.pk).update(
+            estado="COMPLETADO", terminado=timezone.now(), segundos=time.perf_counter() - t0,
+        )
+
+    trabajo.refresh_from_db()
+    return trabajo
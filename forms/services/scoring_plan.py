@@ -0,0 +1,531 @@
+# forms/services/scoring_plan.py
+"""
+Plan de calificación "compilado" por Cuestionario.
+
+La estructura de las preguntas (tipo, min/max, reverse, subscale, var) solo
+cambia cuando se edita el cuestionario, así que se interpreta una vez y se
+guarda en arreglos NumPy:
+
+    item_ids, mins, maxs, reverse, si_no, subscale_idx (-1 = sin subescala)
+
+Cache en proceso con llave (cuestionario_id, firma), donde la firma es el hash
+de las configs de las preguntas. Se invalida al guardar/borrar Pregunta o
+Cuestionario; otros procesos revalidan la firma cada PLAN_CHECK_SECONDS.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import numpy as np
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from forms.models import Cuestionario, Pregunta
+
+from .scoring import _infer_var_code
+
+# Solo estos tipos suman (ver compute_auto_sum_for_session)
+TIPOS_SUMABLES = ("ESCALA", "SI_NO")
+
+# Cada cuánto (segundos) se vuelve a leer la firma de un plan en cache
+PLAN_CHECK_SECONDS = 5.0
+
+NOTA_AUTO = "Solo ESCALA (Likert) y SI/NO. reverse aplica: (max+min-valor)."
+
+# Versión del formato compacto de CalificacionSesion.detalle (ver compactar_detalle)
+DETALLE_COMPACTO = 2
+
+_PREGUNTA_FIELDS = ("id", "tipo_respuesta", "orden", "texto", "config")
+
+
+@dataclass(frozen=True, eq=False)
+class ScoringPlan:
+    cuestionario_id: int
+    codigo: str
+    firma: str
+    item_ids: tuple
+    ordenes: tuple
+    tipos: tuple
+    textos: tuple
+    vars: tuple
+    subscale_names: tuple
+    mins: np.ndarray
+    maxs: np.ndarray
+    reverse: np.ndarray
+    si_no: np.ndarray
+    subscale_idx: np.ndarray
+    scoring: dict = field(default_factory=dict)  # Cuestionario.config["scoring"]
+    hash_scoring: str = ""  # solo lo que afecta el resultado (ver CalificacionSesion.config_hash)
+
+    @property
+    def n_items(self) -> int:
+        return len(self.item_ids)
+
+    @cached_property
+    def index(self) -> dict[int, int]:
+        """pregunta_id -> posición en los arreglos."""
+        return {qid: i for i, qid in enumerate(self.item_ids)}
+
+
+# ============================================================
+# Compilación
+# ============================================================
+
+def _firma(cuestionario, rows) -> str:
+    payload = {
+        "codigo": cuestionario.codigo,
+        "config": getattr(cuestionario, "config", None) or {},
+        "preguntas": rows,
+    }
+    return hashlib.sha1(
+        json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def _hash_scoring(scoring: dict, items) -> str:
+    """
+    Hash de lo que afecta el resultado: la config de scoring y, por pregunta
+    sumable, (id, tipo, min, max, reverse, si_no, subescala). Texto, var y
+    orden no entran: editarlos no deja calificaciones desactualizadas.
+    0037_compactar_detalle_calificacion guarda una copia fija.
+    """
+    return hashlib.sha1(json.dumps({
+        "scoring": scoring,
+        "items": sorted(items),
+    }, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _leer_preguntas(cuestionario_id) -> list:
+    return [
+        list(r) for r in
+        Pregunta.objects
+        .filter(cuestionario_id=cuestionario_id)
+        .order_by("orden", "id")
+        .values_list(*_PREGUNTA_FIELDS)
+    ]
+
+
+def compilar_plan(cuestionario, rows=None) -> ScoringPlan:
+    if rows is None:
+        rows = _leer_preguntas(cuestionario.id)
+
+    item_ids, ordenes, tipos, textos, vars_ = [], [], [], [], []
+    mins, maxs, reverse, si_no, sub_idx = [], [], [], [], []
+    subscale_names: list[str] = []
+
+    for qid, tipo, orden, texto, cfg in rows:
+        tipo = (tipo or "").upper()
+        if tipo not in TIPOS_SUMABLES:
+            continue
+        cfg = cfg or {}
+
+        item_ids.append(qid)
+        ordenes.append(orden)
+        tipos.append(tipo)
+        textos.append((texto or "")[:180])
+        mins.append(float(cfg.get("min", 0 if tipo == "SI_NO" else 1)))
+        maxs.append(float(cfg.get("max", 1 if tipo == "SI_NO" else 5)))
+        reverse.append(bool(cfg.get("reverse", False)))
+        si_no.append(tipo == "SI_NO")
+
+        pregunta = Pregunta(id=qid, orden=orden)
+        vars_.append(cfg.get("var") or _infer_var_code(cuestionario, pregunta))
+
+        name = cfg.get("subscale")
+        if name:
+            if name not in subscale_names:
+                subscale_names.append(name)
+            sub_idx.append(subscale_names.index(name))
+        else:
+            sub_idx.append(-1)
+
+    scoring = dict(((getattr(cuestionario, "config", None) or {}).get("scoring") or {}))
+    hash_scoring = _hash_scoring(scoring, [
+        (qid, tipo, mn, mx, rev, sn, subscale_names[k] if k >= 0 else None)
+        for qid, tipo, mn, mx, rev, sn, k in zip(item_ids, tipos, mins, maxs, reverse, si_no, sub_idx)
+    ])
+
+    return ScoringPlan(
+        cuestionario_id=cuestionario.id,
+        codigo=cuestionario.codigo,
+        firma=_firma(cuestionario, rows),
+        item_ids=tuple(item_ids),
+        ordenes=tuple(ordenes),
+        tipos=tuple(tipos),
+        textos=tuple(textos),
+        vars=tuple(vars_),
+        subscale_names=tuple(subscale_names),
+        mins=np.array(mins, dtype=float),
+        maxs=np.array(maxs, dtype=float),
+        reverse=np.array(reverse, dtype=bool),
+        si_no=np.array(si_no, dtype=bool),
+        subscale_idx=np.array(sub_idx, dtype=int),
+        scoring=scoring,
+        hash_scoring=hash_scoring,
+    )
+
+
+# ============================================================
+# Cache
+# ============================================================
+
+_lock = threading.Lock()
+_planes: dict[tuple[int, str], ScoringPlan] = {}
+_vigente: dict[int, tuple[str, float]] = {}   # cuestionario_id -> (firma, revisado_en)
+
+
+def get_scoring_plan(cuestionario) -> ScoringPlan:
+    """
+    Plan vigente del cuestionario. Dentro de PLAN_CHECK_SECONDS no toca la BD;
+    después relee las configs (1 consulta ligera) y recompila solo si cambió la firma.
+    """
+    cid = cuestionario.id
+    now = time.monotonic()
+
+    actual = _vigente.get(cid)
+    if actual is not None and now - actual[1] < PLAN_CHECK_SECONDS:
+        plan = _planes.get((cid, actual[0]))
+        if plan is not None:
+            return plan
+
+    rows = _leer_preguntas(cid)
+    firma = _firma(cuestionario, rows)
+
+    with _lock:
+        plan = _planes.get((cid, firma))
+        if plan is None:
+            plan = compilar_plan(cuestionario, rows)
+            # Solo se conserva la firma vigente de cada cuestionario
+            for key in [k for k in _planes if k[0] == cid]:
+                _planes.pop(key, None)
+            _planes[(cid, firma)] = plan
+        _vigente[cid] = (firma, now)
+    return plan
+
+
+def invalidar_plan(cuestionario_id) -> None:
+    with _lock:
+        _vigente.pop(cuestionario_id, None)
+        for key in [k for k in _planes if k[0] == cuestionario_id]:
+            _planes.pop(key, None)
+
+
+def limpiar_planes() -> None:
+    with _lock:
+        _vigente.clear()
+        _planes.clear()
+
+
+@receiver([post_save, post_delete], sender=Pregunta)
+def _pregunta_cambio(sender, instance, **kwargs):
+    invalidar_plan(instance.cuestionario_id)
+
+
+@receiver([post_save, post_delete], sender=Cuestionario)
+def _cuestionario_cambio(sender, instance, **kwargs):
+    invalidar_plan(instance.pk)
+
+
+# ============================================================
+# Respuestas -> matriz (sesiones × ítems)
+# ============================================================
+
+RESPUESTA_FIELDS = ("pregunta_id", "valor_numerico", "valor_texto")
+
+
+def _posiciones(llaves: np.ndarray, valores: np.ndarray, buscar) -> np.ndarray:
+    """valores[k] donde llaves[k] == x para cada x de buscar; -1 si no está (como dict.get vectorizado)."""
+    buscar = np.asarray(buscar, dtype=np.int64)
+    if not len(llaves):
+        return np.full(len(buscar), -1)
+    orden = np.argsort(llaves)
+    llaves, valores = llaves[orden], valores[orden]
+    pos = np.minimum(np.searchsorted(llaves, buscar), len(llaves) - 1)
+    return np.where(llaves[pos] == buscar, valores[pos], -1)
+
+
+def matrices_respuesta(plan: ScoringPlan, rows, fila_por_sesion: dict[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    rows: (sesion_id, pregunta_id, valor_numerico, valor_texto)
+    Matrices sesiones × ítems sin acotar: (numérico, SI/NO como 1/0); NaN = sin respuesta.
+    Solo dependen de los ítems del plan, no de min/max/reverse.
+    """
+    shape = (len(fila_por_sesion), plan.n_items)
+    num = np.full(shape, np.nan)
+    sino = np.full(shape, np.nan)
+    rows = rows if isinstance(rows, list) else list(rows)
+    if not rows:
+        return num, sino
+
+    # Columnas por separado: zip(*rows) es muy lento con cientos de miles de filas
+    sids = [r[0] for r in rows]
+    qids = [r[1] for r in rows]
+    v_num = [r[2] for r in rows]
+    v_txt = [r[3] for r in rows]
+    i = _posiciones(np.fromiter(fila_por_sesion, dtype=np.int64), np.fromiter(fila_por_sesion.values(), dtype=np.int64), sids)
+    j = _posiciones(np.array(plan.item_ids, dtype=np.int64), np.arange(plan.n_items), qids)
+    ok = (i >= 0) & (j >= 0)
+    i, j = i[ok], j[ok]
+
+    num[i, j] = np.array(v_num, dtype=float)[ok]   # None -> NaN
+
+    es_sino = plan.si_no[j]
+    txt = np.array(v_txt, dtype=object)[ok][es_sino]
+    valor = np.full(len(txt), np.nan)
+    if len(txt):
+        t = np.array([(x or "").strip().upper() for x in txt])
+        valor[(t == "SI") | (t == "SÍ")] = 1.0
+        valor[t == "NO"] = 0.0
+    sino[i[es_sino], j[es_sino]] = valor
+    return num, sino
+
+
+def crudos_desde(plan: ScoringPlan, num: np.ndarray, sino: np.ndarray) -> np.ndarray:
+    """Valores crudos ya acotados a [min, max] según el plan; NaN = sin respuesta."""
+    # ESCALA: clamp(v, min, max) -> max(min, min(max, v)); NaN se propaga
+    escala = np.maximum(plan.mins, np.minimum(plan.maxs, num))
+
+    # SI/NO: 1/0 si la escala es 0..1; si no, max / min
+    binaria = (plan.mins == 0.0) & (plan.maxs == 1.0)
+    sino = np.where(binaria | np.isnan(sino), sino, np.where(sino == 1.0, plan.maxs, plan.mins))
+
+    return np.where(plan.si_no, sino, escala)
+
+
+def matriz_crudos(plan: ScoringPlan, rows, fila_por_sesion: dict[int, int]) -> np.ndarray:
+    """
+    rows: (sesion_id, pregunta_id, valor_numerico, valor_texto)
+    Matriz de valores crudos ya acotados a [min, max]; NaN = sin respuesta.
+    """
+    return crudos_desde(plan, *matrices_respuesta(plan, rows, fila_por_sesion))
+
+
+def valores_calificados(plan: ScoringPlan, crudos: np.ndarray) -> np.ndarray:
+    """Reverse (max+min-v) y clamp final; funciona igual con vector o matriz (sesiones × ítems)."""
+    valor = np.where(plan.reverse, plan.maxs + plan.mins - crudos, crudos)
+    return np.maximum(plan.mins, np.minimum(plan.maxs, valor))
+
+
+def _suma_filas(M: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    # cumsum acumula de izquierda a derecha (como el `total += v` original);
+    # np.sum / matmul usan otro orden y podrían diferir en el último decimal.
+    if M.shape[1] == 0:
+        return np.zeros(M.shape[0])
+    return np.cumsum(np.where(mask, M, 0.0), axis=1)[:, -1]
+
+
+def _etiquetas_banda(plan: ScoringPlan, valores: np.ndarray) -> list:
+    """
+    Primera banda (inclusiva) que contiene el valor, como _apply_scoring_scheme.
+    Con bandas ordenadas y sin traslape basta np.digitize sobre los máximos;
+    si no, se evalúan en orden con máscaras.
+    """
+    bands = plan.scoring.get("bands") or []
+    b_min = np.array([float(b.get("min", float("-inf"))) for b in bands])
+    b_max = np.array([float(b.get("max", float("inf"))) for b in bands])
+    labels = [b.get("label") or b.get("nombre") or b.get("texto") for b in bands]
+
+    out = np.full(valores.shape, -1)
+    ordenadas = bool(np.all(np.diff(b_min) >= 0) and np.all(np.diff(b_max) >= 0))
+    if ordenadas:
+        idx = np.digitize(valores, b_max, right=True)   # primera banda con max >= valor
+        ok = idx < len(bands)
+        ok[ok] &= b_min[idx[ok]] <= valores[ok]
+        out[ok] = idx[ok]
+    else:
+        for k in range(len(bands) - 1, -1, -1):      # la primera que coincide gana
+            out[(b_min[k] <= valores) & (valores <= b_max[k])] = k
+
+    return [labels[k] if k >= 0 else None for k in out.tolist()]
+
+
+def etiquetas_plan(plan: ScoringPlan, totales: np.ndarray, avgs: np.ndarray) -> list | None:
+    """Banda por sesión según scoring.mode (SUM -> total, si no -> promedio); None si no hay bandas."""
+    if not plan.scoring.get("bands"):
+        return None
+    modo = (plan.scoring.get("mode") or "SUM").upper()
+    return _etiquetas_banda(plan, totales if modo == "SUM" else avgs)
+
+
+def totales_matriz(plan: ScoringPlan, crudos: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(totales, promedios, contados) por sesión, sin armar el breakdown."""
+    valores = valores_calificados(plan, crudos)
+    contado = ~np.isnan(valores)
+    contados = contado.sum(axis=1)
+    totales = _suma_filas(valores, contado)
+    avgs = np.divide(totales, contados, out=np.zeros(len(totales)), where=contados > 0)
+    return totales, avgs, contados
+
+
+def score_matrix(plan: ScoringPlan, sesion_ids: list[int], crudos: np.ndarray) -> dict[int, tuple[float, dict]]:
+    """
+    (total, breakdown) por sesión a partir de la matriz de crudos.
+    Totales, promedios, subescalas y bandas se calculan para todas las sesiones a la vez.
+    """
+    valores = valores_calificados(plan, crudos)
+    contado = ~np.isnan(valores)
+    S = len(sesion_ids)
+
+    mins = np.broadcast_to(plan.mins, valores.shape)
+    maxs = np.broadcast_to(plan.maxs, valores.shape)
+
+    contados = contado.sum(axis=1)
+    totales = _suma_filas(valores, contado)
+    tot_min = _suma_filas(mins, contado)
+    tot_max = _suma_filas(maxs, contado)
+    hay = contados > 0
+    avgs = np.divide(totales, contados, out=np.zeros(S), where=hay)
+    medias = np.where(hay, (tot_min + tot_max) / 2.0, 0.0)
+
+    # Subescalas: ítem -> subescala (una columna por subescala)
+    K = len(plan.subscale_names)
+    sub_total = np.zeros((S, K))
+    sub_min = np.zeros((S, K))
+    sub_max = np.zeros((S, K))
+    sub_count = np.zeros((S, K), dtype=int)
+    sub_first = np.full((S, K), plan.n_items)   # primer ítem contado (orden de llaves)
+    for k in range(K):
+        en_k = contado & (plan.subscale_idx == k)
+        sub_total[:, k] = _suma_filas(valores, en_k)
+        sub_min[:, k] = _suma_filas(mins, en_k)
+        sub_max[:, k] = _suma_filas(maxs, en_k)
+        sub_count[:, k] = en_k.sum(axis=1)
+        sub_first[:, k] = np.where(en_k.any(axis=1), en_k.argmax(axis=1), plan.n_items)
+
+    etiquetas = etiquetas_plan(plan, totales, avgs)
+
+    mins_l = plan.mins.tolist()
+    maxs_l = plan.maxs.tolist()
+    reverse_l = plan.reverse.tolist()
+    sub_names = [plan.subscale_names[k] if k >= 0 else None for k in plan.subscale_idx.tolist()]
+
+    out = {}
+    for i, sid in enumerate(sesion_ids):
+        crudos_l = crudos[i].tolist()
+        valores_l = valores[i].tolist()
+        contado_l = contado[i].tolist()
+
+        subscales = {}
+        for k in sorted((k for k in range(K) if sub_count[i, k]), key=lambda k: sub_first[i, k]):
+            count = int(sub_count[i, k])
+            data = {
+                "total": float(sub_total[i, k]),
+                "min": float(sub_min[i, k]),
+                "max": float(sub_max[i, k]),
+                "count": count,
+            }
+            data["avg"] = data["total"] / count
+            data["media_teorica"] = (data["min"] + data["max"]) / 2.0
+            subscales[plan.subscale_names[k]] = data
+
+        por_pregunta = {}
+        for j, qid in enumerate(plan.item_ids):
+            ok = contado_l[j]
+            por_pregunta[qid] = {
+                "var": plan.vars[j],
+                "orden": plan.ordenes[j],
+                "tipo": plan.tipos[j],
+                "min": mins_l[j],
+                "max": maxs_l[j],
+                "reverse": reverse_l[j],
+                "valor_raw": crudos_l[j] if ok else None,
+                "valor": valores_l[j] if ok else None,
+                "texto": plan.textos[j],
+                "subscale": sub_names[j],
+            }
+
+        total = float(totales[i])
+        breakdown = {
+            "cuestionario_id": plan.cuestionario_id,
+            "sesion_id": sid,
+            "items_sumables": plan.n_items,
+            "contados": int(contados[i]),
+            "total_min": float(tot_min[i]),
+            "total_max": float(tot_max[i]),
+            "total": total,
+            "avg": float(avgs[i]),
+            "media_teorica": float(medias[i]),
+            "subscales": subscales,
+            "por_pregunta": por_pregunta,
+            "nota": NOTA_AUTO,
+        }
+        if etiquetas is not None:
+            breakdown["banda"] = etiquetas[i]
+        out[sid] = (total, breakdown)
+    return out
+
+
+def score_with_plan(plan: ScoringPlan, rows, sesion_id) -> tuple[float, dict]:
+    """Una sesión: rows = (pregunta_id, valor_numerico, valor_texto)."""
+    crudos = matriz_crudos(plan, ((sesion_id, *r) for r in rows), {sesion_id: 0})
+    return score_matrix(plan, [sesion_id], crudos)[sesion_id]
+
+
+# ============================================================
+# Detalle compacto (CalificacionSesion.detalle)
+# ============================================================
+
+def compactar_detalle(breakdown: dict, plan: ScoringPlan) -> dict:
+    """
+    Breakdown de auto-suma listo para guardar: de por_pregunta solo quedan los
+    valores de la sesión (ids, crudos, calificados); var, orden, tipo, min, max,
+    reverse y texto son iguales en todas las sesiones y salen del plan al leer
+    (expandir_detalle).
+    """
+    por_pregunta = breakdown.get("por_pregunta")
+    if por_pregunta is None:
+        return breakdown
+    out = {k: v for k, v in breakdown.items() if k not in ("por_pregunta", "nota")}
+    out["formato"] = DETALLE_COMPACTO
+    out["plan"] = plan.hash_scoring
+    out["items"] = [int(qid) for qid in por_pregunta]
+    out["valores_raw"] = [row["valor_raw"] for row in por_pregunta.values()]
+    out["valores"] = [row["valor"] for row in por_pregunta.values()]
+    return out
+
+
+def expandir_detalle(detalle: dict, cuestionario) -> dict:
+    """
+    Inverso de compactar_detalle: rearma por_pregunta con los metadatos del plan
+    vigente. Un detalle que no está compacto se devuelve tal cual. Si se
+    calificó con otro plan (hash distinto), los metadatos vigentes pueden no
+    corresponder a los valores: se marca plan_desactualizado=True.
+    """
+    if not detalle or detalle.get("formato") != DETALLE_COMPACTO:
+        return detalle
+    plan = get_scoring_plan(cuestionario)
+
+    por_pregunta = {}
+    for qid, raw, valor in zip(detalle["items"], detalle["valores_raw"], detalle["valores"]):
+        j = plan.index.get(qid)
+        if j is None:
+            # La pregunta ya no está en el cuestionario: solo quedan los valores
+            meta = {"var": None, "orden": None, "tipo": None, "min": None, "max": None,
+                    "reverse": False, "texto": "", "subscale": None}
+        else:
+            k = int(plan.subscale_idx[j])
+            meta = {
+                "var": plan.vars[j],
+                "orden": plan.ordenes[j],
+                "tipo": plan.tipos[j],
+                "min": float(plan.mins[j]),
+                "max": float(plan.maxs[j]),
+                "reverse": bool(plan.reverse[j]),
+                "texto": plan.textos[j],
+                "subscale": plan.subscale_names[k] if k >= 0 else None,
+            }
+        # Mismas llaves que por_pregunta guardado en JSON (str)
+        por_pregunta[str(qid)] = {**meta, "valor_raw": raw, "valor": valor}
+
+    out = {k: v for k, v in detalle.items()
+           if k not in ("formato", "plan", "items", "valores_raw", "valores")}
+    out["por_pregunta"] = por_pregunta
+    out["nota"] = NOTA_AUTO
+    if detalle.get("plan") != plan.hash_scoring:
+        out["plan_desactualizado"] = True
+    return out
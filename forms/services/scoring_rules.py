@@ -0,0 +1,393 @@
+# forms/services/scoring_rules.py
+"""
+Motor de reglas para ScoringProfile / ScoringRule (modo PROFILE).
+
+Cada regla cubre las preguntas con q_from <= orden <= q_to (filtradas por
+include_tipos) y convierte la respuesta en puntos, en este orden:
+
+    1) txt_map   sobre Opcion.valor o valor_texto (normalizados)
+    2) num_map   sobre valor_numerico
+    3) valor_numerico tal cual
+    4) SI / NO -> 1 / 0
+
+Los puntos se multiplican por weight. algoritmo SUM suma todo; AVG es el
+promedio ponderado (suma / suma de pesos contados). Si una pregunta cae en
+dos reglas, cuenta en ambas.
+
+Las reglas se compilan una vez por perfil a "términos" (regla, ítem) con
+tablas de búsqueda y un vector de pesos; evaluar N sesiones es indexar y
+sumar matrices sesiones × términos. Cache igual que scoring_plan.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from forms.models import Pregunta, Respuesta, ScoringProfile, ScoringRule
+
+from .scoring_plan import PLAN_CHECK_SECONDS, _suma_filas
+
+_RULE_FIELDS = ("id", "q_from", "q_to", "weight", "num_map", "txt_map", "include_tipos", "descripcion")
+_PREGUNTA_FIELDS = ("id", "orden", "tipo_respuesta")
+
+RESPUESTA_REGLA_FIELDS = ("pregunta_id", "opcion_seleccionada__valor", "valor_texto", "valor_numerico")
+
+SI_NO_DEFAULT = {"SI": 1.0, "NO": 0.0}
+
+
+def normalizar_clave(s) -> str:
+    """'Totalmente de acuerdo' / 'totalmente_de_acuerdo' -> 'TOTALMENTE_DE_ACUERDO'."""
+    s = unicodedata.normalize("NFKD", str(s or "")).encode("ascii", "ignore").decode("ascii")
+    return "_".join(s.strip().upper().split())
+
+
+def _clave_num(v) -> float | None:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _tipos_incluidos(include_tipos) -> set[str] | None:
+    """'*' -> None (todos); 'ESCALA, SI_NO' -> {'ESCALA', 'SI_NO'}."""
+    partes = {p.strip().upper() for p in str(include_tipos or "*").split(",") if p.strip()}
+    return None if not partes or "*" in partes else partes
+
+
+@dataclass(frozen=True, eq=False)
+class RulePlan:
+    profile_id: int
+    nombre: str
+    cuestionario_id: int
+    algoritmo: str
+    firma: str
+    reglas: tuple            # dicts con id, q_from, q_to, weight, desc
+    item_ids: tuple          # preguntas cubiertas por al menos una regla
+    ordenes: tuple
+    tipos: tuple
+    txt_vocab: tuple         # claves de texto normalizadas (columna = índice)
+    num_vocab: tuple         # claves numéricas de num_map
+    term_item: np.ndarray    # término -> ítem
+    term_rule: np.ndarray    # término -> regla
+    pesos: np.ndarray        # término -> weight
+    txt_tab: np.ndarray      # términos × (len(txt_vocab) + 1); NaN = sin mapeo
+    num_tab: np.ndarray      # términos × (len(num_vocab) + 1)
+    sino_tab: np.ndarray     # len(txt_vocab) + 1
+
+    @property
+    def n_terminos(self) -> int:
+        return len(self.term_item)
+
+    @cached_property
+    def index(self) -> dict[int, int]:
+        return {qid: i for i, qid in enumerate(self.item_ids)}
+
+    @cached_property
+    def txt_index(self) -> dict[str, int]:
+        return {k: i for i, k in enumerate(self.txt_vocab)}
+
+    @cached_property
+    def num_index(self) -> dict[float, int]:
+        return {k: i for i, k in enumerate(self.num_vocab)}
+
+
+# ============================================================
+# Compilación
+# ============================================================
+
+def _leer(profile_id, cuestionario_id) -> tuple[list, list]:
+    reglas = [
+        list(r) for r in
+        ScoringRule.objects.filter(profile_id=profile_id).order_by("id").values_list(*_RULE_FIELDS)
+    ]
+    preguntas = [
+        list(r) for r in
+        Pregunta.objects.filter(cuestionario_id=cuestionario_id).order_by("orden", "id").values_list(*_PREGUNTA_FIELDS)
+    ]
+    return reglas, preguntas
+
+
+def _firma(profile, reglas, preguntas) -> str:
+    payload = {"algoritmo": profile.algoritmo, "reglas": reglas, "preguntas": preguntas}
+    return hashlib.sha1(
+        json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def compilar_reglas(profile, reglas=None, preguntas=None) -> RulePlan:
+    if reglas is None or preguntas is None:
+        reglas, preguntas = _leer(profile.id, profile.cuestionario_id)
+
+    # Mapas normalizados por regla + vocabularios comunes
+    txt_maps, num_maps = [], []
+    txt_vocab: dict[str, int] = {k: i for i, k in enumerate(SI_NO_DEFAULT)}
+    num_vocab: dict[float, int] = {}
+    for _, _, _, _, num_map, txt_map, _, _ in reglas:
+        tm = {normalizar_clave(k): _clave_num(v) for k, v in (txt_map or {}).items()}
+        nm = {_clave_num(k): _clave_num(v) for k, v in (num_map or {}).items()}
+        nm.pop(None, None)
+        txt_maps.append(tm)
+        num_maps.append(nm)
+        for k in tm:
+            txt_vocab.setdefault(k, len(txt_vocab))
+        for k in nm:
+            num_vocab.setdefault(k, len(num_vocab))
+
+    # Términos (regla, ítem)
+    item_pos: dict[int, int] = {}
+    item_ids, ordenes, tipos = [], [], []
+    term_item, term_rule, pesos = [], [], []
+    for k, (_, q_from, q_to, weight, _, _, include_tipos, _) in enumerate(reglas):
+        incluidos = _tipos_incluidos(include_tipos)
+        for qid, orden, tipo in preguntas:
+            tipo = (tipo or "").upper()
+            if not (q_from <= orden <= q_to) or (incluidos is not None and tipo not in incluidos):
+                continue
+            if qid not in item_pos:
+                item_pos[qid] = len(item_ids)
+                item_ids.append(qid)
+                ordenes.append(orden)
+                tipos.append(tipo)
+            term_item.append(item_pos[qid])
+            term_rule.append(k)
+            pesos.append(float(weight if weight is not None else 1.0))
+
+    # Tablas: la última columna (índice -1) es "sin clave" y queda en NaN
+    T = len(term_item)
+    txt_tab = np.full((T, len(txt_vocab) + 1), np.nan)
+    num_tab = np.full((T, len(num_vocab) + 1), np.nan)
+    for t, k in enumerate(term_rule):
+        for clave, puntos in txt_maps[k].items():
+            if puntos is not None:
+                txt_tab[t, txt_vocab[clave]] = puntos
+        for clave, puntos in num_maps[k].items():
+            if puntos is not None:
+                num_tab[t, num_vocab[clave]] = puntos
+
+    sino_tab = np.full(len(txt_vocab) + 1, np.nan)
+    for clave, puntos in SI_NO_DEFAULT.items():
+        sino_tab[txt_vocab[clave]] = puntos
+
+    return RulePlan(
+        profile_id=profile.id,
+        nombre=profile.nombre,
+        cuestionario_id=profile.cuestionario_id,
+        algoritmo=(profile.algoritmo or "SUM").upper(),
+        firma=_firma(profile, reglas, preguntas),
+        reglas=tuple(
+            {"id": rid, "q_from": q_from, "q_to": q_to, "weight": weight, "desc": desc or ""}
+            for rid, q_from, q_to, weight, _, _, _, desc in reglas
+        ),
+        item_ids=tuple(item_ids),
+        ordenes=tuple(ordenes),
+        tipos=tuple(tipos),
+        txt_vocab=tuple(txt_vocab),
+        num_vocab=tuple(num_vocab),
+        term_item=np.array(term_item, dtype=int),
+        term_rule=np.array(term_rule, dtype=int),
+        pesos=np.array(pesos, dtype=float),
+        txt_tab=txt_tab,
+        num_tab=num_tab,
+        sino_tab=sino_tab,
+    )
+
+
+# ============================================================
+# Cache
+# ============================================================
+
+_lock = threading.Lock()
+_planes: dict[tuple[int, str], RulePlan] = {}
+_vigente: dict[int, tuple[str, float]] = {}   # profile_id -> (firma, revisado_en)
+
+
+def get_rule_plan(profile) -> RulePlan:
+    """Reglas compiladas del perfil; misma política de revalidación que get_scoring_plan."""
+    pid = profile.id
+    now = time.monotonic()
+
+    actual = _vigente.get(pid)
+    if actual is not None and now - actual[1] < PLAN_CHECK_SECONDS:
+        plan = _planes.get((pid, actual[0]))
+        if plan is not None:
+            return plan
+
+    reglas, preguntas = _leer(pid, profile.cuestionario_id)
+    firma = _firma(profile, reglas, preguntas)
+
+    with _lock:
+        plan = _planes.get((pid, firma))
+        if plan is None:
+            plan = compilar_reglas(profile, reglas, preguntas)
+            for key in [k for k in _planes if k[0] == pid]:
+                _planes.pop(key, None)
+            _planes[(pid, firma)] = plan
+        _vigente[pid] = (firma, now)
+    return plan
+
+
+def invalidar_reglas(profile_id=None, cuestionario_id=None) -> None:
+    with _lock:
+        for key, plan in list(_planes.items()):
+            if key[0] == profile_id or plan.cuestionario_id == cuestionario_id:
+                _planes.pop(key, None)
+                _vigente.pop(key[0], None)
+        if profile_id is not None:
+            _vigente.pop(profile_id, None)
+
+
+def limpiar_reglas() -> None:
+    with _lock:
+        _vigente.clear()
+        _planes.clear()
+
+
+@receiver([post_save, post_delete], sender=ScoringRule)
+def _regla_cambio(sender, instance, **kwargs):
+    invalidar_reglas(profile_id=instance.profile_id)
+
+
+@receiver([post_save, post_delete], sender=ScoringProfile)
+def _perfil_cambio(sender, instance, **kwargs):
+    invalidar_reglas(profile_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Pregunta)
+def _pregunta_cambio(sender, instance, **kwargs):
+    invalidar_reglas(cuestionario_id=instance.cuestionario_id)
+
+
+# ============================================================
+# Evaluación
+# ============================================================
+
+def _codigos(plan: RulePlan, rows, fila_por_sesion: dict[int, int]):
+    """
+    rows: (sesion_id, pregunta_id, opcion_valor, valor_texto, valor_numerico)
+    Matrices sesiones × ítems con el índice de cada clave (-1 = sin clave) y el valor crudo.
+    """
+    shape = (len(fila_por_sesion), len(plan.item_ids))
+    c_opc = np.full(shape, -1)
+    c_txt = np.full(shape, -1)
+    c_num = np.full(shape, -1)
+    crudo = np.full(shape, np.nan)
+    index, txt_index, num_index = plan.index, plan.txt_index, plan.num_index
+
+    for sid, qid, opc_valor, v_txt, v_num in rows:
+        j = index.get(qid)
+        i = fila_por_sesion.get(sid)
+        if j is None or i is None:
+            continue
+        if opc_valor is not None:
+            c_opc[i, j] = txt_index.get(normalizar_clave(opc_valor), -1)
+        if v_txt:
+            c_txt[i, j] = txt_index.get(normalizar_clave(v_txt), -1)
+        if v_num is not None:
+            v = _clave_num(v_num)
+            if v is not None:
+                c_num[i, j] = num_index.get(v, -1)
+                crudo[i, j] = v
+    return c_opc, c_txt, c_num, crudo
+
+
+def puntos_terminos(plan: RulePlan, c_opc, c_txt, c_num, crudo) -> np.ndarray:
+    """Puntos (sin peso) por sesión × término; NaN = la regla no califica ese ítem."""
+    t = np.arange(plan.n_terminos)[None, :]
+    j = plan.term_item
+    opc, txt, num = c_opc[:, j], c_txt[:, j], c_num[:, j]
+
+    v = plan.txt_tab[t, opc]
+    v = np.where(np.isnan(v), plan.txt_tab[t, txt], v)
+    v = np.where(np.isnan(v), plan.num_tab[t, num], v)
+    v = np.where(np.isnan(v), crudo[:, j], v)
+    return np.where(np.isnan(v), plan.sino_tab[txt], v)
+
+
+def score_rules_matrix(plan: RulePlan, sesion_ids: list[int], rows) -> dict[int, tuple[float, dict]]:
+    fila = {sid: i for i, sid in enumerate(sesion_ids)}
+    S = len(sesion_ids)
+    puntos = puntos_terminos(plan, *_codigos(plan, rows, fila))
+    contado = ~np.isnan(puntos)
+    ponderado = np.where(contado, puntos * plan.pesos, 0.0)
+    pesos = np.broadcast_to(plan.pesos, puntos.shape)
+
+    suma = _suma_filas(ponderado, contado)
+    suma_pesos = _suma_filas(pesos, contado)
+    contados = contado.sum(axis=1)
+    if plan.algoritmo == "AVG":
+        totales = np.divide(suma, suma_pesos, out=np.zeros(S), where=suma_pesos != 0)
+    else:
+        totales = suma
+
+    R = len(plan.reglas)
+    por_regla_total = np.zeros((S, R))
+    por_regla_count = np.zeros((S, R), dtype=int)
+    for k in range(R):
+        en_k = contado & (plan.term_rule == k)
+        por_regla_total[:, k] = _suma_filas(ponderado, en_k)
+        por_regla_count[:, k] = en_k.sum(axis=1)
+
+    out = {}
+    for i, sid in enumerate(sesion_ids):
+        puntos_l = puntos[i].tolist()
+        ponderado_l = ponderado[i].tolist()
+        por_pregunta: dict[int, dict] = {}
+        for t, (j, k) in enumerate(zip(plan.term_item.tolist(), plan.term_rule.tolist())):
+            if not contado[i, t]:
+                continue
+            qid = plan.item_ids[j]
+            item = por_pregunta.setdefault(qid, {
+                "orden": plan.ordenes[j], "tipo": plan.tipos[j], "puntos": 0.0, "reglas": [],
+            })
+            item["puntos"] += ponderado_l[t]
+            item["reglas"].append({"rule_id": plan.reglas[k]["id"], "valor": puntos_l[t]})
+
+        total = float(totales[i])
+        out[sid] = (total, {
+            "mode": "PROFILE",
+            "profile_id": plan.profile_id,
+            "profile": plan.nombre,
+            "algoritmo": plan.algoritmo,
+            "cuestionario_id": plan.cuestionario_id,
+            "sesion_id": sid,
+            "contados": int(contados[i]),
+            "suma_ponderada": float(suma[i]),
+            "suma_pesos": float(suma_pesos[i]),
+            "total": total,
+            "por_regla": [
+                {**r, "count": int(por_regla_count[i, k]), "subtotal": float(por_regla_total[i, k])}
+                for k, r in enumerate(plan.reglas)
+            ],
+            "por_pregunta": por_pregunta,
+        })
+    return out
+
+
+def score_profile_bulk(profile, sesiones) -> dict[int, tuple[float, dict]]:
+    """
+    Aplica el perfil a varias sesiones (de su cuestionario): 1 consulta de respuestas.
+    Retorna: {sesion_id: (total, breakdown)}
+    """
+    sesion_ids = [s.id if hasattr(s, "id") else int(s) for s in sesiones]
+    if not sesion_ids:
+        return {}
+    plan = get_rule_plan(profile)
+    rows = (
+        Respuesta.objects
+        .filter(sesion_id__in=sesion_ids, pregunta_id__in=plan.item_ids)
+        .values_list("sesion_id", *RESPUESTA_REGLA_FIELDS)
+    )
+    return score_rules_matrix(plan, sesion_ids, rows)
+
+
+def score_profile_for_session(profile, sesion) -> tuple[float, dict]:
+    return score_profile_bulk(profile, [sesion])[sesion.id]
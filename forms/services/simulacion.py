@@ -0,0 +1,129 @@
+# forms/services/simulacion.py
+"""
+Simulación "what-if" de un esquema de calificación sobre el histórico.
+
+Compila un plan candidato (config["scoring"] y/o overrides de Pregunta.config)
+sin guardarlo, y lo compara con el plan vigente sobre todas las sesiones
+COMPLETADAS del cuestionario:
+
+    1 consulta de respuestas -> matrices sesiones × ítems (una sola vez)
+    acotado / reverse / totales / bandas por plan, todo vectorizado
+
+No escribe nada en la BD.
+"""
+from __future__ import annotations
+
+import copy
+import time
+from collections import Counter
+
+import numpy as np
+
+from forms.models import Respuesta, SesionEvaluacion
+
+from .scoring_plan import (
+    RESPUESTA_FIELDS,
+    _leer_preguntas,
+    compilar_plan,
+    crudos_desde,
+    etiquetas_plan,
+    get_scoring_plan,
+    matrices_respuesta,
+    totales_matriz,
+)
+
+HIST_BINS = 20
+
+
+def plan_candidato(cuestionario, scoring: dict | None = None, preguntas: dict | None = None):
+    """
+    Plan con config["scoring"] reemplazado por `scoring` (si viene) y la config
+    de cada pregunta combinada con `preguntas[pregunta_id]`.
+    """
+    cu = copy.copy(cuestionario)
+    config = dict(getattr(cuestionario, "config", None) or {})
+    if scoring is not None:
+        config["scoring"] = scoring
+    cu.config = config
+
+    overrides = {int(k): v for k, v in (preguntas or {}).items()}
+    rows = []
+    for qid, tipo, orden, texto, cfg in _leer_preguntas(cuestionario.id):
+        if qid in overrides:
+            cfg = {**(cfg or {}), **overrides[qid]}
+        rows.append([qid, tipo, orden, texto, cfg])
+    return compilar_plan(cu, rows)
+
+
+def _stats(x: np.ndarray) -> dict:
+    if not len(x):
+        return {"n": 0}
+    p0, p25, p50, p75, p100 = np.percentile(x, [0, 25, 50, 75, 100]).tolist()
+    return {
+        "n": int(len(x)),
+        "media": float(x.mean()),
+        "std": float(x.std()),
+        "min": p0,
+        "p25": p25,
+        "mediana": p50,
+        "p75": p75,
+        "max": p100,
+    }
+
+
+def _comparar(actual: np.ndarray, candidato: np.ndarray, bins: int) -> dict:
+    out = {"actual": _stats(actual), "candidato": _stats(candidato)}
+    if len(actual):
+        bordes = np.histogram_bin_edges(np.concatenate([actual, candidato]), bins=bins)
+        out["histograma"] = {
+            "bordes": bordes.tolist(),
+            "actual": np.histogram(actual, bins=bordes)[0].tolist(),
+            "candidato": np.histogram(candidato, bins=bordes)[0].tolist(),
+        }
+    return out
+
+
+def _conteo(etiquetas) -> list[dict]:
+    return [{"etiqueta": k, "n": n} for k, n in Counter(etiquetas).most_common()]
+
+
+def simular_scoring(cuestionario, scoring: dict | None = None, preguntas: dict | None = None,
+                    bins: int = HIST_BINS) -> dict:
+    t0 = time.perf_counter()
+    actual = get_scoring_plan(cuestionario)
+    candidato = plan_candidato(cuestionario, scoring, preguntas)
+
+    sesion_ids = list(
+        SesionEvaluacion.objects
+        .filter(cuestionario_id=cuestionario.id, estado="COMPLETADA")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    fila = {sid: i for i, sid in enumerate(sesion_ids)}
+    rows = list(
+        Respuesta.objects
+        .filter(sesion__cuestionario_id=cuestionario.id, sesion__estado="COMPLETADA")
+        .values_list("sesion_id", *RESPUESTA_FIELDS)
+    )
+    # Mismos ítems en ambos planes (los overrides no cambian tipos): se leen una vez
+    num, sino = matrices_respuesta(actual, rows, fila)
+
+    tot_a, avg_a, _ = totales_matriz(actual, crudos_desde(actual, num, sino))
+    tot_c, avg_c, _ = totales_matriz(candidato, crudos_desde(candidato, num, sino))
+
+    n = len(sesion_ids)
+    et_a = etiquetas_plan(actual, tot_a, avg_a) or [None] * n
+    et_c = etiquetas_plan(candidato, tot_c, avg_c) or [None] * n
+    transiciones = Counter((a, c) for a, c in zip(et_a, et_c) if a != c)
+
+    return {
+        "cuestionario_id": cuestionario.id,
+        "n_sesiones": n,
+        "cambian_etiqueta": sum(transiciones.values()),
+        "cambian_total": int(np.count_nonzero(tot_a != tot_c)),
+        "transiciones": [{"de": a, "a": c, "n": k} for (a, c), k in transiciones.most_common()],
+        "etiquetas": {"actual": _conteo(et_a), "candidato": _conteo(et_c)},
+        "total": _comparar(tot_a, tot_c, bins),
+        "avg": _comparar(avg_a, avg_c, bins),
+        "segundos": time.perf_counter() - t0,
+    }
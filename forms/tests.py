@@ -1,3 +1,828 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+
+class ScoringPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Cuestionario, Pregunta, Respuesta, SesionEvaluacion, Usuario
+
+        cls.perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        cls.cu = Cuestionario.objects.create(codigo="mix", nombre="Mixto", estado="published")
+
+        def q(orden, tipo, **cfg):
+            return Pregunta.objects.create(
+                cuestionario=cls.cu, texto=f"P{orden}", tipo_respuesta=tipo, orden=orden, config=cfg,
+            )
+
+        cls.p1 = q(1, "ESCALA", subscale="A")
+        cls.p2 = q(2, "ESCALA", reverse=True, subscale="A")
+        cls.p3 = q(3, "ESCALA", min=0, max=3, var="X3")
+        cls.p4 = q(4, "SI_NO", subscale="B")
+        cls.p5 = q(5, "SI_NO", min=1, max=5, reverse=True)
+        cls.p6 = q(6, "TEXTO")
+        cls.p7 = q(7, "ESCALA")  # sin respuesta
+
+        cls.sesion = SesionEvaluacion.objects.create(cuestionario=cls.cu, estudiante=cls.perfil, estado="COMPLETADA")
+        Respuesta.objects.bulk_create([
+            Respuesta(sesion=cls.sesion, pregunta=cls.p1, valor_numerico=4),
+            Respuesta(sesion=cls.sesion, pregunta=cls.p2, valor_numerico=9),    # clamp 5 -> reverse 1
+            Respuesta(sesion=cls.sesion, pregunta=cls.p3, valor_numerico=2.5),
+            Respuesta(sesion=cls.sesion, pregunta=cls.p4, valor_texto=" sí "),
+            Respuesta(sesion=cls.sesion, pregunta=cls.p5, valor_texto="NO"),    # min 1 -> reverse 5
+            Respuesta(sesion=cls.sesion, pregunta=cls.p6, valor_texto="libre"),
+        ])
+
+    def setUp(self):
+        from forms.services.scoring_plan import limpiar_planes
+
+        limpiar_planes()
+        self.addCleanup(limpiar_planes)
+
+    def test_breakdown(self):
+        from forms.services import compute_auto_sum_for_session
+
+        total, b = compute_auto_sum_for_session(self.sesion)
+
+        self.assertEqual(total, 4 + 1 + 2.5 + 1 + 5)
+        self.assertEqual((b["items_sumables"], b["contados"]), (6, 5))
+        self.assertEqual((b["total_min"], b["total_max"]), (1 + 1 + 0 + 0 + 1, 5 + 5 + 3 + 1 + 5))
+        self.assertEqual(b["avg"], total / 5)
+        self.assertEqual(list(b["subscales"]), ["A", "B"])
+        self.assertEqual(b["subscales"]["A"], {
+            "total": 5.0, "min": 2.0, "max": 10.0, "count": 2, "avg": 2.5, "media_teorica": 6.0,
+        })
+
+        pp = b["por_pregunta"]
+        self.assertNotIn(self.p6.id, pp)
+        self.assertEqual((pp[self.p2.id]["valor_raw"], pp[self.p2.id]["valor"]), (5.0, 1.0))
+        self.assertEqual((pp[self.p5.id]["valor_raw"], pp[self.p5.id]["valor"]), (1.0, 5.0))
+        self.assertEqual(pp[self.p3.id]["var"], "X3")
+        self.assertEqual(pp[self.p1.id]["var"], "MIX_01")
+        self.assertIsNone(pp[self.p7.id]["valor"])
+
+    def test_plan_is_cached_and_invalidated_on_edit(self):
+        from forms.services import compute_auto_sum_for_session
+        from forms.services.scoring_plan import get_scoring_plan
+
+        plan = get_scoring_plan(self.cu)
+        with self.assertNumQueries(1):  # solo respuestas
+            compute_auto_sum_for_session(self.sesion)
+        self.assertIs(get_scoring_plan(self.cu), plan)
+
+        self.p1.config = {"subscale": "A", "reverse": True}
+        self.p1.save()
+
+        nuevo = get_scoring_plan(self.cu)
+        self.assertIsNot(nuevo, plan)
+        self.assertNotEqual(nuevo.firma, plan.firma)
+        total, _ = compute_auto_sum_for_session(self.sesion)
+        self.assertEqual(total, 2 + 1 + 2.5 + 1 + 5)
+
+
+class BulkScoringTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        import random
+
+        from forms.models import Cuestionario, Pregunta, Respuesta, SesionEvaluacion, Usuario
+
+        rnd = random.Random(0)
+        perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+
+        def crear(codigo, bands):
+            cu = Cuestionario.objects.create(
+                codigo=codigo, nombre=codigo, estado="published",
+                config={"scoring": {"mode": "SUM", "bands": bands}},
+            )
+            preguntas = []
+            for i in range(1, 13):
+                tipo = "SI_NO" if i % 5 == 0 else ("TEXTO" if i == 7 else "ESCALA")
+                cfg = {"reverse": i % 3 == 0, "subscale": "AB"[i % 2] if i % 4 else None}
+                if i == 2:
+                    cfg.update(min=0, max=10)
+                preguntas.append(Pregunta.objects.create(
+                    cuestionario=cu, texto=f"{codigo} {i}", tipo_respuesta=tipo, orden=i, config=cfg,
+                ))
+            for _ in range(15):
+                s = SesionEvaluacion.objects.create(cuestionario=cu, estudiante=perfil, estado="COMPLETADA")
+                Respuesta.objects.bulk_create([
+                    Respuesta(
+                        sesion=s, pregunta=p,
+                        valor_numerico=rnd.choice([None, rnd.randint(0, 12), rnd.random() * 5]),
+                        valor_texto=rnd.choice(["SI", "no", ""]),
+                    )
+                    for p in preguntas if rnd.random() < 0.8
+                ])
+            return cu
+
+        # Bandas ordenadas (np.digitize) y con traslape (la primera gana)
+        cls.ordenado = crear("ORD", [{"min": 0, "max": 15, "label": "Bajo"},
+                                     {"min": 15, "max": 30, "label": "Medio"},
+                                     {"min": 31, "max": 99, "label": "Alto"}])
+        cls.traslape = crear("TRA", [{"min": 10, "max": 40, "label": "Amplia"},
+                                     {"min": 0, "max": 20, "label": "Baja"}])
+
+    def setUp(self):
+        from forms.services.scoring_plan import limpiar_planes
+
+        limpiar_planes()
+        self.addCleanup(limpiar_planes)
+
+    def test_matches_single_session_scoring(self):
+        from forms.models import SesionEvaluacion
+        from forms.services import compute_auto_sum_bulk, compute_auto_sum_for_session
+        from forms.services.scoring import _apply_scoring_scheme
+
+        sesiones = list(SesionEvaluacion.objects.select_related("cuestionario"))
+        bulk = compute_auto_sum_bulk(sesiones)
+        self.assertEqual(len(bulk), 30)
+
+        for s in sesiones:
+            total, breakdown = compute_auto_sum_for_session(s)
+            self.assertEqual(bulk[s.id], (total, breakdown))
+
+            esperado = _apply_scoring_scheme(
+                s.cuestionario, total, breakdown["total_min"], breakdown["total_max"], breakdown["contados"],
+            )["label"]
+            self.assertEqual(breakdown["banda"], esperado)
+
+    def test_single_answers_query(self):
+        from forms.models import SesionEvaluacion
+        from forms.services import compute_auto_sum_bulk
+
+        sesiones = list(SesionEvaluacion.objects.select_related("cuestionario"))
+        compute_auto_sum_bulk(sesiones)  # compila los planes
+        with self.assertNumQueries(1):
+            compute_auto_sum_bulk(sesiones)
+
+
+class ScoringRulesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import (
+            Cuestionario, Opcion, Pregunta, Respuesta, ScoringProfile, ScoringRule, SesionEvaluacion, Usuario,
+        )
+
+        perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        cls.cu = Cuestionario.objects.create(codigo="REG", nombre="Reglas", estado="published")
+
+        def q(orden, tipo):
+            return Pregunta.objects.create(cuestionario=cls.cu, texto=f"P{orden}", tipo_respuesta=tipo, orden=orden)
+
+        p1, p2, p3, p4, p5 = q(1, "ESCALA"), q(2, "ESCALA"), q(3, "SI_NO"), q(4, "OPCION_UNICA"), q(5, "TEXTO")
+        opcion = Opcion.objects.create(pregunta=p4, texto="Totalmente de acuerdo", valor="totalmente_de_acuerdo")
+
+        cls.profile = ScoringProfile.objects.create(cuestionario=cls.cu, nombre="Custom", algoritmo="SUM")
+        cls.r1 = ScoringRule.objects.create(
+            profile=cls.profile, q_from=1, q_to=2, weight=2,
+            num_map={"1": 0, "2": 1, "3": 2, "4": 3, "5": 4},
+        )
+        ScoringRule.objects.create(
+            profile=cls.profile, q_from=2, q_to=4, weight=1, include_tipos="SI_NO, OPCION_UNICA",
+            txt_map={"totalmente_de_acuerdo": 5},
+        )
+        ScoringRule.objects.create(profile=cls.profile, q_from=1, q_to=5, weight=0.5, include_tipos="ESCALA")
+
+        cls.s1 = SesionEvaluacion.objects.create(cuestionario=cls.cu, estudiante=perfil, estado="COMPLETADA")
+        cls.s2 = SesionEvaluacion.objects.create(cuestionario=cls.cu, estudiante=perfil, estado="COMPLETADA")
+        Respuesta.objects.bulk_create([
+            Respuesta(sesion=cls.s1, pregunta=p1, valor_numerico=4),
+            Respuesta(sesion=cls.s1, pregunta=p2, valor_numerico=7),   # fuera de num_map -> crudo
+            Respuesta(sesion=cls.s1, pregunta=p3, valor_texto="Sí"),
+            Respuesta(sesion=cls.s1, pregunta=p4, opcion_seleccionada=opcion, valor_texto=opcion.texto),
+            Respuesta(sesion=cls.s1, pregunta=p5, valor_texto="hola"),
+            Respuesta(sesion=cls.s2, pregunta=p1, valor_numerico=1),
+        ])
+
+    def setUp(self):
+        from forms.services.scoring_rules import limpiar_reglas
+
+        limpiar_reglas()
+        self.addCleanup(limpiar_reglas)
+
+    def test_rules_sum(self):
+        from forms.services import score_profile_for_session
+
+        total, b = score_profile_for_session(self.profile, self.s1)
+
+        # r1: (3 + 7) * 2, r2: 1 + 5, r3: (4 + 7) * 0.5
+        self.assertEqual(total, 20 + 6 + 5.5)
+        self.assertEqual(b["contados"], 6)
+        self.assertEqual([r["subtotal"] for r in b["por_regla"]], [20.0, 6.0, 5.5])
+        self.assertEqual([r["count"] for r in b["por_regla"]], [2, 2, 2])
+        self.assertEqual(len(b["por_pregunta"]), 4)
+
+    def test_bulk_matches_single_and_avg(self):
+        from forms.services import score_profile_bulk, score_profile_for_session
+
+        bulk = score_profile_bulk(self.profile, [self.s1, self.s2])
+        self.assertEqual(bulk[self.s1.id], score_profile_for_session(self.profile, self.s1))
+        self.assertEqual(bulk[self.s2.id][0], 0 * 2 + 1 * 0.5)
+
+        self.profile.algoritmo = "AVG"
+        self.profile.save()
+        total, b = score_profile_for_session(self.profile, self.s1)
+        self.assertEqual(b["suma_pesos"], 2 + 2 + 1 + 1 + 0.5 + 0.5)
+        self.assertEqual(total, 31.5 / 7)
+
+    def test_rules_cached_and_invalidated_on_edit(self):
+        from forms.services import score_profile_for_session
+
+        score_profile_for_session(self.profile, self.s1)
+        with self.assertNumQueries(1):  # solo respuestas
+            score_profile_for_session(self.profile, self.s1)
+
+        self.r1.weight = 1
+        self.r1.save()
+        total, _ = score_profile_for_session(self.profile, self.s1)
+        self.assertEqual(total, 10 + 6 + 5.5)
+
+
+class ScoringBulkJobTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Cuestionario, Pregunta, Respuesta, SesionEvaluacion, Usuario
+
+        perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        cls.cu = Cuestionario.objects.create(codigo="JOB", nombre="Job", estado="published")
+        preguntas = [
+            Pregunta.objects.create(cuestionario=cls.cu, texto=f"P{i}", tipo_respuesta="ESCALA", orden=i)
+            for i in range(1, 4)
+        ]
+        for k in range(7):
+            s = SesionEvaluacion.objects.create(
+                cuestionario=cls.cu, estudiante=perfil, estado="COMPLETADA" if k < 6 else "EN_CURSO",
+            )
+            Respuesta.objects.bulk_create([
+                Respuesta(sesion=s, pregunta=p, valor_numerico=(k + p.orden) % 5 + 1) for p in preguntas
+            ])
+
+    def setUp(self):
+        from forms.services.scoring_plan import limpiar_planes
+
+        limpiar_planes()
+        self.addCleanup(limpiar_planes)
+
+    def test_job_upserts_in_chunks(self):
+        from forms.models import CalificacionSesion, SesionEvaluacion, TrabajoScoring
+        from forms.services import compute_auto_sum_for_session
+        from forms.services.scoring_bulk import ejecutar_trabajo
+
+        trabajo = TrabajoScoring.objects.create(cuestionario=self.cu, filtros={"estado": "COMPLETADA"})
+        t = ejecutar_trabajo(trabajo.pk, chunk_size=4)
+        self.assertEqual((t.estado, t.total, t.procesados, t.creados, t.actualizados), ("COMPLETADO", 6, 6, 6, 0))
+
+        for cal in CalificacionSesion.objects.select_related("sesion__cuestionario", "profile"):
+            self.assertEqual(cal.profile.nombre, "Auto (SUM/AVG)")
+            total, breakdown = compute_auto_sum_for_session(cal.sesion)
+            self.assertEqual(cal.total, total)
+            self.assertEqual(cal.desglose, json.loads(json.dumps({"mode": "AUTO", **breakdown})))
+
+        SesionEvaluacion.objects.filter(estado="EN_CURSO").update(estado="COMPLETADA")
+        t = ejecutar_trabajo(TrabajoScoring.objects.create(cuestionario=self.cu, filtros={"estado": "COMPLETADA"}).pk)
+        self.assertEqual((t.creados, t.actualizados), (1, 6))
+        self.assertEqual(CalificacionSesion.objects.count(), 7)
+
+    def test_profile_mode_and_error(self):
+        from forms.models import CalificacionSesion, ScoringProfile, ScoringRule, TrabajoScoring
+        from forms.services.scoring_bulk import ejecutar_trabajo
+
+        profile = ScoringProfile.objects.create(cuestionario=self.cu, nombre="Custom")
+        ScoringRule.objects.create(profile=profile, q_from=1, q_to=3, weight=2)
+        t = ejecutar_trabajo(TrabajoScoring.objects.create(
+            cuestionario=self.cu, profile=profile, modo="PROFILE", filtros={"estado": "COMPLETADA"},
+        ).pk)
+        self.assertEqual((t.estado, t.creados), ("COMPLETADO", 6))
+        self.assertEqual(CalificacionSesion.objects.filter(profile=profile).count(), 6)
+
+        t = ejecutar_trabajo(TrabajoScoring.objects.create(cuestionario=self.cu, modo="PROFILE").pk)
+        self.assertEqual(t.estado, "ERROR")
+        self.assertIn("ScoringProfile", t.error)
+
+    def test_job_runs_on_durable_queue(self):
+        from forms.models import ScoringProfile, TrabajoScoring
+        from resultados.cola import procesar_pendientes
+        from resultados.models import TareaCola
+        from resultados.tasks import encolar_scoring_bulk
+
+        profile = ScoringProfile.objects.create(cuestionario=self.cu, nombre="Custom")
+        trabajo = TrabajoScoring.objects.create(cuestionario=self.cu, profile=profile, modo="PROFILE")
+        encolar_scoring_bulk(trabajo.pk)  # sin commit: queda PENDIENTE como si el proceso muriera
+        profile.delete()
+
+        TareaCola.objects.exclude(tipo="scoring_bulk").delete()  # post_envio de las sesiones de prueba
+        self.assertEqual(procesar_pendientes(), {"ok": 1, "fallidas": 0, "omitidas": 0})
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, "ERROR")
+        self.assertIn("ya no existe", trabajo.error)
+        self.assertEqual(TareaCola.objects.get(clave=f"scoring_bulk:{trabajo.pk}").estado, "COMPLETADO")
+
+
+class RecalificacionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import (
+            CalificacionSesion, Cuestionario, Pregunta, Respuesta, ScoringProfile, ScoringRule, SesionEvaluacion, Usuario,
+        )
+        from forms.services import compute_auto_sum_for_session, score_profile_for_session
+        from forms.services.scoring_plan import get_scoring_plan
+        from forms.services.scoring_rules import get_rule_plan
+
+        perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        cls.cu = Cuestionario.objects.create(codigo="REC", nombre="Rec", estado="published")
+        cls.p1 = Pregunta.objects.create(cuestionario=cls.cu, texto="P1", tipo_respuesta="ESCALA", orden=1)
+        p2 = Pregunta.objects.create(cuestionario=cls.cu, texto="P2", tipo_respuesta="ESCALA", orden=2)
+        cls.profile = ScoringProfile.objects.create(cuestionario=cls.cu, nombre="Custom")
+        ScoringRule.objects.create(profile=cls.profile, q_from=1, q_to=2, weight=1)
+
+        for k in range(3):
+            s = SesionEvaluacion.objects.create(cuestionario=cls.cu, estudiante=perfil, estado="COMPLETADA")
+            Respuesta.objects.bulk_create([
+                Respuesta(sesion=s, pregunta=cls.p1, valor_numerico=k + 1),
+                Respuesta(sesion=s, pregunta=p2, valor_numerico=5),
+            ])
+            s = SesionEvaluacion.objects.select_related("cuestionario").get(pk=s.pk)
+            total, detalle = compute_auto_sum_for_session(s)
+            CalificacionSesion.objects.create(
+                sesion=s, total=total, detalle=detalle, config_hash=get_scoring_plan(cls.cu).hash_scoring,
+            )
+            total, detalle = score_profile_for_session(cls.profile, s)
+            CalificacionSesion.objects.create(
+                sesion=s, profile=cls.profile, total=total, detalle=detalle,
+                config_hash=get_rule_plan(cls.profile).firma,
+            )
+
+    def setUp(self):
+        from forms.services.scoring_plan import limpiar_planes
+        from forms.services.scoring_rules import limpiar_reglas
+
+        limpiar_planes()
+        limpiar_reglas()
+        self.addCleanup(limpiar_planes)
+        self.addCleanup(limpiar_reglas)
+
+    def test_only_stale_rows_are_rescored(self):
+        from forms.models import CalificacionSesion
+        from forms.services.recalificacion import recalificar_desactualizadas
+
+        self.assertEqual(recalificar_desactualizadas(self.cu.pk), {"auto": 0, "perfiles": {}})
+
+        # Texto / var no afectan el resultado: no dejan nada desactualizado
+        self.p1.texto = "P1 corregida"
+        self.p1.config = {"var": "REC_A"}
+        self.p1.save()
+        self.assertEqual(recalificar_desactualizadas(self.cu.pk), {"auto": 0, "perfiles": {}})
+
+        # reverse en P1: cambia la auto-suma, no el perfil (sus reglas no usan config)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.p1.config = {"reverse": True}
+            self.p1.save()
+        self.assertTrue(callbacks)
+
+        self.assertEqual(recalificar_desactualizadas(self.cu.pk), {"auto": 3, "perfiles": {}})
+        auto = CalificacionSesion.objects.filter(profile__isnull=True).order_by("sesion_id")
+        self.assertEqual([c.total for c in auto], [5 + 5, 4 + 5, 3 + 5])
+        self.assertEqual(auto[0].desglose["por_pregunta"][str(self.p1.pk)]["valor"], 5.0)
+
+        self.assertEqual(recalificar_desactualizadas(self.cu.pk), {"auto": 0, "perfiles": {}})
+
+    @override_settings(RESULTADOS_TASKS_SYNC=True)
+    def test_rule_edit_triggers_background_rescore(self):
+        from forms.models import CalificacionSesion
+
+        rule = self.profile.rules.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.weight = 2
+            rule.save()
+
+        totales = CalificacionSesion.objects.filter(profile=self.profile).order_by("sesion_id")
+        self.assertEqual([c.total for c in totales], [12.0, 14.0, 16.0])
+
+
+class SimulacionScoringTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Cuestionario, Pregunta, Respuesta, SesionEvaluacion, Usuario
+
+        perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        cls.cu = Cuestionario.objects.create(
+            codigo="SIM", nombre="Sim", estado="published",
+            config={"scoring": {"mode": "SUM", "bands": [{"min": 0, "max": 7, "label": "Bajo"},
+                                                         {"min": 8, "max": 99, "label": "Alto"}]}},
+        )
+        cls.p1 = Pregunta.objects.create(cuestionario=cls.cu, texto="P1", tipo_respuesta="ESCALA", orden=1)
+        p2 = Pregunta.objects.create(cuestionario=cls.cu, texto="P2", tipo_respuesta="ESCALA", orden=2)
+
+        # Totales 6, 7, 10 -> Bajo, Bajo, Alto; la sesión en curso no cuenta
+        for v, estado in [(1, "COMPLETADA"), (2, "COMPLETADA"), (5, "COMPLETADA"), (5, "EN_CURSO")]:
+            s = SesionEvaluacion.objects.create(cuestionario=cls.cu, estudiante=perfil, estado=estado)
+            Respuesta.objects.bulk_create([
+                Respuesta(sesion=s, pregunta=cls.p1, valor_numerico=v),
+                Respuesta(sesion=s, pregunta=p2, valor_numerico=5),
+            ])
+
+    def setUp(self):
+        from forms.services.scoring_plan import limpiar_planes
+
+        limpiar_planes()
+        self.addCleanup(limpiar_planes)
+
+    def test_same_config_changes_nothing(self):
+        from forms.services.simulacion import simular_scoring
+
+        r = simular_scoring(self.cu)
+        self.assertEqual(r["n_sesiones"], 3)
+        self.assertEqual((r["cambian_etiqueta"], r["cambian_total"], r["transiciones"]), (0, 0, []))
+        self.assertEqual(r["etiquetas"]["actual"], r["etiquetas"]["candidato"])
+        self.assertEqual(r["total"]["actual"]["mediana"], 7.0)
+
+    def test_candidate_config_is_not_saved(self):
+        from forms.models import Cuestionario, Pregunta
+        from forms.services.simulacion import simular_scoring
+
+        # reverse en P1: 6, 7, 10 -> 10, 9, 6
+        r = simular_scoring(self.cu, preguntas={str(self.p1.pk): {"reverse": True}})
+        self.assertEqual(r["cambian_etiqueta"], 3)
+        self.assertEqual(r["transiciones"], [{"de": "Bajo", "a": "Alto", "n": 2}, {"de": "Alto", "a": "Bajo", "n": 1}])
+        self.assertEqual(r["etiquetas"]["candidato"], [{"etiqueta": "Alto", "n": 2}, {"etiqueta": "Bajo", "n": 1}])
+        self.assertEqual(sum(r["total"]["histograma"]["candidato"]), 3)
+
+        # Solo bandas: nadie cambia de total, todos pasan a "Alto"
+        r = simular_scoring(self.cu, scoring={"mode": "SUM", "bands": [{"min": 0, "max": 99, "label": "Alto"}]})
+        self.assertEqual((r["cambian_etiqueta"], r["cambian_total"]), (2, 0))
+
+        self.assertEqual(Pregunta.objects.get(pk=self.p1.pk).config, {})
+        self.assertEqual(len(Cuestionario.objects.get(pk=self.cu.pk).config["scoring"]["bands"]), 2)
+
+
+class DetalleCompactoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Cuestionario, Pregunta, Respuesta, SesionEvaluacion, Usuario
+
+        perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        cls.cu = Cuestionario.objects.create(
+            codigo="CMP", nombre="Compacto", estado="published",
+            config={"scoring": {"mode": "SUM", "bands": [{"min": 0, "max": 99, "label": "Todo"}]}},
+        )
+        preguntas = [
+            Pregunta.objects.create(
+                cuestionario=cls.cu, texto="Pregunta larga " * 12, tipo_respuesta=tipo, orden=i, config=cfg,
+            )
+            for i, (tipo, cfg) in enumerate([
+                ("ESCALA", {"subscale": "A"}),
+                ("ESCALA", {"reverse": True, "subscale": "A", "var": "V2"}),
+                ("SI_NO", {}),
+                ("ESCALA", {"min": 0, "max": 3}),  # sin respuesta
+            ], start=1)
+        ]
+        cls.sesion = SesionEvaluacion.objects.create(cuestionario=cls.cu, estudiante=perfil, estado="COMPLETADA")
+        Respuesta.objects.bulk_create([
+            Respuesta(sesion=cls.sesion, pregunta=preguntas[0], valor_numerico=4),
+            Respuesta(sesion=cls.sesion, pregunta=preguntas[1], valor_numerico=2),
+            Respuesta(sesion=cls.sesion, pregunta=preguntas[2], valor_texto="SI"),
+        ])
+
+    def setUp(self):
+        from forms.services.scoring_plan import limpiar_planes
+
+        limpiar_planes()
+        self.addCleanup(limpiar_planes)
+
+    def _completo(self):
+        from forms.models import SesionEvaluacion
+        from forms.services import compute_auto_sum_for_session
+
+        sesion = SesionEvaluacion.objects.select_related("cuestionario").get(pk=self.sesion.pk)
+        return compute_auto_sum_for_session(sesion)
+
+    def test_round_trip_through_database(self):
+        from forms.models import CalificacionSesion
+        from forms.services.scoring_plan import compactar_detalle, get_scoring_plan
+
+        total, breakdown = self._completo()
+        compacto = compactar_detalle(breakdown, get_scoring_plan(self.cu))
+        self.assertNotIn("por_pregunta", compacto)
+        self.assertLess(len(json.dumps(compacto)) * 3, len(json.dumps(breakdown)))
+
+        CalificacionSesion.objects.create(sesion=self.sesion, total=total, detalle=compacto)
+        cal = CalificacionSesion.objects.select_related("sesion__cuestionario").get()
+        self.assertEqual(cal.desglose, json.loads(json.dumps(breakdown)))
+
+        # Cambia el plan después de calificar: los metadatos vigentes no son los usados
+        p = self.cu.preguntas.get(orden=1)
+        p.config = {"subscale": "A", "max": 7}
+        p.save()
+        cal = CalificacionSesion.objects.select_related("sesion__cuestionario").get()
+        self.assertTrue(cal.desglose["plan_desactualizado"])
+
+    def test_migration_compacts_legacy_rows(self):
+        import importlib
+
+        from django.apps import apps
+
+        from forms.models import CalificacionSesion, ScoringProfile
+        from forms.services.scoring_plan import get_scoring_plan
+
+        total, breakdown = self._completo()
+        legado = CalificacionSesion.objects.create(sesion=self.sesion, total=total, detalle=breakdown)
+        perfil = ScoringProfile.objects.create(cuestionario=self.cu, nombre="Reglas")
+        detalle_perfil = {"mode": "PROFILE", "por_pregunta": {"1": {"valor": 1.0}}}
+        por_reglas = CalificacionSesion.objects.create(
+            sesion=self.sesion, profile=perfil, total=1, detalle=detalle_perfil,
+        )
+
+        # Calificada con otra configuración (reverse apagado en P2)
+        from forms.models import SesionEvaluacion
+
+        otra_sesion = SesionEvaluacion.objects.create(
+            cuestionario=self.cu, estudiante=self.sesion.estudiante, estado="COMPLETADA",
+        )
+        viejo = json.loads(json.dumps(breakdown))
+        next(iter(r for r in viejo["por_pregunta"].values() if r["reverse"]))["reverse"] = False
+        anterior = CalificacionSesion.objects.create(sesion=otra_sesion, total=total, detalle=viejo)
+
+        migracion = importlib.import_module("forms.migrations.0037_compactar_detalle_calificacion")
+        with self.assertLogs(migracion.__name__, level="INFO") as logs:
+            migracion.compactar(apps, None)
+        self.assertIn("1 filas compactadas", logs.output[0])
+        self.assertIn("1 con otra configuración", logs.output[0])
+
+        legado = CalificacionSesion.objects.get(pk=legado.pk)
+        self.assertEqual(legado.detalle["formato"], 2)
+        self.assertEqual(legado.detalle["plan"], get_scoring_plan(self.cu).hash_scoring)
+        self.assertEqual(legado.config_hash, get_scoring_plan(self.cu).hash_scoring)
+        self.assertEqual(CalificacionSesion.objects.get(pk=anterior.pk).config_hash, "")
+        self.assertEqual(legado.desglose, json.loads(json.dumps(breakdown)))
+        self.assertEqual(CalificacionSesion.objects.get(pk=anterior.pk).desglose, viejo)
+        self.assertEqual(CalificacionSesion.objects.get(pk=por_reglas.pk).detalle, detalle_perfil)
+
+
+class OpcionValorNumTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Cuestionario, Opcion, Pregunta, Respuesta, SesionEvaluacion, Usuario
+
+        perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        cls.cu = Cuestionario.objects.create(codigo="OPC", nombre="Opciones", estado="published")
+        p = Pregunta.objects.create(cuestionario=cls.cu, texto="P1", tipo_respuesta="OPCION_UNICA", orden=1, codigo="OPC_01")
+        cls.tres = Opcion.objects.create(pregunta=p, texto="Tres", valor=" 3 ", orden=1)
+        cls.letra = Opcion.objects.create(pregunta=p, texto="Hombre", valor="H", orden=2)
+
+        # Respuesta guardada solo con la opción (sin valor_numerico)
+        cls.sesion = SesionEvaluacion.objects.create(cuestionario=cls.cu, estudiante=perfil, estado="COMPLETADA")
+        Respuesta.objects.create(sesion=cls.sesion, pregunta=p, opcion_seleccionada=cls.tres)
+
+    def setUp(self):
+        from forms.services.opciones import limpiar_opciones
+
+        limpiar_opciones()
+        self.addCleanup(limpiar_opciones)
+
+    def test_valor_num_maintained_on_save(self):
+        self.assertEqual((self.tres.valor_num, self.letra.valor_num), (3.0, None))
+
+        self.letra.valor = "2.5"
+        self.letra.save(update_fields=["valor"])
+        self.letra.refresh_from_db()
+        self.assertEqual(self.letra.valor_num, 2.5)
+
+    def test_cached_map_and_readers_without_join(self):
+        from forms.services.opciones import valores_opciones
+        from resultados.feature_builders import get_numeric_answers_by_code
+        from resultados.services import _get_answers_dict_by_prefix
+
+        with self.assertNumQueries(1):
+            self.assertEqual(valores_opciones(self.cu.pk), {self.tres.pk: 3.0})
+            valores_opciones(self.cu.pk)
+
+        self.assertEqual(_get_answers_dict_by_prefix(self.sesion.pk, "OPC_", 1), {"OPC_01": 3.0})
+
+        self.tres.valor = "4"
+        self.tres.save()  # invalida el mapa del cuestionario
+        self.assertEqual(get_numeric_answers_by_code(self.sesion), {"OPC_01": 4.0})
+
+
+class GuardarRespuestasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Cuestionario, Opcion, Pregunta, SesionEvaluacion, Usuario
+
+        perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        cu = Cuestionario.objects.create(codigo="CASO-A30", nombre="Caso", estado="published")
+        tipos = ["ESCALA"] * 26 + ["OPCION_UNICA", "OPCION_MULTIPLE", "TEXTO", "NUMERICA"]
+        for i, tipo in enumerate(tipos, start=1):
+            p = Pregunta.objects.create(cuestionario=cu, texto=f"P{i}", tipo_respuesta=tipo, orden=i)
+            if tipo.startswith("OPCION"):
+                for k in range(1, 4):
+                    Opcion.objects.create(pregunta=p, texto=f"Op {k}", valor=str(k), orden=k)
+        cls.sesion = SesionEvaluacion.objects.create(cuestionario=cu, estudiante=perfil)
+
+    def _preguntas(self):
+        return list(self.sesion.cuestionario.preguntas.prefetch_related("opciones").order_by("orden"))
+
+    def _post(self, preguntas, escala):
+        unica, multiple, texto, numerica = preguntas[26:]
+        post = {f"preg_{p.id}": [str(escala)] for p in preguntas[:26]}
+        post[f"preg_{unica.id}"] = [str(unica.opciones.all()[1].pk)]
+        post[f"preg_{multiple.id}"] = ["1", "3"]
+        post[f"preg_{texto.id}"] = ["  hola "]
+        post[f"preg_{numerica.id}"] = ["7.5"]
+        return post
+
+    def test_single_upsert_per_submit(self):
+        from forms.models import Respuesta
+        from forms.services.respuestas import guardar_respuestas
+
+        preguntas = self._preguntas()
+        with self.assertNumQueries(1):
+            self.assertEqual(guardar_respuestas(self.sesion, preguntas, self._post(preguntas, 2)), 30)
+
+        # Reenvío: actualiza las mismas filas
+        with self.assertNumQueries(1):
+            guardar_respuestas(self.sesion, preguntas, self._post(preguntas, 4))
+
+        respuestas = {r.pregunta.orden: r for r in Respuesta.objects.filter(sesion=self.sesion).select_related("pregunta")}
+        self.assertEqual(len(respuestas), 30)
+        self.assertEqual(respuestas[1].valor_numerico, 4.0)
+        self.assertEqual((respuestas[27].valor_texto, respuestas[27].valor_numerico), ("Op 2", 2.0))
+        self.assertEqual(respuestas[28].opciones_multiple, ["1", "3"])
+        self.assertEqual(respuestas[29].valor_texto, "hola")
+        self.assertEqual(respuestas[30].valor_numerico, 7.5)
+
+    def test_missing_items_evaluated_in_memory(self):
+        from forms.services.respuestas import guardar_respuestas, preguntas_faltantes
+
+        preguntas = self._preguntas()
+        post = self._post(preguntas, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(preguntas_faltantes(preguntas, post), [])
+
+        unica, multiple, texto, numerica = preguntas[26:]
+        del post[f"preg_{preguntas[0].id}"]
+        post[f"preg_{preguntas[1].id}"] = ["x"]        # ESCALA no numérica
+        post[f"preg_{unica.id}"] = ["999999"]          # opción de otra pregunta
+        post[f"preg_{texto.id}"] = ["   "]
+        with self.assertNumQueries(0):
+            faltantes = preguntas_faltantes(preguntas, post)
+        self.assertEqual([p.orden for p in faltantes], [1, 2, 27, 29])
+
+        # Misma conclusión que el conteo en BD una vez guardado
+        guardar_respuestas(self.sesion, preguntas, post)
+        self.assertFalse(self.sesion.puede_completarse(preguntas, post))
+        self.assertFalse(self.sesion.puede_completarse())
+        post = self._post(preguntas, 3)
+        guardar_respuestas(self.sesion, preguntas, post)
+        self.assertTrue(self.sesion.puede_completarse(preguntas, post))
+        self.assertTrue(self.sesion.puede_completarse())
+
+    def test_autosave_writes_only_changes(self):
+        from django.http import QueryDict
+
+        from forms.models import Respuesta
+        from forms.services.respuestas import (
+            autoguardar_respuestas,
+            guardar_respuestas,
+            preguntas_faltantes,
+            respuestas_de_sesion,
+            valores_guardados,
+            valores_post,
+        )
+
+        preguntas = self._preguntas()
+        p1, p2, multiple = preguntas[0], preguntas[1], preguntas[27]
+        cambios = valores_post(
+            QueryDict(f"preg_{p1.id}=3&preg_{p2.id}=4&preg_{multiple.id}[]=1&preg_{multiple.id}[]=2&otro=1"),
+            con_vacios=True,
+        )
+        self.assertEqual(set(cambios), {f"preg_{p1.id}", f"preg_{p2.id}", f"preg_{multiple.id}"})
+        with self.assertNumQueries(1):
+            self.assertEqual(autoguardar_respuestas(self.sesion, preguntas, cambios), (3, 0))
+
+        # Borrar una respuesta (valor vacío) y cambiar otra
+        cambios = valores_post(QueryDict(f"preg_{p1.id}=&preg_{p2.id}=5"), con_vacios=True)
+        self.assertEqual(autoguardar_respuestas(self.sesion, preguntas, cambios), (1, 1))
+        self.assertEqual(
+            valores_guardados(preguntas, respuestas_de_sesion(self.sesion)),
+            {f"preg_{p2.id}": ["5"], f"preg_{multiple.id}": ["1", "2"]},
+        )
+
+        # Envío final: solo se escribe lo que difiere de lo autoguardado
+        post = self._post(preguntas, 5)
+        post[f"preg_{multiple.id}"] = ["1", "2"]
+        guardadas = respuestas_de_sesion(self.sesion)
+        enviado = {**valores_guardados(preguntas, guardadas), **post}
+        self.assertEqual(preguntas_faltantes(preguntas, enviado), [])
+        self.assertEqual(guardar_respuestas(self.sesion, preguntas, post, guardadas), 28)
+
+        guardadas = respuestas_de_sesion(self.sesion)
+        with self.assertNumQueries(0):
+            self.assertEqual(guardar_respuestas(self.sesion, preguntas, post, guardadas), 0)
+        self.assertEqual(Respuesta.objects.filter(sesion=self.sesion).count(), 30)
+
+    def test_autosave_then_clear_then_submit_deletes_answer(self):
+        from django.http import QueryDict
+
+        from forms.models import Pregunta, Respuesta
+        from forms.services.respuestas import (
+            autoguardar_respuestas,
+            guardar_respuestas,
+            preguntas_faltantes,
+            respuestas_de_sesion,
+            valores_guardados,
+            valores_post,
+        )
+
+        preguntas = self._preguntas()
+        texto, numerica = preguntas[28], preguntas[29]
+        autoguardar_respuestas(self.sesion, preguntas, valores_post(
+            QueryDict(f"preg_{texto.id}=hola&preg_{numerica.id}=7"), con_vacios=True,
+        ))
+
+        # Envío final con ambas limpiadas en el formulario (sin autoguardar el cambio)
+        post = {k: v for k, v in self._post(preguntas, 3).items() if k not in (f"preg_{texto.id}", f"preg_{numerica.id}")}
+        data = QueryDict(mutable=True)
+        for k, v in post.items():
+            data.setlist(k, v)
+        data.setlist(f"preg_{texto.id}", [""])
+        data.setlist(f"preg_{numerica.id}", [""])
+        post = valores_post(data, con_vacios=True)
+
+        guardadas = respuestas_de_sesion(self.sesion)
+        enviado = {**valores_guardados(preguntas, guardadas), **post}
+        # Limpiadas cuentan como faltantes aunque estén autoguardadas
+        self.assertEqual(preguntas_faltantes(preguntas, enviado), [texto, numerica])
+
+        Pregunta.objects.filter(pk__in=[texto.pk, numerica.pk]).update(requerido=False)
+        preguntas = self._preguntas()
+        self.assertEqual(preguntas_faltantes(preguntas, enviado), [])
+        guardar_respuestas(self.sesion, preguntas, post, guardadas)
+
+        respondidas = set(Respuesta.objects.filter(sesion=self.sesion).values_list("pregunta_id", flat=True))
+        self.assertEqual(len(respondidas), 28)
+        self.assertFalse({texto.id, numerica.id} & respondidas)
+
+
+class PreguntasResponderTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Cuestionario, Opcion, Pregunta
+
+        cls.cu = Cuestionario.objects.create(codigo="RESP", nombre="Responder", estado="published")
+        cls.p1 = Pregunta.objects.create(
+            cuestionario=cls.cu, texto="P1", tipo_respuesta="ESCALA", orden=1, config="{'min': 1, 'max': 4}",
+        )
+        cls.p2 = Pregunta.objects.create(cuestionario=cls.cu, texto="P2", tipo_respuesta="OPCION_UNICA", orden=2)
+        cls.op = Opcion.objects.create(pregunta=cls.p2, texto="Sí", valor="1", orden=1)
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_cached_payload_normalized(self):
+        from forms.services.preguntas import preguntas_para_responder
+
+        preguntas_para_responder(self.cu)
+        with self.assertNumQueries(0):
+            preguntas = preguntas_para_responder(self.cu)
+            opciones = [o.texto for o in preguntas[1].opciones.all()]
+        self.assertEqual([p.orden for p in preguntas], [1, 2])
+        self.assertEqual(preguntas[0].config, {"min": 1, "max": 4})
+        self.assertEqual(opciones, ["Sí"])
+
+    def test_edits_invalidate_payload_and_key(self):
+        from forms.services.opciones import valores_opciones
+        from forms.services.preguntas import clave_render, preguntas_para_responder
+
+        clave = clave_render(self.cu)
+        preguntas_para_responder(self.cu)
+
+        self.p1.texto = "P1 editada"
+        self.p1.save()
+        self.assertNotEqual(clave_render(self.cu), clave)
+        self.assertEqual(preguntas_para_responder(self.cu)[0].texto, "P1 editada")
+
+        clave = clave_render(self.cu)
+        valores_opciones(self.cu.pk)
+        self.op.texto, self.op.valor = "No", "0"
+        with self.assertNumQueries(2):  # UPDATE + una consulta a Pregunta para ambos caches
+            self.op.save()
+        self.assertEqual([o.texto for o in preguntas_para_responder(self.cu)[1].opciones.all()], ["No"])
+        self.assertEqual(valores_opciones(self.cu.pk), {self.op.pk: 0.0})
+
+        self.cu.save()  # re-publicar
+        self.assertNotEqual(clave_render(self.cu), clave)
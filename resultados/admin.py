@@ -1,8 +1,22 @@
 # resultados/admin.py
 from django.contrib import admin
-from .models import PrediccionRiesgo
+from .models import FeatureEstudiante, PrediccionRiesgo, TareaCola
 
 @admin.register(PrediccionRiesgo)
 class PrediccionRiesgoAdmin(admin.ModelAdmin):
     list_display = ('estudiante', 'nivel', 'probabilidad', 'modelo_version', 'actualizado')
     search_fields = ('estudiante__usuario__username', 'estudiante__usuario__first_name', 'estudiante__usuario__last_name')
+
+
+@admin.register(FeatureEstudiante)
+class FeatureEstudianteAdmin(admin.ModelAdmin):
+    list_display = ('estudiante', 'x_panas_positivo', 'x_panas_negativo', 'x_whoqol_psych_mean', 'x_caso_mean', 'computed_at')
+    search_fields = ('estudiante__usuario__username', 'estudiante__usuario__first_name', 'estudiante__usuario__last_name')
+    raw_id_fields = ('panas_sesion', 'whoqol_sesion', 'caso_sesion')
+
+
+@admin.register(TareaCola)
+class TareaColaAdmin(admin.ModelAdmin):
+    list_display = ('clave', 'tipo', 'estado', 'intentos', 'max_intentos', 'disponible_en', 'terminado')
+    list_filter = ('estado', 'tipo')
+    search_fields = ('clave',)
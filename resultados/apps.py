@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ResultadosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'resultados'
+
+    def ready(self):
+        # Recalcula features + predicción al completar sesiones
+        import resultados.signals  # noqa: F401
@@ -0,0 +1,220 @@
+# resultados/benchmark.py
+"""
+Benchmark de throughput de las rutas de calificación.
+
+Genera estudiantes sintéticos con una sesión COMPLETADA por instrumento, con
+la forma real de cada uno (PANAS 20 ítems, WHO-QOL 26 con los reversos 3/4/26,
+CASO-A30 30), y mide por ruta e instrumento sesiones/segundo y consultas por
+sesión. Lo usa el comando `benchmark_scoring`, que corre sobre SQLite en
+memoria y guarda el resultado en JSON para comparar entre commits.
+"""
+from __future__ import annotations
+
+import platform
+import random
+import subprocess
+import time
+from pathlib import Path
+
+import django
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from forms.models import Cuestionario, Perfil, Pregunta, Respuesta, SesionEvaluacion, Usuario
+
+from .services import WHOQOL_REVERSE
+
+FORMATO = 1
+
+# (instrumento, código del cuestionario, nº ítems, prefijo de Pregunta.codigo, ítems reversos)
+INSTRUMENTOS = [
+    ("PANAS", "PANAS", 20, "PANAS_", set()),
+    ("WHOQOL", "WHO-QOL", 26, "WHOQOL_", WHOQOL_REVERSE),
+    ("CASO", "CASO-A30", 30, "CASO_", set()),
+]
+
+
+# ============================================================
+# Datos sintéticos
+# ============================================================
+
+def crear_datos(n_estudiantes: int, semilla: int = 0) -> dict:
+    """
+    n_estudiantes perfiles con una sesión por instrumento (respuestas 1..5).
+    Todo con bulk_create: no dispara señales (features, recalificación).
+    Retorna {"perfiles": [ids], "sesiones": {instrumento: [SesionEvaluacion]}}.
+    """
+    rnd = random.Random(semilla)
+    ahora = timezone.now()
+
+    Usuario.objects.bulk_create(
+        [Usuario(username=f"bench{i:06d}", rol="ESTUDIANTE") for i in range(n_estudiantes)],
+        batch_size=500,
+    )
+    usuarios = list(Usuario.objects.filter(username__startswith="bench").order_by("id").values_list("id", flat=True))
+    Perfil.objects.bulk_create(
+        [Perfil(usuario_id=uid, nombre_completo=f"Estudiante {uid}") for uid in usuarios],
+        batch_size=500,
+    )
+    perfiles = list(Perfil.objects.filter(usuario_id__in=usuarios).order_by("id").values_list("id", flat=True))
+
+    sesiones = {}
+    for inst, codigo, n_items, prefijo, reversos in INSTRUMENTOS:
+        cu = Cuestionario.objects.create(
+            codigo=codigo, nombre=codigo, estado="published",
+            config={"scoring": {"mode": "SUM"}},
+        )
+        Pregunta.objects.bulk_create([
+            Pregunta(
+                cuestionario=cu, texto=f"{codigo} {i}", tipo_respuesta="ESCALA", orden=i,
+                codigo=f"{prefijo}{i:02d}", config={"min": 1, "max": 5, "reverse": i in reversos},
+            )
+            for i in range(1, n_items + 1)
+        ])
+        preguntas = list(cu.preguntas.order_by("orden").values_list("id", flat=True))
+
+        SesionEvaluacion.objects.bulk_create(
+            [SesionEvaluacion(cuestionario=cu, estudiante_id=pid, estado="COMPLETADA", fecha_fin=ahora)
+             for pid in perfiles],
+            batch_size=500,
+        )
+        sesiones[inst] = list(
+            SesionEvaluacion.objects.filter(cuestionario=cu).select_related("cuestionario").order_by("id")
+        )
+        Respuesta.objects.bulk_create(
+            [Respuesta(sesion_id=s.id, pregunta_id=qid, valor_numerico=rnd.randint(1, 5))
+             for s in sesiones[inst] for qid in preguntas],
+            batch_size=2000,
+        )
+
+    return {"perfiles": perfiles, "sesiones": sesiones}
+
+
+# ============================================================
+# Medición
+# ============================================================
+
+class _Contador:
+    """execute_wrapper que solo cuenta consultas (más barato que CaptureQueriesContext)."""
+
+    def __init__(self):
+        self.n = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.n += 1
+        return execute(sql, params, many, context)
+
+
+def medir(ruta: str, instrumento: str, fn, args: list, n_sesiones: int, repeticiones: int = 3) -> dict:
+    """
+    Llama fn(a) para cada a de args; la primera llamada se repite antes como
+    calentamiento (planes compilados, bundle del modelo). Se toma el mejor tiempo.
+    """
+    fn(args[0])
+    mejor = float("inf")
+    consultas = 0
+    for _ in range(max(1, repeticiones)):
+        contador = _Contador()
+        with connection.execute_wrapper(contador):
+            t0 = time.perf_counter()
+            for a in args:
+                fn(a)
+            segundos = time.perf_counter() - t0
+        mejor = min(mejor, segundos)
+        consultas = contador.n
+
+    return {
+        "ruta": ruta,
+        "instrumento": instrumento,
+        "sesiones": n_sesiones,
+        "segundos": round(mejor, 6),
+        "sesiones_por_segundo": round(n_sesiones / (mejor or 1e-9), 1),
+        "consultas": consultas,
+        "consultas_por_sesion": round(consultas / n_sesiones, 3),
+    }
+
+
+def ejecutar_benchmark(n_estudiantes: int = 200, repeticiones: int = 3, semilla: int = 0) -> dict:
+    from forms.services import compute_auto_sum_bulk, compute_auto_sum_for_session
+
+    from .services import (
+        _build_caso_features,
+        _build_panas_features,
+        _build_whoqol_features,
+        build_features,
+        build_features_bulk,
+        score_summary_for_session,
+    )
+
+    datos = crear_datos(n_estudiantes, semilla)
+    perfiles = list(Perfil.objects.filter(pk__in=datos["perfiles"]).order_by("id"))
+    n = len(perfiles)
+    builders = {"PANAS": _build_panas_features, "WHOQOL": _build_whoqol_features, "CASO": _build_caso_features}
+
+    resultados = []
+    for inst, sesiones in datos["sesiones"].items():
+        resultados += [
+            medir("compute_auto_sum_for_session", inst, compute_auto_sum_for_session, sesiones, n, repeticiones),
+            medir("compute_auto_sum_bulk", inst, compute_auto_sum_bulk, [sesiones], n, repeticiones),
+            medir("score_summary_for_session", inst, score_summary_for_session, sesiones, n, repeticiones),
+            medir(builders[inst].__name__, inst, builders[inst], perfiles, n, repeticiones),
+        ]
+    resultados += [
+        medir("build_features", "TODOS", build_features, perfiles, 3 * n, repeticiones),
+        medir("build_features_bulk", "TODOS", build_features_bulk, [datos["perfiles"]], 3 * n, repeticiones),
+    ]
+
+    return {
+        "formato": FORMATO,
+        "fecha": timezone.now().isoformat(),
+        "commit": _commit_actual(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "numpy": np.__version__,
+        "estudiantes": n,
+        "repeticiones": repeticiones,
+        "resultados": resultados,
+    }
+
+
+def _commit_actual() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(settings.BASE_DIR), capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+# ============================================================
+# Comparación entre corridas
+# ============================================================
+
+def comparar(base: dict, actual: dict, umbral: float = 0.25) -> list[dict]:
+    """
+    Por (ruta, instrumento) presente en ambas corridas: cambio relativo de
+    sesiones/segundo y de consultas por sesión. regresion=True si el throughput
+    cae más de `umbral` o si aumentan las consultas; esto último solo con el
+    mismo nº de estudiantes (en las rutas bulk las consultas no crecen con n).
+    """
+    mismo_n = base.get("estudiantes") == actual.get("estudiantes")
+    previos = {(r["ruta"], r["instrumento"]): r for r in base.get("resultados", [])}
+    out = []
+    for r in actual.get("resultados", []):
+        b = previos.get((r["ruta"], r["instrumento"]))
+        if b is None:
+            continue
+        delta = (r["sesiones_por_segundo"] - b["sesiones_por_segundo"]) / (b["sesiones_por_segundo"] or 1e-9)
+        out.append({
+            "ruta": r["ruta"],
+            "instrumento": r["instrumento"],
+            "sesiones_por_segundo": (b["sesiones_por_segundo"], r["sesiones_por_segundo"]),
+            "delta": round(delta, 4),
+            "consultas_por_sesion": (b["consultas_por_sesion"], r["consultas_por_sesion"]),
+            "regresion": delta < -umbral or (mismo_n and r["consultas_por_sesion"] > b["consultas_por_sesion"]),
+        })
+    return out
@@ -0,0 +1,160 @@
+# resultados/cola.py
+"""
+Cola durable de tareas sobre la BD (TareaCola).
+
+- @tarea("tipo"): registra la función que ejecuta las tareas de ese tipo
+  (recibe el payload como kwargs).
+- encolar(tipo, clave, payload): inserta la tarea dentro de la transacción
+  actual, así queda guardada junto con el cambio que la origina. `clave` es la
+  llave de idempotencia: si ya hay una tarea pendiente con esa clave no se
+  duplica; si ya terminó (COMPLETADO / ERROR) se vuelve a armar; si está en
+  curso se marca `repetir` y al terminar se arma de nuevo (la ejecución en
+  curso pudo leer datos anteriores al cambio).
+  Tras el commit se intenta ejecutar en el proceso (en_segundo_plano); si el
+  proceso muere, la toma el comando `procesar_cola`.
+- procesar_pendientes(): toma y ejecuta las tareas disponibles.
+- renovar(clave): extiende el lease de una tarea larga mientras avanza.
+
+Tomar una tarea es un UPDATE condicionado (PENDIENTE y disponible, o EN_CURSO
+con el lease vencido), así dos workers no ejecutan la misma. Cada toma cuenta
+como intento; al fallar se reintenta con backoff exponencial hasta
+max_intentos y después queda en ERROR.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Callable
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import TareaCola
+
+logger = logging.getLogger(__name__)
+
+TAREAS: dict[str, Callable] = {}
+
+BLOQUEO_SEGUNDOS = 300          # lease: pasado esto otro worker puede retomarla
+REINTENTO_BASE_SEGUNDOS = 30    # 30 s, 60 s, 120 s, ...
+
+
+def tarea(tipo: str):
+    def deco(fn):
+        TAREAS[tipo] = fn
+        return fn
+    return deco
+
+
+def encolar(tipo: str, clave: str, payload: dict | None = None, max_intentos: int = 5) -> None:
+    TareaCola.objects.bulk_create(
+        [TareaCola(tipo=tipo, clave=clave, payload=payload or {}, max_intentos=max_intentos)],
+        ignore_conflicts=True,
+    )
+    # Primero la marca: si la tarea termina entre ambos UPDATE, el segundo la re-arma
+    TareaCola.objects.filter(clave=clave, estado="EN_CURSO").update(repetir=True, payload=payload or {})
+    TareaCola.objects.filter(clave=clave, estado__in=["COMPLETADO", "ERROR"]).update(
+        estado="PENDIENTE", payload=payload or {}, intentos=0, disponible_en=timezone.now(),
+        bloqueado_hasta=None, error="", terminado=None, repetir=False,
+    )
+
+    from .tasks import en_segundo_plano
+
+    transaction.on_commit(lambda: en_segundo_plano(procesar_clave, clave))
+
+
+# ============================================================
+# Ejecución
+# ============================================================
+
+def _disponibles(ahora) -> Q:
+    return (
+        Q(estado="PENDIENTE", disponible_en__lte=ahora)
+        | Q(estado="EN_CURSO", bloqueado_hasta__lt=ahora)
+    )
+
+
+def _tomar(tarea_id: int) -> TareaCola | None:
+    ahora = timezone.now()
+    tomada = (
+        TareaCola.objects
+        .filter(_disponibles(ahora), pk=tarea_id)
+        .update(
+            estado="EN_CURSO",
+            intentos=F("intentos") + 1,
+            bloqueado_hasta=ahora + timedelta(seconds=BLOQUEO_SEGUNDOS),
+        )
+    )
+    return TareaCola.objects.get(pk=tarea_id) if tomada else None
+
+
+def ejecutar(t: TareaCola) -> bool:
+    """Ejecuta una tarea ya tomada. True si terminó bien."""
+    try:
+        fn = TAREAS[t.tipo]
+        fn(**t.payload)
+    except Exception as e:
+        logger.exception("Tarea %s falló (intento %s/%s)", t.clave, t.intentos, t.max_intentos)
+        if t.intentos >= t.max_intentos:
+            cambios = {"estado": "ERROR", "terminado": timezone.now()}
+        else:
+            espera = REINTENTO_BASE_SEGUNDOS * 2 ** (t.intentos - 1)
+            cambios = {"estado": "PENDIENTE", "disponible_en": timezone.now() + timedelta(seconds=espera)}
+        # El reintento ya leerá el estado nuevo: la marca `repetir` no hace falta
+        TareaCola.objects.filter(pk=t.pk).update(
+            bloqueado_hasta=None, repetir=False, error=f"{type(e).__name__}: {e}"[:2000], **cambios,
+        )
+        return False
+
+    completada = TareaCola.objects.filter(pk=t.pk, repetir=False).update(
+        estado="COMPLETADO", bloqueado_hasta=None, error="", terminado=timezone.now(),
+    )
+    if not completada:
+        # Se encoló otra vez mientras corría: queda disponible de inmediato
+        TareaCola.objects.filter(pk=t.pk).update(
+            estado="PENDIENTE", repetir=False, intentos=0, disponible_en=timezone.now(),
+            bloqueado_hasta=None, error="",
+        )
+    return True
+
+
+def renovar(clave: str) -> None:
+    """Extiende el lease de una tarea EN_CURSO (tareas largas, p. ej. por chunk)."""
+    TareaCola.objects.filter(clave=clave, estado="EN_CURSO").update(
+        bloqueado_hasta=timezone.now() + timedelta(seconds=BLOQUEO_SEGUNDOS),
+    )
+
+
+def procesar_clave(clave: str) -> bool | None:
+    """
+    Ejecuta la tarea `clave` si está disponible (None si otro la tomó o no
+    toca aún). Si se volvió a encolar mientras corría, la ejecuta de nuevo.
+    """
+    tarea_id = TareaCola.objects.filter(clave=clave).values_list("id", flat=True).first()
+    t = _tomar(tarea_id) if tarea_id else None
+    ok = None
+    while t:
+        ok = ejecutar(t)
+        t = _tomar(tarea_id) if ok else None
+    return ok
+
+
+def procesar_pendientes(limite: int = 50) -> dict:
+    """Toma y ejecuta hasta `limite` tareas disponibles, en orden de llegada."""
+    ids = list(
+        TareaCola.objects
+        .filter(_disponibles(timezone.now()))
+        .order_by("disponible_en", "id")
+        .values_list("id", flat=True)[:limite]
+    )
+    stats = {"ok": 0, "fallidas": 0, "omitidas": 0}
+    for tarea_id in ids:
+        t = _tomar(tarea_id)
+        if t is None:
+            stats["omitidas"] += 1  # la tomó otro worker
+        elif ejecutar(t):
+            stats["ok"] += 1
+        else:
+            stats["fallidas"] += 1
+    return stats
@@ -1,30 +1,27 @@
 from forms.models import Respuesta, SesionEvaluacion
+from forms.services.opciones import valor_opcion
 
 def get_numeric_answers_by_code(sesion: SesionEvaluacion) -> dict:
     """
     Retorna dict: { "PANAS_01": 4.0, "PANAS_02": 2.0, ... }
-    Toma valor_numerico y si no existe intenta opcion_seleccionada.valor.
+    Toma valor_numerico y si no existe el valor numérico de la opción (Opcion.valor_num).
     """
     out = {}
-    qs = (
+    rows = (
         Respuesta.objects
         .filter(sesion=sesion)
-        .select_related("pregunta", "opcion_seleccionada")
+        .values_list("pregunta__codigo", "valor_numerico", "opcion_seleccionada_id")
     )
 
-    for r in qs:
-        code = (getattr(r.pregunta, "codigo", "") or "").strip()
+    for codigo, valor_numerico, opcion_id in rows:
+        code = (codigo or "").strip()
         if not code:
             continue
 
-        val = None
-        if r.valor_numerico is not None:
-            val = float(r.valor_numerico)
-        elif r.opcion_seleccionada and r.opcion_seleccionada.valor is not None:
-            try:
-                val = float(r.opcion_seleccionada.valor)
-            except Exception:
-                val = None
+        if valor_numerico is not None:
+            val = float(valor_numerico)
+        else:
+            val = valor_opcion(sesion.cuestionario_id, opcion_id)
 
         if val is None:
             continue
@@ -0,0 +1,80 @@
+# resultados/management/commands/benchmark_scoring.py
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from resultados.benchmark import comparar, ejecutar_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de las rutas de calificación (auto-suma, resumen por sesión, features) "
+        "sobre sesiones sintéticas PANAS / WHO-QOL / CASO-A30 en SQLite en memoria. "
+        "Uso: manage.py benchmark_scoring --settings=tamizaje.settings_benchmark --salida bench.json"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--estudiantes", type=int, default=200,
+            help="Estudiantes sintéticos; cada uno con una sesión por instrumento (default: 200).",
+        )
+        parser.add_argument(
+            "--repeticiones", type=int, default=3,
+            help="Repeticiones por medición; se reporta el mejor tiempo (default: 3).",
+        )
+        parser.add_argument("--semilla", type=int, default=0, help="Semilla de las respuestas (default: 0).")
+        parser.add_argument("--salida", default=None, help="Archivo JSON de resultados (por defecto solo la tabla).")
+        parser.add_argument(
+            "--comparar", default=None,
+            help="JSON de una corrida anterior: reporta el cambio por ruta y marca regresiones.",
+        )
+        parser.add_argument(
+            "--umbral", type=float, default=0.25,
+            help="Caída de sesiones/s que cuenta como regresión con --comparar (default: 0.25).",
+        )
+
+    def handle(self, *args, **opts):
+        if connection.vendor != "sqlite" or not connection.is_in_memory_db():
+            raise CommandError(
+                "El benchmark crea datos sintéticos: corre solo sobre SQLite en memoria "
+                "(--settings=tamizaje.settings_benchmark)."
+            )
+
+        call_command("migrate", verbosity=0, interactive=False)
+        self.stdout.write(f"Generando {opts['estudiantes']} estudiantes × 3 instrumentos...")
+        reporte = ejecutar_benchmark(opts["estudiantes"], opts["repeticiones"], opts["semilla"])
+
+        self.stdout.write(f"{'ruta':<32} {'instr.':<7} {'sesiones/s':>11} {'consultas/sesión':>17}")
+        for r in reporte["resultados"]:
+            self.stdout.write(
+                f"{r['ruta']:<32} {r['instrumento']:<7} {r['sesiones_por_segundo']:>11.1f} "
+                f"{r['consultas_por_sesion']:>17.3f}"
+            )
+
+        if opts["salida"]:
+            with open(opts["salida"], "w", encoding="utf-8") as f:
+                json.dump(reporte, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados en {opts['salida']}"))
+
+        if opts["comparar"]:
+            with open(opts["comparar"], encoding="utf-8") as f:
+                base = json.load(f)
+            cambios = comparar(base, reporte, opts["umbral"])
+            self.stdout.write(f"Comparación contra {base.get('commit') or opts['comparar']}:")
+            if base.get("estudiantes") != reporte["estudiantes"]:
+                self.stdout.write(self.style.WARNING(
+                    f"  Corridas con distinto nº de estudiantes ({base.get('estudiantes')} vs "
+                    f"{reporte['estudiantes']}): no se comparan consultas."
+                ))
+            for c in cambios:
+                (sps_a, sps_b), (q_a, q_b) = c["sesiones_por_segundo"], c["consultas_por_sesion"]
+                linea = (
+                    f"  {c['ruta']:<32} {c['instrumento']:<7} {sps_a:>9.1f} -> {sps_b:>9.1f} "
+                    f"({c['delta']:+.1%})  consultas {q_a:g} -> {q_b:g}"
+                )
+                self.stdout.write(self.style.ERROR(linea + "  REGRESIÓN") if c["regresion"] else linea)
+            regresiones = sum(c["regresion"] for c in cambios)
+            if regresiones:
+                raise CommandError(f"{regresiones} ruta(s) con regresión.")
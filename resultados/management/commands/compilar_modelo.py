@@ -0,0 +1,57 @@
+# resultados/management/commands/compilar_modelo.py
+from pathlib import Path
+
+import joblib
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from resultados.ml_compiled import (
+    COMPILED_BUNDLE_PATH,
+    SOURCE_BUNDLE_PATH,
+    CompiledModel,
+    file_sha256,
+    predict_proba_matrix,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta el bundle sklearn (.pkl) a un modelo compilado (.npz) para "
+        "inferencia con NumPy puro, y verifica paridad contra sklearn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--origen", default=str(SOURCE_BUNDLE_PATH), help="Ruta del .pkl de sklearn.")
+        parser.add_argument("--destino", default=str(COMPILED_BUNDLE_PATH), help="Ruta del .npz a generar.")
+        parser.add_argument("--tolerancia", type=float, default=1e-9, help="Diferencia máxima permitida en probabilidades.")
+
+    def handle(self, *args, **opts):
+        origen = Path(opts["origen"])
+        destino = Path(opts["destino"])
+
+        if not origen.exists():
+            raise CommandError(f"No existe el bundle: {origen}")
+
+        bundle = joblib.load(origen)
+        try:
+            compiled = CompiledModel.from_bundle(bundle, source_sha256=file_sha256(origen))
+        except (KeyError, ValueError) as e:
+            raise CommandError(f"No se pudo compilar el bundle: {e}")
+
+        # Paridad sobre puntos alrededor de la media de entrenamiento (incluye NaN -> imputación)
+        rng = np.random.default_rng(42)
+        X = compiled.mean + rng.normal(size=(256, len(compiled.feature_cols))) * compiled.scale * 2
+        X[rng.random(X.shape) < 0.05] = np.nan
+
+        p_sklearn = predict_proba_matrix(bundle["model"], compiled.feature_cols, X)
+        p_numpy = compiled.predict_proba(X)[:, 1]
+        max_diff = float(np.max(np.abs(p_sklearn - p_numpy)))
+
+        if max_diff > opts["tolerancia"]:
+            raise CommandError(f"Paridad fallida: diferencia máxima {max_diff:.3e}")
+
+        compiled.save(destino)
+
+        self.stdout.write(f"  features: {', '.join(compiled.feature_cols)}")
+        self.stdout.write(f"  paridad sklearn vs numpy: max |Δp| = {max_diff:.3e}")
+        self.stdout.write(self.style.SUCCESS(f"Modelo compilado en {destino} ({destino.stat().st_size} bytes)."))
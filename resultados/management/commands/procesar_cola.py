@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from resultados import tasks  # noqa: F401  (registra las tareas)
+from resultados.cola import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker local de la cola durable (TareaCola): ejecuta las tareas pendientes "
+        "(post_envio tras responder un cuestionario, scoring_bulk de la calificación "
+        "masiva) con reintentos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--una-vez", action="store_true", help="Procesa lo disponible y termina.")
+        parser.add_argument("--limite", type=int, default=50, help="Tareas por vuelta (default 50).")
+        parser.add_argument(
+            "--intervalo", type=float, default=2.0,
+            help="Segundos de espera cuando no hay tareas (default 2).",
+        )
+
+    def handle(self, *args, **opts):
+        while True:
+            stats = procesar_pendientes(limite=opts["limite"])
+            n = sum(stats.values())
+            if n:
+                self.stdout.write(
+                    f"ok: {stats['ok']}  fallidas: {stats['fallidas']}  omitidas: {stats['omitidas']}"
+                )
+            if opts["una_vez"]:
+                break
+            if n < opts["limite"]:
+                try:
+                    time.sleep(opts["intervalo"])
+                except KeyboardInterrupt:
+                    break
+
+        self.stdout.write(self.style.SUCCESS("Listo."))
@@ -0,0 +1,118 @@
+# resultados/management/commands/recalcular_predicciones.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from forms.models import Perfil
+from resultados.ml_registry import registry
+from resultados.reproceso import Checkpoint, ejecutar, partir
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula PrediccionRiesgo por lotes para toda la cohorte de estudiantes "
+        "(una llamada al modelo por chunk), opcionalmente en paralelo y reanudable "
+        "con --checkpoint, y reporta throughput y ETA."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=500,
+            help="Estudiantes por lote (default: 500).",
+        )
+        parser.add_argument(
+            "--ids", nargs="+", type=int, default=None,
+            help="Limitar a estos Perfil.id (por defecto: todos los estudiantes).",
+        )
+        parser.add_argument(
+            "--refrescar-features", action="store_true",
+            help="Recalcular el feature store desde las respuestas antes de predecir.",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Procesos en paralelo (default: 1, en el proceso actual).",
+        )
+        parser.add_argument(
+            "--checkpoint", default=None,
+            help=(
+                "Archivo JSON de avance; si existe y el modelo no cambió, se reanuda desde ahí "
+                "(debe ser de una corrida con los mismos --ids y --refrescar-features)."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="No guarda nada: solo reporta cuántos niveles cambiarían.",
+        )
+
+    def handle(self, *args, **opts):
+        qs = Perfil.objects.filter(rol="ESTUDIANTE")
+        if opts["ids"]:
+            qs = qs.filter(pk__in=opts["ids"])
+        perfil_ids = list(qs.order_by("id").values_list("id", flat=True))
+
+        if not perfil_ids:
+            self.stdout.write(self.style.WARNING("No hay estudiantes para procesar."))
+            return
+
+        chunk_size = max(1, opts["chunk_size"])
+        dry_run = opts["dry_run"]
+        version = registry.current_version()
+
+        checkpoint = Checkpoint(
+            None if dry_run else opts["checkpoint"], version, chunk_size,
+            ids=opts["ids"], refrescar_features=opts["refrescar_features"],
+        )
+        try:
+            checkpoint.cargar()
+        except ValueError as e:
+            raise CommandError(str(e))
+        chunks = partir(checkpoint.pendientes(perfil_ids), chunk_size)
+        pendientes = sum(len(c) for c in chunks)
+
+        if checkpoint.reanudado:
+            self.stdout.write(
+                f"Reanudando desde {checkpoint.path}: "
+                f"{len(perfil_ids) - pendientes} ya procesados, {pendientes} pendientes."
+            )
+
+        self.stdout.write(
+            f"Procesando {pendientes} estudiantes con modelo {version} "
+            f"(chunk={chunk_size}, workers={opts['workers']}{', dry-run' if dry_run else ''})..."
+        )
+
+        # Acumula lo del checkpoint + lo de esta corrida
+        stats = checkpoint.stats
+        hechos = 0
+        t0 = time.perf_counter()
+
+        for chunk, parcial in ejecutar(chunks, opts["workers"], dry_run, opts["refrescar_features"]):
+            checkpoint.marcar(chunk, parcial)
+
+            hechos += len(chunk)
+            segundos = time.perf_counter() - t0
+            throughput = hechos / (segundos or 1e-9)
+            eta = (pendientes - hechos) / (throughput or 1e-9)
+            self.stdout.write(
+                f"  {hechos}/{pendientes} ({throughput:.1f} estudiantes/s, ETA {eta:.0f}s)"
+            )
+
+        segundos = time.perf_counter() - t0
+        throughput = hechos / (segundos or 1e-9)
+
+        self.stdout.write(
+            f"  procesados={stats.get('procesados', 0)} creados={stats.get('creados', 0)} "
+            f"actualizados={stats.get('actualizados', 0)} con_prediccion={stats.get('con_prediccion', 0)}"
+        )
+        for nivel, n in sorted(stats.get("por_nivel", {}).items()):
+            self.stdout.write(f"  {nivel}: {n}")
+
+        self.stdout.write(f"  cambios de nivel: {stats.get('cambios_nivel', 0)}")
+        for transicion, n in sorted(stats.get("transiciones", {}).items()):
+            self.stdout.write(f"    {transicion}: {n}")
+
+        # Corrida completa: el checkpoint ya no sirve
+        checkpoint.borrar()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Simulación lista' if dry_run else 'Listo'} en {segundos:.2f}s ({throughput:.1f} estudiantes/s)."
+        ))
@@ -0,0 +1,37 @@
+# resultados/management/commands/reclasificar_niveles.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from resultados.models import PrediccionRiesgo
+from resultados.services import reclasificar_niveles
+
+
+class Command(BaseCommand):
+    help = (
+        "Reasigna PrediccionRiesgo.nivel con los umbrales vigentes (bundle + "
+        "RESULTADOS_ML_THRESHOLDS) usando la probabilidad ya guardada (un solo "
+        "UPDATE, sin volver a correr el modelo). Para cambiar umbrales, fija "
+        "RESULTADOS_ML_THRESHOLDS y corre este comando."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--thr-medio", type=float, default=None,
+            help="Umbral MODERADO esperado; se rechaza si difiere del vigente.",
+        )
+        parser.add_argument(
+            "--thr-alto", type=float, default=None,
+            help="Umbral ALTO esperado; se rechaza si difiere del vigente.",
+        )
+
+    def handle(self, *args, **opts):
+        try:
+            n = reclasificar_niveles(thr_medio=opts["thr_medio"], thr_alto=opts["thr_alto"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"Predicciones reclasificadas: {n}")
+        for row in PrediccionRiesgo.objects.values("nivel").annotate(n=Count("id")).order_by("nivel"):
+            self.stdout.write(f"  {row['nivel']}: {row['n']}")
+
+        self.stdout.write(self.style.SUCCESS("Listo."))
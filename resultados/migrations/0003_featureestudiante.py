@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forms', '0034_sesionevaluacion_notas_psicologo'),
+        ('resultados', '0002_alter_prediccionriesgo_actualizado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureEstudiante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('x_panas_positivo', models.FloatField(blank=True, db_index=True, null=True)),
+                ('x_panas_negativo', models.FloatField(blank=True, db_index=True, null=True)),
+                ('panas_pos_mean', models.FloatField(blank=True, null=True)),
+                ('panas_neg_mean', models.FloatField(blank=True, null=True)),
+                ('panas_n_resp', models.PositiveSmallIntegerField(default=0)),
+                ('x_whoqol_phys_mean', models.FloatField(blank=True, db_index=True, null=True)),
+                ('x_whoqol_psych_mean', models.FloatField(blank=True, db_index=True, null=True)),
+                ('x_whoqol_social_mean', models.FloatField(blank=True, db_index=True, null=True)),
+                ('whoqol_env_mean', models.FloatField(blank=True, null=True)),
+                ('whoqol_total_mean', models.FloatField(blank=True, null=True)),
+                ('whoqol_n_resp', models.PositiveSmallIntegerField(default=0)),
+                ('x_caso_mean', models.FloatField(blank=True, db_index=True, null=True)),
+                ('caso_total', models.FloatField(blank=True, null=True)),
+                ('caso_n_resp', models.PositiveSmallIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('caso_sesion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='forms.sesionevaluacion')),
+                ('estudiante', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='feature_store', to='forms.perfil')),
+                ('panas_sesion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='forms.sesionevaluacion')),
+                ('whoqol_sesion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='forms.sesionevaluacion')),
+            ],
+        ),
+    ]
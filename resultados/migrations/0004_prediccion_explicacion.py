@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resultados', '0003_featureestudiante'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediccionriesgo',
+            name='explicacion',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='prediccionriesgo',
+            name='explicacion_version',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
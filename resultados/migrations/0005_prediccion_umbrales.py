@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 01:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resultados', '0004_prediccion_explicacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='prediccionriesgo',
+            name='umbral_alto',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='prediccionriesgo',
+            name='umbral_medio',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
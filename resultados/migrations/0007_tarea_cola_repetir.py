@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resultados', '0006_tarea_cola'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tareacola',
+            name='repetir',
+            field=models.BooleanField(default=False),
+        ),
+    ]
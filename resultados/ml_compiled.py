@@ -0,0 +1,179 @@
+# resultados/ml_compiled.py
+"""
+Modelo "compilado": el bundle sklearn (imputer + scaler + regresión logística)
+exportado a un .npz con arreglos NumPy.
+
+La inferencia es imputación + estandarización + producto punto + sigmoide,
+sin importar sklearn ni pandas (ni deserializar el Pipeline con joblib).
+
+Exportar:  python manage.py compilar_modelo
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+
+COMPILED_BUNDLE_PATH = Path(settings.BASE_DIR) / "resultados" / "ml" / "modelo_tamizaje_compilado.npz"
+SOURCE_BUNDLE_PATH = Path(settings.BASE_DIR) / "resultados" / "ml" / "modelo_tamizaje_bundle.pkl"
+
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class CompiledModel:
+    """
+    Réplica NumPy de Pipeline([SimpleImputer, StandardScaler, LogisticRegression]).
+
+    Expone la misma API mínima que usa el proyecto:
+      - predict_proba(X) -> (n, 2)
+      - transform(X)     -> X imputado y escalado (equivale a model[:-1].transform)
+      - coef_ / intercept_
+    """
+
+    def __init__(self, *, feature_cols, impute, mean, scale, coef, intercept,
+                 thresholds=None, meta=None):
+        self.feature_cols = list(feature_cols)
+        self.impute = np.asarray(impute, dtype=float)
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.coef_ = np.asarray(coef, dtype=float).reshape(1, -1)
+        self.intercept_ = np.asarray(intercept, dtype=float).reshape(1)
+        self.thresholds = dict(thresholds or {})
+        self.meta = dict(meta or {})
+
+    # ---------------- inferencia ----------------
+
+    def transform(self, X) -> np.ndarray:
+        X = np.array(X, dtype=float, ndmin=2)
+        X = np.where(np.isnan(X), self.impute, X)
+        return (X - self.mean) / self.scale
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.transform(X) @ self.coef_[0] + self.intercept_[0]
+
+    def predict_proba(self, X) -> np.ndarray:
+        z = self.decision_function(X)
+        p1 = 1.0 / (1.0 + np.exp(-z))
+        return np.column_stack([1.0 - p1, p1])
+
+    # ---------------- export / carga ----------------
+
+    @classmethod
+    def from_bundle(cls, bundle: dict, source_sha256: str = "") -> "CompiledModel":
+        """
+        Compila el dict del .pkl (model, feature_cols, thresholds, meta).
+        Solo soporta [imputer?] -> [scaler?] -> LogisticRegression binaria.
+        """
+        model = bundle["model"]
+        feature_cols = list(bundle["feature_cols"])
+        n = len(feature_cols)
+
+        steps = [s for _, s in model.steps] if hasattr(model, "steps") else [model]
+        *pre, clf = steps
+
+        if not hasattr(clf, "coef_") or clf.coef_.shape[0] != 1:
+            raise ValueError("Solo se soporta un clasificador lineal binario con coef_.")
+
+        impute = np.full(n, np.nan)
+        mean = np.zeros(n)
+        scale = np.ones(n)
+
+        for step in pre:
+            name = type(step).__name__
+            if name == "SimpleImputer":
+                impute = np.asarray(step.statistics_, dtype=float)
+            elif name == "StandardScaler":
+                if getattr(step, "mean_", None) is not None:
+                    mean = np.asarray(step.mean_, dtype=float)
+                if getattr(step, "scale_", None) is not None:
+                    scale = np.asarray(step.scale_, dtype=float)
+            else:
+                raise ValueError(f"Paso de Pipeline no soportado: {name}")
+
+        return cls(
+            feature_cols=feature_cols,
+            impute=impute,
+            mean=mean,
+            scale=scale,
+            coef=clf.coef_,
+            intercept=clf.intercept_,
+            thresholds=bundle.get("thresholds") or {},
+            meta={**(bundle.get("meta") or {}), "source_sha256": source_sha256},
+        )
+
+    def save(self, path) -> None:
+        header = {
+            "feature_cols": self.feature_cols,
+            "thresholds": self.thresholds,
+            "meta": self.meta,
+        }
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                impute=self.impute,
+                mean=self.mean,
+                scale=self.scale,
+                coef=self.coef_,
+                intercept=self.intercept_,
+                header=np.array(json.dumps(header, ensure_ascii=False)),
+            )
+
+    @classmethod
+    def load(cls, path) -> "CompiledModel":
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            return cls(
+                feature_cols=header["feature_cols"],
+                impute=data["impute"],
+                mean=data["mean"],
+                scale=data["scale"],
+                coef=data["coef"],
+                intercept=data["intercept"],
+                thresholds=header.get("thresholds"),
+                meta=header.get("meta"),
+            )
+
+    def as_bundle(self) -> dict:
+        """Mismo formato que el dict del .pkl, con este modelo en 'model'."""
+        return {
+            "model": self,
+            "feature_cols": self.feature_cols,
+            "thresholds": self.thresholds,
+            "meta": self.meta,
+        }
+
+
+def is_sklearn_pipeline(model) -> bool:
+    """isinstance(model, Pipeline) sin importar sklearn si el modelo no es de sklearn."""
+    if isinstance(model, CompiledModel) or not type(model).__module__.startswith("sklearn."):
+        return False
+    from sklearn.pipeline import Pipeline
+    return isinstance(model, Pipeline)
+
+
+def final_estimator(model):
+    """Último paso si es un Pipeline de sklearn; si no, el propio modelo."""
+    return model.steps[-1][1] if is_sklearn_pipeline(model) else model
+
+
+def predict_proba_matrix(model, feature_cols, X_rows) -> np.ndarray:
+    """
+    P(clase=1) para una matriz de features (filas en el orden de feature_cols).
+    Usa NumPy puro con CompiledModel; con sklearn arma el DataFrame con columnas.
+    """
+    X = np.asarray(X_rows, dtype=float)
+    if isinstance(model, CompiledModel):
+        return model.predict_proba(X)[:, 1]
+
+    import pandas as pd  # sklearn espera nombres de columnas
+    return model.predict_proba(pd.DataFrame(X, columns=list(feature_cols)))[:, 1]
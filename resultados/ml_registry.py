@@ -0,0 +1,216 @@
+# resultados/ml_registry.py
+"""
+Registro único de modelos ML del proceso.
+
+- Varios bundles con nombre (settings.RESULTADOS_ML_BUNDLES), cada uno versionado
+  por el sha256 de su .pkl: la versión es "<nombre>@<sha256[:12]>".
+- Si existe el .npz compilado y corresponde al .pkl, se carga ese (NumPy puro).
+- Recarga en caliente: si cambia el mtime/tamaño de los archivos se recalcula
+  el hash, se carga el bundle completo y se reemplaza de forma atómica (los
+  lectores siempre ven la entrada anterior o la nueva, nunca una a medias).
+  Los workers de gunicorn no necesitan reiniciarse.
+- Si el settings declara "sha256" y el archivo no coincide, o el archivo está
+  corrupto / a medio escribir, NO se carga: se conserva la versión anterior en
+  memoria (si la hay) y no se reintenta hasta que el archivo vuelva a cambiar.
+- En memoria quedan a lo más MAX_VERSIONS versiones por bundle.
+
+Uso:
+    from resultados.ml_registry import registry
+    bundle = registry.get_bundle()          # dict: model, feature_cols, thresholds, meta, version, sha256
+    registry.current_version()              # "tamizaje@3f2a1b9c0d1e"
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+
+from .ml_compiled import CompiledModel, file_sha256
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUNDLE = "tamizaje"
+
+# Cada cuánto (segundos) se revisa el mtime de los archivos
+RELOAD_CHECK_SECONDS = 2.0
+
+# Versiones que se conservan en memoria por bundle (la vigente incluida)
+MAX_VERSIONS = 3
+
+
+def _default_specs() -> dict:
+    ml_dir = Path(settings.BASE_DIR) / "resultados" / "ml"
+    return {
+        DEFAULT_BUNDLE: {
+            "path": ml_dir / "modelo_tamizaje_bundle.pkl",
+            "compiled": ml_dir / "modelo_tamizaje_compilado.npz",
+        },
+    }
+
+
+def _stat_signature(*paths) -> tuple:
+    sig = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            sig.append((st.st_mtime_ns, st.st_size))
+        except (OSError, TypeError):
+            sig.append(None)
+    return tuple(sig)
+
+
+@dataclass
+class BundleEntry:
+    name: str
+    sha256: str
+    bundle: dict
+    signature: tuple
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def version(self) -> str:
+        return f"{self.name}@{self.sha256[:12]}"
+
+    @property
+    def compiled(self) -> bool:
+        return isinstance(self.bundle.get("model"), CompiledModel)
+
+
+class ModelRegistry:
+    def __init__(self, specs: dict | None = None):
+        self._specs = specs
+        self._lock = threading.Lock()
+        self._current: dict[str, BundleEntry] = {}
+        self._versions: dict[str, dict[str, BundleEntry]] = {}
+        self._last_check: dict[str, float] = {}
+        self._failed: dict[str, tuple] = {}  # firma de archivos que no se pudieron cargar
+
+    # ---------------- configuración ----------------
+
+    @property
+    def specs(self) -> dict:
+        if self._specs is None:
+            self._specs = getattr(settings, "RESULTADOS_ML_BUNDLES", None) or _default_specs()
+        return self._specs
+
+    def names(self) -> list[str]:
+        return list(self.specs.keys())
+
+    # ---------------- lectura ----------------
+
+    def get(self, name: str = DEFAULT_BUNDLE, version: str | None = None) -> BundleEntry | None:
+        """
+        Entrada vigente del bundle `name` (recargando si el archivo cambió).
+        Con `version`, devuelve esa versión si sigue en memoria.
+        """
+        if version is not None:
+            self.get(name)
+            return self._versions.get(name, {}).get(version)
+
+        entry = self._current.get(name)
+        now = time.monotonic()
+        if entry is not None and now - self._last_check.get(name, 0.0) < RELOAD_CHECK_SECONDS:
+            return entry
+
+        with self._lock:
+            self._last_check[name] = now
+            entry = self._current.get(name)
+            spec = self.specs.get(name)
+            if spec is None:
+                return None
+
+            signature = _stat_signature(spec.get("path"), spec.get("compiled"))
+            if entry is not None and entry.signature == signature:
+                return entry
+            if self._failed.get(name) == signature:
+                return entry  # mismos archivos que ya fallaron: no re-hashear ni recargar
+
+            try:
+                new_entry = self._load(name, spec, signature)
+            except Exception:
+                logger.exception("Bundle %s: no se pudo cargar; se conserva la versión anterior.", name)
+                new_entry = None
+
+            if new_entry is None:
+                self._failed[name] = signature
+                return entry
+
+            self._failed.pop(name, None)
+            self._current[name] = new_entry
+            versiones = self._versions.setdefault(name, {})
+            versiones.pop(new_entry.version, None)
+            versiones[new_entry.version] = new_entry
+            while len(versiones) > MAX_VERSIONS:
+                versiones.pop(next(iter(versiones)))
+            return new_entry
+
+    def get_bundle(self, name: str = DEFAULT_BUNDLE) -> dict | None:
+        entry = self.get(name)
+        return entry.bundle if entry else None
+
+    def current_version(self, name: str = DEFAULT_BUNDLE) -> str | None:
+        entry = self.get(name)
+        return entry.version if entry else None
+
+    def versions(self, name: str = DEFAULT_BUNDLE) -> list[str]:
+        return list(self._versions.get(name, {}).keys())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._current.clear()
+            self._versions.clear()
+            self._last_check.clear()
+            self._failed.clear()
+
+    # ---------------- carga ----------------
+
+    def _load(self, name, spec, signature) -> BundleEntry | None:
+        path = Path(spec["path"])
+        if not path.exists():
+            logger.warning("Bundle %s no encontrado en %s", name, path)
+            return None
+
+        sha = file_sha256(path)
+        expected = spec.get("sha256")
+        if expected and expected != sha:
+            logger.error("Bundle %s: sha256 %s no coincide con el esperado %s; no se carga.", name, sha, expected)
+            return None
+
+        bundle = self._load_compiled(spec.get("compiled"), sha)
+        if bundle is None:
+            import joblib  # solo si no hay compilado válido
+
+            bundle = joblib.load(path)
+            if not isinstance(bundle, dict):
+                logger.error("Bundle %s en %s no es un dict; se ignora.", name, path)
+                return None
+            bundle = dict(bundle)
+
+        bundle["sha256"] = sha
+        bundle["version"] = f"{name}@{sha[:12]}"
+
+        entry = BundleEntry(name=name, sha256=sha, bundle=bundle, signature=signature)
+        logger.info("Bundle %s cargado: %s (compilado=%s)", name, entry.version, entry.compiled)
+        return entry
+
+    @staticmethod
+    def _load_compiled(compiled_path, source_sha: str) -> dict | None:
+        if not compiled_path or not Path(compiled_path).exists():
+            return None
+        try:
+            compiled = CompiledModel.load(compiled_path)
+        except Exception:
+            logger.exception("Modelo compilado %s ilegible; se usa sklearn.", compiled_path)
+            return None
+        if compiled.meta.get("source_sha256") != source_sha:
+            logger.warning("Modelo compilado %s no corresponde al .pkl actual; se usa sklearn.", compiled_path)
+            return None
+        return compiled.as_bundle()
+
+
+registry = ModelRegistry()
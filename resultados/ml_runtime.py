@@ -1,17 +1,11 @@
-import joblib
 import numpy as np
-import pandas as pd
-from functools import lru_cache
-from django.conf import settings
-from pathlib import Path
+from .ml_compiled import final_estimator, predict_proba_matrix
+from .ml_registry import registry
 
 
-@lru_cache(maxsize=1)
 def load_bundle():
-    # Ajusta ruta
-    path = Path(settings.BASE_DIR) / "resultados" / "ml" / "modelo_tamizaje_bundle.pkl"
-    bundle = joblib.load(path)
-    return bundle
+    """Bundle vigente del registro único (ver resultados.ml_registry)."""
+    return registry.get_bundle()
 
 def predict_proba_row(x_dict: dict) -> dict:
     """
@@ -24,9 +18,7 @@ def predict_proba_row(x_dict: dict) -> dict:
     thr_medio = float(bundle["thresholds"]["thr_medio"])
     thr_alto  = float(bundle["thresholds"]["thr_alto"])
 
-    # DataFrame con columnas exactas
-    X = pd.DataFrame([[x_dict.get(c) for c in feature_cols]], columns=feature_cols)
-    proba = float(model.predict_proba(X)[0, 1])
+    proba = float(predict_proba_matrix(model, feature_cols, [[x_dict.get(c) for c in feature_cols]])[0])
 
     if proba >= thr_alto:
         nivel = "ALTO"
@@ -37,8 +29,6 @@ def predict_proba_row(x_dict: dict) -> dict:
 
     return {"proba": proba, "nivel": nivel, "thr_medio": thr_medio, "thr_alto": thr_alto}
 
-import numpy as np
-from sklearn.pipeline import Pipeline
 
 def get_model_explanation(features_usadas: dict | None = None):
     """
@@ -57,10 +47,7 @@ def get_model_explanation(features_usadas: dict | None = None):
     # ==========================================================
     # 1) Extraer regresión logística del Pipeline
     # ==========================================================
-    if isinstance(model, Pipeline):
-        clf = model.steps[-1][1]   # último paso
-    else:
-        clf = model
+    clf = final_estimator(model)   # último paso si es Pipeline
 
     if not hasattr(clf, "coef_"):
         return []
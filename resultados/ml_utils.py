@@ -1,11 +1,5 @@
-import joblib
-import numpy as np
-import pandas as pd
-from functools import lru_cache
-from django.conf import settings
-from pathlib import Path
-from sklearn.pipeline import Pipeline
-
+# Solo metadatos: este módulo no debe importar pandas / sklearn / joblib
+# (lo importan las vistas al arrancar cada worker).
 
 # ==========================================================
 # Variables clínicas entendibles para psicólogos
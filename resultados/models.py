@@ -28,6 +28,97 @@ class PrediccionRiesgo(models.Model):
     modelo_version = models.CharField(max_length=40, default='rl_v1')
     actualizado = models.DateTimeField(auto_now=True)  # ✅ mejor
 
+    # Umbrales con los que se asignó el nivel (ver reclasificar_niveles)
+    umbral_medio = models.FloatField(null=True, blank=True)
+    umbral_alto = models.FloatField(null=True, blank=True)
+
+    # Explicación (factores + narrativa) calculada junto con la predicción;
+    # se recalcula al leerla si cambió la versión del modelo.
+    explicacion = models.JSONField(default=dict, blank=True)
+    explicacion_version = models.CharField(max_length=40, blank=True, default='')
+
     def __str__(self):
         return f"{self.estudiante_id} {self.nivel} ({self.probabilidad})"
 
+
+
+class FeatureEstudiante(models.Model):
+    """
+    Feature store: agregados PANAS / WHOQOL / CASO precalculados por estudiante.
+    Se refresca cuando una sesión de esos instrumentos queda COMPLETADA
+    (ver resultados.signals) y lo leen la inferencia y los listados.
+    """
+    estudiante = models.OneToOneField(
+        'forms.Perfil',
+        on_delete=models.CASCADE,
+        related_name='feature_store'
+    )
+
+    # PANAS (sumas de 10 ítems = entradas del modelo)
+    x_panas_positivo = models.FloatField(null=True, blank=True, db_index=True)
+    x_panas_negativo = models.FloatField(null=True, blank=True, db_index=True)
+    panas_pos_mean = models.FloatField(null=True, blank=True)
+    panas_neg_mean = models.FloatField(null=True, blank=True)
+    panas_n_resp = models.PositiveSmallIntegerField(default=0)
+
+    # WHOQOL-BREF (medias por dominio, con ítems inversos)
+    x_whoqol_phys_mean = models.FloatField(null=True, blank=True, db_index=True)
+    x_whoqol_psych_mean = models.FloatField(null=True, blank=True, db_index=True)
+    x_whoqol_social_mean = models.FloatField(null=True, blank=True, db_index=True)
+    whoqol_env_mean = models.FloatField(null=True, blank=True)
+    whoqol_total_mean = models.FloatField(null=True, blank=True)
+    whoqol_n_resp = models.PositiveSmallIntegerField(default=0)
+
+    # CASO-A30
+    x_caso_mean = models.FloatField(null=True, blank=True, db_index=True)
+    caso_total = models.FloatField(null=True, blank=True)
+    caso_n_resp = models.PositiveSmallIntegerField(default=0)
+
+    # Sesiones de origen
+    panas_sesion = models.ForeignKey(
+        'forms.SesionEvaluacion', null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    whoqol_sesion = models.ForeignKey(
+        'forms.SesionEvaluacion', null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+    caso_sesion = models.ForeignKey(
+        'forms.SesionEvaluacion', null=True, blank=True, on_delete=models.SET_NULL, related_name='+'
+    )
+
+    computed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Features {self.estudiante_id} ({self.computed_at:%Y-%m-%d %H:%M})"
+
+
+class TareaCola(models.Model):
+    """
+    Cola durable de tareas (ver resultados.cola). `clave` es la llave de
+    idempotencia: una sola tarea viva por clave (p. ej. "post_envio:<sesion>").
+    La procesa el comando `procesar_cola` o, tras el commit, el propio proceso.
+    """
+    ESTADOS = [
+        ('PENDIENTE', 'Pendiente'),
+        ('EN_CURSO', 'En curso'),
+        ('COMPLETADO', 'Completado'),
+        ('ERROR', 'Error'),
+    ]
+    tipo = models.CharField(max_length=40)
+    clave = models.CharField(max_length=120, unique=True)
+    payload = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADOS, default='PENDIENTE')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True)  # lease del worker que la tomó
+    repetir = models.BooleanField(default=False)  # se volvió a encolar mientras corría
+    error = models.TextField(blank=True, default='')
+    creado = models.DateTimeField(auto_now_add=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['estado', 'disponible_en'], name='tareacola_estado_disp')]
+
+    def __str__(self):
+        return f"{self.clave} {self.estado} ({self.intentos}/{self.max_intentos})"
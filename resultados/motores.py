@@ -0,0 +1,244 @@
+# resultados/motores.py
+"""
+Motores de resumen por sesión (score_summary_for_session).
+
+El motor se elige por ScoringProfile.engine: el primer perfil activo del
+cuestionario con engine distinto de AUTO. Si no hay ninguno se usa el código
+del cuestionario (comportamiento anterior) y, en último caso, AUTO.
+
+Las respuestas de la sesión se leen una sola vez (VectorRespuestas) y todos
+los motores trabajan sobre ese vector, así que un resumen cuesta una sola
+consulta de respuestas sin importar el instrumento.
+
+Para agregar un motor:
+
+    @registrar_motor("MI_ENGINE")
+    def _mi_motor(sesion, vector) -> dict: ...   # {"titulo": ..., "items": [...]}
+"""
+from __future__ import annotations
+
+from typing import Callable
+
+from forms.models import Respuesta, ScoringProfile
+from forms.services.scoring_plan import get_scoring_plan, score_with_plan
+
+from .services import (
+    PANAS_NEG_IDX,
+    PANAS_POS_IDX,
+    _answers_dict_from_rows,
+    _build_whoqol_features_from_session,
+)
+
+MOTORES: dict[str, Callable] = {}
+
+# Fallback cuando el cuestionario no tiene perfil con engine
+CODIGO_MOTOR = {
+    "WHO-QOL": "WHOQOL",
+    "WHOQOL": "WHOQOL",
+    "PANAS": "PANAS",
+    "CASO-A30": "CASO30",
+    "CASO30": "CASO30",
+    "CASO-A 30": "CASO30",
+}
+
+
+def registrar_motor(engine: str):
+    def deco(fn):
+        MOTORES[engine.upper()] = fn
+        return fn
+    return deco
+
+
+# ============================================================
+# Vector de respuestas (1 consulta por sesión)
+# ============================================================
+
+class VectorRespuestas:
+    """
+    Filas (pregunta_id, valor_numerico, opcion_id, valor_texto, pregunta_codigo, pregunta_orden)
+    de una sesión, ordenadas por pregunta__orden, id.
+    """
+
+    FIELDS = (
+        "pregunta_id",
+        "valor_numerico",
+        "opcion_seleccionada_id",
+        "valor_texto",
+        "pregunta__codigo",
+        "pregunta__orden",
+    )
+
+    def __init__(self, sesion_id: int, rows, cuestionario_id: int | None = None):
+        self.sesion_id = sesion_id
+        self.cuestionario_id = cuestionario_id
+        self.rows = list(rows)
+
+    @classmethod
+    def cargar(cls, sesion) -> "VectorRespuestas":
+        rows = (
+            Respuesta.objects
+            .filter(sesion_id=sesion.id)
+            .order_by("pregunta__orden", "id")
+            .values_list(*cls.FIELDS)
+        )
+        return cls(sesion.id, rows, sesion.cuestionario_id)
+
+    def por_prefijo(self, prefix: str, n_items: int) -> dict[str, float]:
+        """Igual que _get_answers_dict_by_prefix, sin volver a consultar."""
+        return _answers_dict_from_rows(
+            ((num, opc, codigo, orden, self.cuestionario_id) for _, num, opc, _, codigo, orden in self.rows),
+            prefix, n_items,
+        )
+
+    def filas_plan(self) -> list[tuple]:
+        """(pregunta_id, valor_numerico, valor_texto) para score_with_plan."""
+        return [(qid, num, txt) for qid, num, _, txt, _, _ in self.rows]
+
+    def numericos_por_orden(self):
+        for _, num, _, _, _, orden in self.rows:
+            yield orden, num
+
+
+# ============================================================
+# Selección
+# ============================================================
+
+def motor_de_cuestionario(cuestionario) -> str:
+    engine = (
+        ScoringProfile.objects
+        .filter(cuestionario_id=cuestionario.id, activo=True)
+        .exclude(engine="AUTO")
+        .order_by("id")
+        .values_list("engine", flat=True)
+        .first()
+    )
+    if engine and engine.upper() in MOTORES:
+        return engine.upper()
+    codigo = (cuestionario.codigo or "").upper().strip()
+    return CODIGO_MOTOR.get(codigo, "AUTO")
+
+
+def resumen_sesion(sesion, engine: str | None = None, vector: VectorRespuestas | None = None) -> dict:
+    engine = (engine or motor_de_cuestionario(sesion.cuestionario)).upper()
+    motor = MOTORES.get(engine, MOTORES["AUTO"])
+    if vector is None:
+        vector = VectorRespuestas.cargar(sesion)
+    return motor(sesion, vector)
+
+
+# ============================================================
+# Motores
+# ============================================================
+
+@registrar_motor("WHOQOL")
+def _motor_whoqol(sesion, vector: VectorRespuestas) -> dict:
+    features = _build_whoqol_features_from_session(sesion, raw=vector.por_prefijo("WHOQOL_", 26))
+
+    total = features.get("WHOQOL_TOTAL_MEAN")
+
+    # 🔎 Criterio clínico estricto:
+    # < 3  = Baja
+    # = 3  = Media
+    # > 3  = Alta
+    if total is not None:
+        if total < 3:
+            nivel = "Baja Calidad de Vida"
+        elif total == 3:
+            nivel = "Calidad de Vida Media"
+        else:
+            nivel = "Alta Calidad de Vida"
+    else:
+        nivel = "Sin datos suficientes"
+
+    return {
+        "titulo": "Resultados WHOQOL-BREF",
+        "items": [
+            {"label": "Dominio Físico", "value": features.get("WHOQOL_PHYS_MEAN"), "fmt": "float2"},
+            {"label": "Dominio Psicológico", "value": features.get("WHOQOL_PSYCH_MEAN"), "fmt": "float2"},
+            {"label": "Dominio Social", "value": features.get("WHOQOL_SOCIAL_MEAN"), "fmt": "float2"},
+            {"label": "Dominio Ambiente", "value": features.get("WHOQOL_ENV_MEAN"), "fmt": "float2"},
+            {"label": "Promedio General", "value": total, "fmt": "float2"},
+            {"label": "Clasificación", "value": nivel, "fmt": "text"},
+        ],
+    }
+
+
+@registrar_motor("PANAS")
+def _motor_panas(sesion, vector: VectorRespuestas) -> dict:
+    afecto_positivo = 0
+    afecto_negativo = 0
+
+    # Suma por orden de la pregunta según los índices clínicos del PANAS
+    for orden, num in vector.numericos_por_orden():
+        if num is None:
+            continue
+        try:
+            valor = float(num)
+        except (TypeError, ValueError):
+            continue
+
+        if orden in PANAS_POS_IDX:
+            afecto_positivo += valor
+        elif orden in PANAS_NEG_IDX:
+            afecto_negativo += valor
+
+    # AP
+    if afecto_positivo < 25:
+        nivel_ap = "Bajo"
+    elif 30 <= afecto_positivo <= 35:
+        nivel_ap = "Normal"
+    elif afecto_positivo > 40:
+        nivel_ap = "Alto"
+    else:
+        nivel_ap = "Intermedio"
+
+    # AN
+    if afecto_negativo <= 20:
+        nivel_an = "Normal"
+    elif afecto_negativo > 25:
+        nivel_an = "Alto"
+    else:
+        nivel_an = "Elevado moderado"
+
+    return {
+        "titulo": "Resultados PANAS",
+        "items": [
+            {"label": "Afecto Positivo (AP)", "value": afecto_positivo, "fmt": "float2"},
+            {"label": "Nivel AP", "value": nivel_ap, "fmt": "text"},
+            {"label": "Afecto Negativo (AN)", "value": afecto_negativo, "fmt": "float2"},
+            {"label": "Nivel AN", "value": nivel_an, "fmt": "text"},
+            {"label": "Media Teórica Total", "value": 60, "fmt": "float2"},
+        ],
+    }
+
+
+def _auto_sum(sesion, vector: VectorRespuestas) -> dict:
+    plan = get_scoring_plan(sesion.cuestionario)
+    _, breakdown = score_with_plan(plan, vector.filas_plan(), sesion.id)
+    return breakdown
+
+
+@registrar_motor("CASO30")
+def _motor_caso(sesion, vector: VectorRespuestas) -> dict:
+    breakdown = _auto_sum(sesion, vector)
+    return {
+        "titulo": "Resultados CASO-A30",
+        "items": [
+            {"label": "Suma Total", "value": breakdown.get("total"), "fmt": "float2"},
+            {"label": "Promedio", "value": breakdown.get("avg"), "fmt": "float2"},
+        ],
+    }
+
+
+@registrar_motor("AUTO")
+def _motor_auto(sesion, vector: VectorRespuestas) -> dict:
+    breakdown = _auto_sum(sesion, vector)
+    codigo = (sesion.cuestionario.codigo or "").upper().strip()
+    return {
+        "titulo": f"Resultados del cuestionario — {codigo}",
+        "items": [
+            {"label": "Suma Total", "value": breakdown.get("total"), "fmt": "float2"},
+            {"label": "Promedio", "value": breakdown.get("avg"), "fmt": "float2"},
+            {"label": "Media teórica", "value": breakdown.get("media_teorica"), "fmt": "float2"},
+        ],
+    }
@@ -0,0 +1,170 @@
+# resultados/reproceso.py
+"""
+Reproceso de PrediccionRiesgo para toda la cohorte (p. ej. al publicar un
+nuevo modelo_tamizaje_bundle.pkl), en paralelo y reanudable.
+
+- Los estudiantes se parten en chunks por id; cada chunk es una tarea.
+- Pool de procesos: cada worker abre su propia conexión a BD y carga el
+  bundle una sola vez (inicializador).
+- Checkpoint JSON con los ids ya procesados: si la corrida falla, la
+  siguiente retoma donde quedó. Con otro modelo se empieza de cero; con otra
+  selección (--ids) u otro --refrescar-features no se reanuda.
+
+Uso: python manage.py recalcular_predicciones --workers 4 --checkpoint ruta.json
+"""
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+
+def partir(perfil_ids, chunk_size: int) -> list[list[int]]:
+    ids = sorted(perfil_ids)
+    return [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+
+
+def sumar_stats(total: dict, parcial: dict) -> dict:
+    for k in ("procesados", "creados", "actualizados", "con_prediccion", "cambios_nivel"):
+        total[k] = total.get(k, 0) + parcial.get(k, 0)
+    for k in ("por_nivel", "transiciones"):
+        acc = total.setdefault(k, {})
+        for nivel, n in parcial.get(k, {}).items():
+            acc[nivel] = acc.get(nivel, 0) + n
+    return total
+
+
+# ============================================================
+# Checkpoint
+# ============================================================
+
+class Checkpoint:
+    """
+    {"formato": 2, "modelo_version": ..., "chunk_size": ..., "ids": [...] | null,
+     "refrescar_features": bool, "completados": [perfil_id, ...], "stats": {...}}
+    `completados` guarda los ids exactos procesados (no el primero de cada
+    chunk): lo pendiente se vuelve a partir, así que estudiantes borrados o
+    chunks con otros límites no hacen que se salte a nadie.
+    Se reescribe de forma atómica (archivo temporal + os.replace) tras cada chunk.
+    """
+
+    FORMATO = 2
+
+    def __init__(self, path, modelo_version: str, chunk_size: int,
+                 ids: list[int] | None = None, refrescar_features: bool = False):
+        self.path = Path(path) if path else None
+        self.modelo_version = modelo_version
+        self.chunk_size = chunk_size
+        self.ids = sorted(set(ids)) if ids else None
+        self.refrescar_features = bool(refrescar_features)
+        self.completados: set[int] = set()
+        self.stats: dict = {}
+        self.reanudado = False
+
+    def cargar(self) -> "Checkpoint":
+        """ValueError si el archivo es de una corrida con otra selección / opciones."""
+        if not self.path or not self.path.exists():
+            return self
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        # Otro modelo (o formato anterior): su avance no sirve, se empieza de cero
+        if data.get("formato") != self.FORMATO or data.get("modelo_version") != self.modelo_version:
+            return self
+        if data.get("ids") != self.ids or data.get("refrescar_features") != self.refrescar_features:
+            raise ValueError(
+                f"El checkpoint {self.path} es de otra corrida "
+                f"(--ids={data.get('ids')}, --refrescar-features={data.get('refrescar_features')}); "
+                "bórralo o usa otro archivo."
+            )
+        self.completados = set(data.get("completados") or [])
+        self.stats = data.get("stats") or {}
+        self.reanudado = bool(self.completados)
+        return self
+
+    def pendientes(self, perfil_ids) -> list[int]:
+        return [pid for pid in perfil_ids if pid not in self.completados]
+
+    def marcar(self, chunk: list[int], stats: dict) -> None:
+        self.completados.update(chunk)
+        sumar_stats(self.stats, stats)
+        self.guardar()
+
+    def guardar(self) -> None:
+        if not self.path:
+            return
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps({
+            "formato": self.FORMATO,
+            "modelo_version": self.modelo_version,
+            "chunk_size": self.chunk_size,
+            "ids": self.ids,
+            "refrescar_features": self.refrescar_features,
+            "completados": sorted(self.completados),
+            "stats": self.stats,
+        }), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def borrar(self) -> None:
+        if self.path and self.path.exists():
+            self.path.unlink()
+
+
+# ============================================================
+# Workers
+# ============================================================
+
+def _init_worker(setup_django: bool):
+    import django
+    from django.db import connections
+
+    if setup_django:
+        django.setup()
+    # Nunca reutilizar la conexión heredada del proceso padre
+    connections.close_all()
+
+    from .ml_registry import registry
+    registry.get_bundle()
+
+
+def procesar_chunk(chunk: list[int], dry_run: bool = False, refrescar_features: bool = False) -> dict:
+    from .services import actualizar_predicciones_bulk
+
+    return actualizar_predicciones_bulk(
+        chunk, chunk_size=len(chunk), refrescar_features=refrescar_features, dry_run=dry_run,
+    )
+
+
+def ejecutar(chunks, workers: int = 1, dry_run: bool = False, refrescar_features: bool = False):
+    """
+    Procesa los chunks y va entregando (chunk, stats) en orden de término.
+    Con workers <= 1 corre en el proceso actual.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield chunk, procesar_chunk(chunk, dry_run, refrescar_features)
+        return
+
+    from django.db import connections
+
+    # El fork no debe heredar sockets abiertos a la BD
+    connections.close_all()
+    ctx = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(ctx.get_start_method() != "fork",),
+    ) as pool:
+        futures = {
+            pool.submit(procesar_chunk, chunk, dry_run, refrescar_features): chunk
+            for chunk in chunks
+        }
+        try:
+            for fut in as_completed(futures):
+                yield futures[fut], fut.result()
+        except BaseException:
+            # Lo pendiente se descarta; el checkpoint permite reanudar
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
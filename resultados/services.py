@@ -1,27 +1,27 @@
 # resultados/services.py
 from __future__ import annotations
+import math
 import os
-import joblib
+import time
 import numpy as np
 from django.conf import settings
 from django.utils import timezone
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+from django.db.models.functions import Upper
 from forms.models import SesionEvaluacion, Respuesta
+from forms.services.opciones import valor_opcion
 from resultados.ml_runtime import get_model_explanation
-from .models import PrediccionRiesgo
-import pandas as pd
+from .models import FeatureEstudiante, PrediccionRiesgo
 from .ml_runtime import load_bundle
+from .ml_compiled import CompiledModel, is_sklearn_pipeline, predict_proba_matrix
+from .ml_registry import registry
 from .ml_utils import CLINICAL_METADATA
 
 # ============================================================
 # CONFIG
 # ============================================================
 
-# Ruta del bundle exportado desde notebook
-MODEL_BUNDLE_PATH = os.path.join(
-    settings.BASE_DIR, "resultados", "ml", "modelo_tamizaje_bundle.pkl"
-)
-
 # Activa debug fácil:
 # - por defecto usa settings.DEBUG
 # - o puedes forzar con env var ML_DEBUG=1
@@ -31,26 +31,18 @@ def _dbg(*args):
     pass
 
 
-_bundle_cache = None
-
-
 # ============================================================
 # 1) Bundle loader + triage
 # ============================================================
 
 def _load_bundle():
-    global _bundle_cache
-    if _bundle_cache is not None:
-        _dbg("bundle cache HIT")
-        return _bundle_cache
-
-    _dbg("MODEL_BUNDLE_PATH =", MODEL_BUNDLE_PATH, "exists?", os.path.exists(MODEL_BUNDLE_PATH))
-    if not os.path.exists(MODEL_BUNDLE_PATH):
-        return None
-
-    _bundle_cache = joblib.load(MODEL_BUNDLE_PATH)
-    _dbg("bundle keys:", list(_bundle_cache.keys()) if isinstance(_bundle_cache, dict) else type(_bundle_cache))
-    return _bundle_cache
+    """
+    Bundle vigente desde el registro único (resultados.ml_registry):
+    compilado si existe, versionado por sha256 y con recarga en caliente.
+    """
+    bundle = registry.get_bundle()
+    _dbg("bundle version:", bundle.get("version") if bundle else None)
+    return bundle
 
 
 def _nivel_por_prob(p: float | None, thr_medio: float, thr_alto: float) -> str:
@@ -74,6 +66,20 @@ def _normalize_code(s: str) -> str:
     return (s or "").strip().upper()
 
 
+# Códigos aceptados por instrumento (prefijo de respuestas, nº de ítems)
+INSTRUMENT_CODES = {
+    "PANAS": ["PANAS"],
+    "WHOQOL": ["WHO-QOL", "WHOQOL", "WHOQOL-BREF"],
+    "CASO": ["CASO-A30", "CASO-30", "CASO"],
+}
+
+INSTRUMENT_ITEMS = {
+    "PANAS": ("PANAS_", 20),
+    "WHOQOL": ("WHOQOL_", 26),
+    "CASO": ("CASO_", 30),
+}
+
+
 def _get_last_completed_session(perfil, codigos: str | list[str]):
     """
     Busca la última sesión COMPLETADA del estudiante para uno o varios códigos.
@@ -108,58 +114,55 @@ def _get_last_completed_session(perfil, codigos: str | list[str]):
 
 
 # ============================================================
-# 3) Lectura numérica robusta (valor_numerico u opcion.valor)
+# 3) Lectura numérica robusta (valor_numerico u Opcion.valor_num)
 #    + fallback por orden si pregunta.codigo viene vacío
 # ============================================================
 
-def _value_from_respuesta(r: Respuesta) -> float | None:
-    if r.valor_numerico is not None:
-        try:
-            return float(r.valor_numerico)
-        except Exception:
-            return None
+# Columnas de Respuesta para _answers_dict_from_rows: la opción se resuelve con
+# el mapa cacheado del cuestionario (valor_opcion), sin JOIN a Opcion.
+RESPUESTA_NUM_FIELDS = (
+    "valor_numerico",
+    "opcion_seleccionada_id",
+    "pregunta__codigo",
+    "pregunta__orden",
+    "pregunta__cuestionario_id",
+)
+
 
-    if r.opcion_seleccionada and r.opcion_seleccionada.valor is not None:
+def _value_from_raw(valor_numerico, opcion_id, cuestionario_id) -> float | None:
+    if valor_numerico is not None:
         try:
-            return float(r.opcion_seleccionada.valor)
+            return float(valor_numerico)
         except Exception:
             return None
 
-    return None
+    return valor_opcion(cuestionario_id, opcion_id)
 
 
-def _get_answers_dict_by_prefix(session_id: int, prefix: str, n_items: int) -> dict[str, float]:
-    """
-    Devuelve dict {PREFIX_XX: valor} para XX=01..n_items
+def _value_from_respuesta(r: Respuesta) -> float | None:
+    return _value_from_raw(r.valor_numerico, r.opcion_seleccionada_id, r.pregunta.cuestionario_id)
 
-    Regla:
-      - Si pregunta.codigo existe y empieza con prefix -> usa ese código
-      - Si pregunta.codigo está vacío -> usa pregunta.orden para construir PREFIX_XX
 
-    OJO: prefix debe venir como "PANAS_" / "CASO_" / "WHOQOL_"
+def _answers_dict_from_rows(rows, prefix: str, n_items: int) -> dict[str, float]:
+    """
+    rows: iterable de RESPUESTA_NUM_FIELDS
+    (valor_numerico, opcion_id, pregunta_codigo, pregunta_orden, cuestionario_id)
+    ya ordenado por pregunta__orden, id.
+
+    Misma regla que _get_answers_dict_by_prefix (código real o fallback por orden).
     """
     prefix = (prefix or "").strip().upper()
     if not prefix.endswith("_"):
         prefix = prefix + "_"
 
-    qs = (
-        Respuesta.objects
-        .select_related("pregunta", "opcion_seleccionada")
-        .filter(sesion_id=session_id)
-        .order_by("pregunta__orden", "id")
-    )
-
     out: dict[str, float] = {}
-    miss_val = 0
 
-    for r in qs:
-        v = _value_from_respuesta(r)
+    for valor_numerico, opcion_id, codigo, orden, cuestionario_id in rows:
+        v = _value_from_raw(valor_numerico, opcion_id, cuestionario_id)
         if v is None:
-            miss_val += 1
             continue
 
-        code = (getattr(r.pregunta, "codigo", "") or "").strip().upper()
-        orden = getattr(r.pregunta, "orden", None)
+        code = (codigo or "").strip().upper()
 
         # 1) código real (si existe)
         if code.startswith(prefix):
@@ -168,16 +171,31 @@ def _get_answers_dict_by_prefix(session_id: int, prefix: str, n_items: int) -> d
 
         # 2) fallback por orden
         if isinstance(orden, int) and 1 <= orden <= n_items:
-            gen_code = f"{prefix}{orden:02d}"
-            out[gen_code] = v
+            out[f"{prefix}{orden:02d}"] = v
 
     valid_codes = {f"{prefix}{i:02d}" for i in range(1, n_items + 1)}
-    out = {k: out[k] for k in out.keys() if k in valid_codes}
+    return {k: out[k] for k in out.keys() if k in valid_codes}
 
-    _dbg(
-        f"answers_by_prefix session={session_id} prefix={prefix} n_items={n_items} -> out={len(out)} "
-        f"miss_val={miss_val} qs_count={qs.count()}"
+
+def _get_answers_dict_by_prefix(session_id: int, prefix: str, n_items: int) -> dict[str, float]:
+    """
+    Devuelve dict {PREFIX_XX: valor} para XX=01..n_items
+
+    Regla:
+      - Si pregunta.codigo existe y empieza con prefix -> usa ese código
+      - Si pregunta.codigo está vacío -> usa pregunta.orden para construir PREFIX_XX
+
+    OJO: prefix debe venir como "PANAS_" / "CASO_" / "WHOQOL_"
+    """
+    rows = (
+        Respuesta.objects
+        .filter(sesion_id=session_id)
+        .order_by("pregunta__orden", "id")
+        .values_list(*RESPUESTA_NUM_FIELDS)
     )
+    out = _answers_dict_from_rows(rows, prefix, n_items)
+
+    _dbg(f"answers_by_prefix session={session_id} prefix={prefix} n_items={n_items} -> out={len(out)}")
     return out
 
 
@@ -198,21 +216,18 @@ def _mean_values(d: dict[str, float], codes: list[str]) -> float | None:
 PANAS_POS_IDX = [1, 3, 5, 9, 10, 12, 14, 16, 17, 19]
 PANAS_NEG_IDX = [2, 4, 6, 7, 8, 11, 13, 15, 18, 20]
 
-def _build_panas_features(perfil) -> dict:
-    s = _get_last_completed_session(perfil, "PANAS")
-    if not s:
-        return {
-            "X_PANAS_Positivo": None,
-            "X_PANAS_Negativo": None,
-            "PANAS_POS_SUM": None,
-            "PANAS_NEG_SUM": None,
-            "PANAS_POS_MEAN": None,
-            "PANAS_NEG_MEAN": None,
-            "PANAS_N_RESP": 0,
-        }
+PANAS_EMPTY = {
+    "X_PANAS_Positivo": None,
+    "X_PANAS_Negativo": None,
+    "PANAS_POS_SUM": None,
+    "PANAS_NEG_SUM": None,
+    "PANAS_POS_MEAN": None,
+    "PANAS_NEG_MEAN": None,
+    "PANAS_N_RESP": 0,
+}
 
-    ans = _get_answers_dict_by_prefix(s.id, "PANAS_", 20)
 
+def _panas_features_from_answers(ans: dict[str, float], session_id: int) -> dict:
     pos_codes = [f"PANAS_{i:02d}" for i in PANAS_POS_IDX]
     neg_codes = [f"PANAS_{i:02d}" for i in PANAS_NEG_IDX]
 
@@ -222,7 +237,7 @@ def _build_panas_features(perfil) -> dict:
     neg_mean = _mean_values(ans, neg_codes)
     n_resp = len(ans)
 
-    _dbg("PANAS session", s.id, "n_resp", n_resp, "pos_mean", pos_mean, "neg_mean", neg_mean)
+    _dbg("PANAS session", session_id, "n_resp", n_resp, "pos_mean", pos_mean, "neg_mean", neg_mean)
 
     return {
             # ML inputs (¡Corregido! Le mandamos la suma para que coincida con tu CSV de Colab)
@@ -235,30 +250,37 @@ def _build_panas_features(perfil) -> dict:
             "PANAS_POS_MEAN": pos_mean,
             "PANAS_NEG_MEAN": neg_mean,
             "PANAS_N_RESP": n_resp,
-            "PANAS_SESSION_ID": s.id,
+            "PANAS_SESSION_ID": session_id,
         }
 
 
+def _build_panas_features(perfil) -> dict:
+    s = _get_last_completed_session(perfil, INSTRUMENT_CODES["PANAS"])
+    if not s:
+        return dict(PANAS_EMPTY)
+
+    ans = _get_answers_dict_by_prefix(s.id, "PANAS_", 20)
+    return _panas_features_from_answers(ans, s.id)
+
+
 # ============================================================
 # 5) CASO-A30 -> total + mean
 # ============================================================
 
-def _build_caso_features(perfil) -> dict:
-    s = _get_last_completed_session(perfil, ["CASO-A30", "CASO-30", "CASO"])
-    if not s:
-        return {
-            "X_CASO_MEAN": None,
-            "CASO_TOTAL": None,
-            "CASO_N_RESP": 0,
-        }
+CASO_EMPTY = {
+    "X_CASO_MEAN": None,
+    "CASO_TOTAL": None,
+    "CASO_N_RESP": 0,
+}
 
-    ans = _get_answers_dict_by_prefix(s.id, "CASO_", 30)
+
+def _caso_features_from_answers(ans: dict[str, float], session_id: int) -> dict:
     codes = [f"CASO_{i:02d}" for i in range(1, 31)]
 
     total = _sum_values(ans, codes)
     mean_ = (float(total) / 30.0) if total is not None else None
 
-    _dbg("CASO session", s.id, "n_resp", len(ans), "total", total, "mean", mean_)
+    _dbg("CASO session", session_id, "n_resp", len(ans), "total", total, "mean", mean_)
 
     return {
         # ML
@@ -268,7 +290,7 @@ def _build_caso_features(perfil) -> dict:
         "CASO_TOTAL": total,
         "CASO_MEAN": mean_,
         "CASO_N_RESP": len(ans),
-        "CASO_SESSION_ID": s.id,
+        "CASO_SESSION_ID": session_id,
         "CASO_INTERP": (
             "Suma de 30 ítems (1–5). Altas = buena asertividad. "
             "Bajas = pasividad o agresividad indirecta. Media teórica: 90."
@@ -276,6 +298,15 @@ def _build_caso_features(perfil) -> dict:
     }
 
 
+def _build_caso_features(perfil) -> dict:
+    s = _get_last_completed_session(perfil, INSTRUMENT_CODES["CASO"])
+    if not s:
+        return dict(CASO_EMPTY)
+
+    ans = _get_answers_dict_by_prefix(s.id, "CASO_", 30)
+    return _caso_features_from_answers(ans, s.id)
+
+
 # ============================================================
 # 6) WHOQOL-BREF -> dominios (con reversa)
 # ============================================================
@@ -299,21 +330,17 @@ def _whoqol_score_item(i: int, v: float | None) -> float | None:
         return 6.0 - v
     return v
 
-def _build_whoqol_features(perfil) -> dict:
-    # tu código real del cuestionario es WHO-QOL
-    s = _get_last_completed_session(perfil, ["WHO-QOL", "WHOQOL", "WHOQOL-BREF"])
-    if not s:
-        return {
-            "X_WHOQOL_PHYS_MEAN": None,
-            "X_WHOQOL_PSYCH_MEAN": None,
-            "X_WHOQOL_SOCIAL_MEAN": None,
-            "WHOQOL_ENV_MEAN": None,
-            "WHOQOL_TOTAL_MEAN": None,
-            "WHOQOL_N_RESP": 0,
-        }
+WHOQOL_EMPTY = {
+    "X_WHOQOL_PHYS_MEAN": None,
+    "X_WHOQOL_PSYCH_MEAN": None,
+    "X_WHOQOL_SOCIAL_MEAN": None,
+    "WHOQOL_ENV_MEAN": None,
+    "WHOQOL_TOTAL_MEAN": None,
+    "WHOQOL_N_RESP": 0,
+}
 
-    raw = _get_answers_dict_by_prefix(s.id, "WHOQOL_", 26)
 
+def _whoqol_features_from_answers(raw: dict[str, float], session_id: int) -> dict:
     scored: dict[int, float | None] = {}
     for i in range(1, 27):
         code = f"WHOQOL_{i:02d}"
@@ -330,7 +357,7 @@ def _build_whoqol_features(perfil) -> dict:
     total   = mean_items(list(range(1, 27)))
     n_resp  = sum(1 for i in range(1, 27) if scored[i] is not None)
 
-    _dbg("WHOQOL session", s.id, "n_resp", n_resp, "phys", phys, "psych", psych, "social", social)
+    _dbg("WHOQOL session", session_id, "n_resp", n_resp, "phys", phys, "psych", psych, "social", social)
 
     return {
         # ML
@@ -345,13 +372,23 @@ def _build_whoqol_features(perfil) -> dict:
         "WHOQOL_ENV_MEAN": env,
         "WHOQOL_TOTAL_MEAN": total,
         "WHOQOL_N_RESP": n_resp,
-        "WHOQOL_SESSION_ID": s.id,
+        "WHOQOL_SESSION_ID": session_id,
 
         # NUEVO
 
     }
 
 
+def _build_whoqol_features(perfil) -> dict:
+    # tu código real del cuestionario es WHO-QOL
+    s = _get_last_completed_session(perfil, INSTRUMENT_CODES["WHOQOL"])
+    if not s:
+        return dict(WHOQOL_EMPTY)
+
+    raw = _get_answers_dict_by_prefix(s.id, "WHOQOL_", 26)
+    return _whoqol_features_from_answers(raw, s.id)
+
+
 def interpret_whoqol_total(mean_value: float | None) -> dict:
     """
     Clasificación clínica oficial WHOQOL-BREF
@@ -385,13 +422,14 @@ def interpret_whoqol_total(mean_value: float | None) -> dict:
         "descripcion": "Valor fuera del rango esperado (1–5)."
     }
 
-def _build_whoqol_features_from_session(s) -> dict:
+def _build_whoqol_features_from_session(s, raw: dict[str, float] | None = None) -> dict:
     """
     Calcula WHOQOL directamente desde una sesión específica.
-    No busca sesión adicional.
+    No busca sesión adicional. `raw` evita releer las respuestas si ya se tienen.
     """
 
-    raw = _get_answers_dict_by_prefix(s.id, "WHOQOL_", 26)
+    if raw is None:
+        raw = _get_answers_dict_by_prefix(s.id, "WHOQOL_", 26)
 
     scored = {}
     for i in range(1, 27):
@@ -445,10 +483,12 @@ def _clasificar_whoqol(valor: float | None) -> str | None:
 # ============================================================
 
 def build_features(perfil):
-    feats_all: dict = {}
-    feats_all.update(_build_panas_features(perfil))
-    feats_all.update(_build_whoqol_features(perfil))
-    feats_all.update(_build_caso_features(perfil))
+    """
+    Features PANAS + WHOQOL + CASO del estudiante en una sola pasada:
+    1 consulta para las últimas sesiones COMPLETADAS de los 3 instrumentos
+    y 1 consulta para todas sus respuestas (ver build_features_bulk).
+    """
+    feats_all = build_features_bulk([perfil.pk])[perfil.pk]
 
     bundle = _load_bundle()
     if not bundle or not isinstance(bundle, dict):
@@ -462,84 +502,474 @@ def build_features(perfil):
     return feats_all, feats_ml
 
 
+def _latest_completed_sessions_bulk(perfil_ids) -> dict[int, dict[str, int]]:
+    """
+    Última sesión COMPLETADA por estudiante e instrumento, en UNA consulta.
+    Retorna: {perfil_id: {"PANAS": sesion_id, "WHOQOL": ..., "CASO": ...}}
+    """
+    code_to_inst = {
+        _normalize_code(c): inst
+        for inst, codes in INSTRUMENT_CODES.items()
+        for c in codes
+    }
+
+    rows = (
+        SesionEvaluacion.objects
+        .filter(estudiante_id__in=perfil_ids, estado="COMPLETADA")
+        .annotate(codigo_norm=Upper("cuestionario__codigo"))
+        .filter(codigo_norm__in=list(code_to_inst.keys()))
+        .order_by("estudiante_id", "-fecha_fin", "-fecha_inicio", "-id")
+        .values_list("id", "estudiante_id", "codigo_norm")
+    )
+
+    out: dict[int, dict[str, int]] = {}
+    for sid, est_id, codigo in rows:
+        # El orden garantiza que la primera vista es la más reciente
+        out.setdefault(est_id, {}).setdefault(code_to_inst[codigo], sid)
+    return out
+
+
+def build_features_bulk(perfil_ids) -> dict[int, dict]:
+    """
+    Igual que build_features()[0] pero para una cohorte completa:
+    2 consultas en total (sesiones + respuestas), sin importar cuántos estudiantes.
+    Retorna: {perfil_id: feats_all}
+    """
+    perfil_ids = list(perfil_ids)
+    sesiones = _latest_completed_sessions_bulk(perfil_ids)
+
+    all_sids = [sid for per_inst in sesiones.values() for sid in per_inst.values()]
+    rows_by_sid: dict[int, list] = {sid: [] for sid in all_sids}
+
+    if all_sids:
+        rows = (
+            Respuesta.objects
+            .filter(sesion_id__in=all_sids)
+            .order_by("pregunta__orden", "id")
+            .values_list("sesion_id", *RESPUESTA_NUM_FIELDS)
+        )
+        for sid, *row in rows:
+            rows_by_sid[sid].append(row)
+
+    builders = {
+        "PANAS": (_panas_features_from_answers, PANAS_EMPTY),
+        "WHOQOL": (_whoqol_features_from_answers, WHOQOL_EMPTY),
+        "CASO": (_caso_features_from_answers, CASO_EMPTY),
+    }
+
+    out: dict[int, dict] = {}
+    for pid in perfil_ids:
+        per_inst = sesiones.get(pid, {})
+        feats_all: dict = {}
+        for inst, (builder, empty) in builders.items():
+            sid = per_inst.get(inst)
+            if sid is None:
+                feats_all.update(empty)
+                continue
+            prefix, n_items = INSTRUMENT_ITEMS[inst]
+            ans = _answers_dict_from_rows(rows_by_sid[sid], prefix, n_items)
+            feats_all.update(builder(ans, sid))
+        out[pid] = feats_all
+    return out
+
+
+# ============================================================
+# 7b) Feature store (FeatureEstudiante)
+# ============================================================
+
+# columna del store -> llave en feats_all
+FEATURE_STORE_FIELDS = {
+    "x_panas_positivo": "X_PANAS_Positivo",
+    "x_panas_negativo": "X_PANAS_Negativo",
+    "panas_pos_mean": "PANAS_POS_MEAN",
+    "panas_neg_mean": "PANAS_NEG_MEAN",
+    "panas_n_resp": "PANAS_N_RESP",
+    "x_whoqol_phys_mean": "X_WHOQOL_PHYS_MEAN",
+    "x_whoqol_psych_mean": "X_WHOQOL_PSYCH_MEAN",
+    "x_whoqol_social_mean": "X_WHOQOL_SOCIAL_MEAN",
+    "whoqol_env_mean": "WHOQOL_ENV_MEAN",
+    "whoqol_total_mean": "WHOQOL_TOTAL_MEAN",
+    "whoqol_n_resp": "WHOQOL_N_RESP",
+    "x_caso_mean": "X_CASO_MEAN",
+    "caso_total": "CASO_TOTAL",
+    "caso_n_resp": "CASO_N_RESP",
+    "panas_sesion_id": "PANAS_SESSION_ID",
+    "whoqol_sesion_id": "WHOQOL_SESSION_ID",
+    "caso_sesion_id": "CASO_SESSION_ID",
+}
+
+FEATURE_STORE_UPDATE_FIELDS = [f.removesuffix("_id") for f in FEATURE_STORE_FIELDS] + ["computed_at"]
+
+
+def _features_from_store(fe: FeatureEstudiante) -> dict:
+    """Reconstruye feats_all (mismo dict que build_features_bulk) desde una fila del store."""
+    if fe.panas_sesion_id:
+        panas = {
+            "X_PANAS_Positivo": fe.x_panas_positivo,
+            "X_PANAS_Negativo": fe.x_panas_negativo,
+            "PANAS_POS_SUM": fe.x_panas_positivo,
+            "PANAS_NEG_SUM": fe.x_panas_negativo,
+            "PANAS_POS_MEAN": fe.panas_pos_mean,
+            "PANAS_NEG_MEAN": fe.panas_neg_mean,
+            "PANAS_N_RESP": fe.panas_n_resp,
+            "PANAS_SESSION_ID": fe.panas_sesion_id,
+        }
+    else:
+        panas = dict(PANAS_EMPTY)
+
+    if fe.whoqol_sesion_id:
+        whoqol = {
+            "X_WHOQOL_PHYS_MEAN": fe.x_whoqol_phys_mean,
+            "X_WHOQOL_PSYCH_MEAN": fe.x_whoqol_psych_mean,
+            "X_WHOQOL_SOCIAL_MEAN": fe.x_whoqol_social_mean,
+            "WHOQOL_PHYS_MEAN": fe.x_whoqol_phys_mean,
+            "WHOQOL_PSYCH_MEAN": fe.x_whoqol_psych_mean,
+            "WHOQOL_SOCIAL_MEAN": fe.x_whoqol_social_mean,
+            "WHOQOL_ENV_MEAN": fe.whoqol_env_mean,
+            "WHOQOL_TOTAL_MEAN": fe.whoqol_total_mean,
+            "WHOQOL_N_RESP": fe.whoqol_n_resp,
+            "WHOQOL_SESSION_ID": fe.whoqol_sesion_id,
+        }
+    else:
+        whoqol = dict(WHOQOL_EMPTY)
+
+    if fe.caso_sesion_id:
+        # CASO_MEAN / CASO_INTERP se derivan, no se guardan
+        caso = _caso_features_from_answers({}, fe.caso_sesion_id)
+        caso.update({
+            "X_CASO_MEAN": fe.x_caso_mean,
+            "CASO_TOTAL": fe.caso_total,
+            "CASO_MEAN": fe.x_caso_mean,
+            "CASO_N_RESP": fe.caso_n_resp,
+        })
+    else:
+        caso = dict(CASO_EMPTY)
+
+    return {**panas, **whoqol, **caso}
+
+
+def refrescar_feature_store(perfil_ids) -> dict[int, dict]:
+    """
+    Recalcula desde las respuestas (build_features_bulk) y guarda en FeatureEstudiante.
+    Lo llama la señal de SesionEvaluacion COMPLETADA para el estudiante afectado.
+    Retorna: {perfil_id: feats_all}
+    """
+    perfil_ids = list(perfil_ids)
+    feats_by_pid = build_features_bulk(perfil_ids)
+    existentes = FeatureEstudiante.objects.in_bulk(perfil_ids, field_name="estudiante_id")
+    now = timezone.now()
+
+    objs = []
+    for pid in perfil_ids:
+        fe = existentes.get(pid) or FeatureEstudiante(estudiante_id=pid)
+        feats_all = feats_by_pid[pid]
+        for field, key in FEATURE_STORE_FIELDS.items():
+            value = feats_all.get(key)
+            if value is None and field.endswith("_n_resp"):
+                value = 0
+            setattr(fe, field, value)
+        fe.computed_at = now
+        objs.append(fe)
+
+    with transaction.atomic():
+        viejos = [o for o in objs if o.pk is not None]
+        nuevos = [o for o in objs if o.pk is None]
+        if viejos:
+            FeatureEstudiante.objects.bulk_update(viejos, FEATURE_STORE_UPDATE_FIELDS)
+        if nuevos:
+            FeatureEstudiante.objects.bulk_create(nuevos)
+
+    return feats_by_pid
+
+
+def features_estudiantes(perfil_ids, guardar: bool = True) -> dict[int, dict]:
+    """
+    feats_all por estudiante leyendo el feature store (1 consulta).
+    Los que aún no tienen fila se calculan y, con guardar=True, se guardan
+    (refrescar_feature_store).
+    """
+    perfil_ids = list(perfil_ids)
+    store = FeatureEstudiante.objects.in_bulk(perfil_ids, field_name="estudiante_id")
+    out = {pid: _features_from_store(fe) for pid, fe in store.items()}
+
+    faltantes = [pid for pid in perfil_ids if pid not in store]
+    if faltantes:
+        out.update(refrescar_feature_store(faltantes) if guardar else build_features_bulk(faltantes))
+    return out
+
+
 # ============================================================
 # 8) Servicio PRINCIPAL: actualizar_prediccion_estudiante
 # ============================================================
 
+def _set_prediccion(obj, features, probabilidad, nivel, modelo_version, umbrales=(None, None)):
+    obj.features = features
+    obj.probabilidad = probabilidad
+    obj.nivel = nivel
+    obj.modelo_version = modelo_version
+    obj.umbral_medio, obj.umbral_alto = umbrales
+    obj.actualizado = timezone.now()
+    # La explicación se fija aparte (solo cuando hay probabilidad)
+    obj.explicacion = {}
+    obj.explicacion_version = ""
+
+
+def _umbrales(bundle) -> tuple[float, float]:
+    """
+    Umbrales del bundle; settings.RESULTADOS_ML_THRESHOLDS los sobrescribe
+    (recalibración clínica sin publicar un modelo nuevo).
+    """
+    thresholds = {
+        **((bundle or {}).get("thresholds") or {}),
+        **(getattr(settings, "RESULTADOS_ML_THRESHOLDS", None) or {}),
+    }
+    thr_medio = float(thresholds.get("thr_medio", 0.40))
+    thr_alto  = float(thresholds.get("thr_alto", 0.75))
+    return thr_medio, thr_alto
+
+
 def actualizar_prediccion_estudiante(perfil):
     """
-    - Construye features
+    - Lee features del feature store (las calcula si el estudiante no tiene fila)
     - Si faltan features del modelo -> SIN_DATOS
     - Si están -> predict_proba + triage -> guarda
     """
-    feats_all, feats_ml = build_features(perfil)
+    feats_all = features_estudiantes([perfil.pk])[perfil.pk]
     obj, _ = PrediccionRiesgo.objects.get_or_create(estudiante=perfil)
 
     bundle = _load_bundle()
     if not bundle or not isinstance(bundle, dict):
-        obj.features = feats_all
-        obj.probabilidad = None
-        obj.nivel = "SIN_DATOS"
-        obj.modelo_version = "bundle_missing"
-        obj.actualizado = timezone.now()
+        _set_prediccion(obj, feats_all, None, "SIN_DATOS", "bundle_missing")
         obj.save()
         return obj
 
     model = bundle.get("model")
     feature_cols = bundle.get("feature_cols") or []
-    thresholds = bundle.get("thresholds") or {}
-
-    thr_medio = float(thresholds.get("thr_medio", 0.40))
-    thr_alto  = float(thresholds.get("thr_alto", 0.75))
+    feats_ml = {k: feats_all.get(k) for k in feature_cols}
+    thr_medio, thr_alto = _umbrales(bundle)
 
     # Validar features completas
     missing = [k for k in feature_cols if feats_ml.get(k) is None]
     _dbg("missing", missing)
 
     if missing or model is None:
-        obj.features = {
-            **feats_all,
-            "ML_MISSING": missing,
-            "ML_FEATURE_COLS": feature_cols,
-        }
-        obj.probabilidad = None
-        obj.nivel = "SIN_DATOS"
-        obj.modelo_version = "bundle_incomplete"
-        obj.actualizado = timezone.now()
+        _set_prediccion(
+            obj,
+            {**feats_all, "ML_MISSING": missing, "ML_FEATURE_COLS": feature_cols},
+            None, "SIN_DATOS", "bundle_incomplete",
+        )
         obj.save()
         return obj
 
-    # --- IMPORTANTE: usar DataFrame con columnas para evitar warning ---
     try:
-        import pandas as pd  # requerido por este fix
-        X_df = pd.DataFrame([{k: float(feats_ml[k]) for k in feature_cols}], columns=feature_cols)
-        p = float(model.predict_proba(X_df)[0][1])
+        p = float(predict_proba_matrix(model, feature_cols, [[float(feats_ml[k]) for k in feature_cols]])[0])
     except Exception as e:
-        obj.features = {**feats_all, "ML_ERROR": str(e)}
-        obj.probabilidad = None
-        obj.nivel = "SIN_DATOS"
-        obj.modelo_version = "bundle_predict_error"
-        obj.actualizado = timezone.now()
+        _set_prediccion(obj, {**feats_all, "ML_ERROR": str(e)}, None, "SIN_DATOS", "bundle_predict_error")
         obj.save()
         return obj
 
     nivel = _nivel_por_prob(p, thr_medio=thr_medio, thr_alto=thr_alto)
-
-    obj.features = {
-        **feats_all,
-        "ML_INPUTS": feats_ml,
-        "thr_medio": thr_medio,
-        "thr_alto": thr_alto,
-    }
-    obj.probabilidad = p
-    obj.nivel = nivel
-    obj.modelo_version = "tamizaje_rl_bundle_v1"
-    obj.actualizado = timezone.now()
+    features = {**feats_all, "ML_INPUTS": feats_ml}
+
+    _set_prediccion(obj, features, p, nivel, bundle["version"], (thr_medio, thr_alto))
+    X_row = [float(feats_ml[k]) for k in feature_cols]
+    _set_explicacion(
+        obj,
+        _explicaciones_bulk(bundle, feature_cols, [X_row], [features], [p], [nivel])[0],
+        bundle["version"],
+    )
     obj.save()
 
     return obj
 
 
+# ============================================================
+# 8b) Predicción por lotes (cohortes completas)
+# ============================================================
+
+PREDICCION_BULK_FIELDS = [
+    "features", "probabilidad", "nivel", "modelo_version", "actualizado",
+    "umbral_medio", "umbral_alto", "explicacion", "explicacion_version",
+]
+
+
+def actualizar_predicciones_bulk(
+    perfil_ids,
+    chunk_size: int = 500,
+    refrescar_features: bool = False,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Recalcula PrediccionRiesgo para muchos estudiantes:
+      - features de cada chunk desde el feature store (1 consulta); con
+        refrescar_features=True se recalculan desde las respuestas y se guardan
+      - UNA llamada a predict_proba por chunk (matriz de features) y una
+        transformación para las explicaciones
+      - escritura con bulk_update / bulk_create (nada con dry_run=True)
+
+    Retorna estadísticas: procesados, creados, actualizados, con_prediccion,
+    por_nivel, cambios_nivel, transiciones ("BAJO->ALTO": n) y segundos.
+    """
+    t0 = time.perf_counter()
+    perfil_ids = list(perfil_ids)
+
+    bundle = _load_bundle()
+    if bundle and not isinstance(bundle, dict):
+        bundle = None
+
+    stats = {
+        "procesados": 0,
+        "creados": 0,
+        "actualizados": 0,
+        "con_prediccion": 0,
+        "por_nivel": {},
+        "cambios_nivel": 0,
+        "transiciones": {},
+        "segundos": 0.0,
+    }
+
+    for start in range(0, len(perfil_ids), chunk_size):
+        chunk = perfil_ids[start:start + chunk_size]
+        if dry_run:
+            feats_by_pid = build_features_bulk(chunk) if refrescar_features else features_estudiantes(chunk, guardar=False)
+        elif refrescar_features:
+            feats_by_pid = refrescar_feature_store(chunk)
+        else:
+            feats_by_pid = features_estudiantes(chunk)
+        existentes = PrediccionRiesgo.objects.in_bulk(chunk, field_name="estudiante_id")
+        nivel_anterior = {pid: o.nivel for pid, o in existentes.items()}
+
+        objs = {
+            pid: existentes.get(pid) or PrediccionRiesgo(estudiante_id=pid)
+            for pid in chunk
+        }
+
+        listos: list[int] = []
+        X_rows: list[list[float]] = []
+
+        if bundle is None:
+            for pid in chunk:
+                _set_prediccion(objs[pid], feats_by_pid[pid], None, "SIN_DATOS", "bundle_missing")
+        else:
+            model = bundle.get("model")
+            feature_cols = bundle.get("feature_cols") or []
+
+            for pid in chunk:
+                feats_all = feats_by_pid[pid]
+                missing = [k for k in feature_cols if feats_all.get(k) is None]
+                if missing or model is None:
+                    _set_prediccion(
+                        objs[pid],
+                        {**feats_all, "ML_MISSING": missing, "ML_FEATURE_COLS": feature_cols},
+                        None, "SIN_DATOS", "bundle_incomplete",
+                    )
+                    continue
+                listos.append(pid)
+                X_rows.append([float(feats_all[k]) for k in feature_cols])
+
+        if listos:
+            thr_medio, thr_alto = _umbrales(bundle)
+            try:
+                probs = predict_proba_matrix(bundle["model"], feature_cols, X_rows)
+            except Exception as e:
+                for pid in listos:
+                    _set_prediccion(
+                        objs[pid], {**feats_by_pid[pid], "ML_ERROR": str(e)},
+                        None, "SIN_DATOS", "bundle_predict_error",
+                    )
+            else:
+                for pid, row, p in zip(listos, X_rows, probs):
+                    p = float(p)
+                    feats_ml = dict(zip(feature_cols, row))
+                    _set_prediccion(
+                        objs[pid],
+                        {**feats_by_pid[pid], "ML_INPUTS": feats_ml},
+                        p, _nivel_por_prob(p, thr_medio=thr_medio, thr_alto=thr_alto), bundle["version"],
+                        (thr_medio, thr_alto),
+                    )
+                    stats["con_prediccion"] += 1
+
+                # Explicaciones del chunk con una sola transformación
+                explicaciones = _explicaciones_bulk(
+                    bundle, feature_cols, X_rows,
+                    [objs[pid].features for pid in listos],
+                    [objs[pid].probabilidad for pid in listos],
+                    [objs[pid].nivel for pid in listos],
+                )
+                for pid, explicacion in zip(listos, explicaciones):
+                    _set_explicacion(objs[pid], explicacion, bundle["version"])
+
+        nuevos = [o for o in objs.values() if o.pk is None]
+        viejos = [o for o in objs.values() if o.pk is not None]
+
+        if not dry_run:
+            with transaction.atomic():
+                if viejos:
+                    PrediccionRiesgo.objects.bulk_update(viejos, PREDICCION_BULK_FIELDS)
+                if nuevos:
+                    PrediccionRiesgo.objects.bulk_create(nuevos)
+
+        stats["procesados"] += len(chunk)
+        stats["creados"] += len(nuevos)
+        stats["actualizados"] += len(viejos)
+        for pid, o in objs.items():
+            stats["por_nivel"][o.nivel] = stats["por_nivel"].get(o.nivel, 0) + 1
+            antes = nivel_anterior.get(pid)
+            if antes is not None and antes != o.nivel:
+                stats["cambios_nivel"] += 1
+                key = f"{antes}->{o.nivel}"
+                stats["transiciones"][key] = stats["transiciones"].get(key, 0) + 1
+
+    stats["segundos"] = time.perf_counter() - t0
+    return stats
+
+
+# ============================================================
+# 8c) Re-triage: solo cambian los umbrales
+# ============================================================
+
+def reclasificar_niveles(thr_medio: float | None = None, thr_alto: float | None = None) -> int:
+    """
+    Recalcula PrediccionRiesgo.nivel a partir de la probabilidad guardada en
+    UN solo UPDATE (CASE sobre probabilidad), sin volver a inferir.
+    Usa _umbrales() (bundle + settings.RESULTADOS_ML_THRESHOLDS), los mismos
+    que aplica actualizar_prediccion_estudiante. thr_medio / thr_alto solo
+    sirven para confirmarlos: si difieren se rechazan (ValueError), porque el
+    siguiente recálculo devolvería a los estudiantes a los niveles anteriores;
+    para cambiarlos hay que fijar RESULTADOS_ML_THRESHOLDS.
+
+    Guarda los umbrales usados e invalida la explicación (la narrativa
+    menciona el nivel), que se regenera al leerla. Retorna filas afectadas.
+    """
+    vigente_medio, vigente_alto = _umbrales(_load_bundle())
+    for nombre, pedido, vigente in (("thr_medio", thr_medio, vigente_medio), ("thr_alto", thr_alto, vigente_alto)):
+        if pedido is not None and float(pedido) != vigente:
+            raise ValueError(
+                f"{nombre}={float(pedido)} no coincide con el umbral vigente ({vigente}). "
+                f"Fija settings.RESULTADOS_ML_THRESHOLDS (p. ej. {{'{nombre}': {float(pedido)}}}) "
+                "para que los recálculos posteriores usen el mismo valor y vuelve a correr."
+            )
+    thr_medio, thr_alto = vigente_medio, vigente_alto
+    if thr_medio > thr_alto:
+        raise ValueError("thr_medio no puede ser mayor que thr_alto.")
+
+    return (
+        PrediccionRiesgo.objects
+        .filter(probabilidad__isnull=False)
+        .update(
+            nivel=Case(
+                When(probabilidad__gte=thr_alto, then=Value("ALTO")),
+                When(probabilidad__gte=thr_medio, then=Value("MODERADO")),
+                default=Value("BAJO"),
+            ),
+            umbral_medio=thr_medio,
+            umbral_alto=thr_alto,
+            explicacion_version="",
+            actualizado=timezone.now(),
+        )
+    )
+
+
 # ============================================================
 # 9) ML readiness + urgencia
 # ============================================================
@@ -598,65 +1028,58 @@ def get_prediccion_dict(estudiante_perfil):
 
 
 
-import math
-from sklearn.pipeline import Pipeline
-
-import math
-import pandas as pd
-from sklearn.pipeline import Pipeline
-
-def build_ml_explanation(pred):
-
-    if not pred or not pred.features:
-        return {}
-
-    bundle = _load_bundle() 
-    model = bundle["model"]
-    feature_cols = bundle["feature_cols"]
-
-    inputs = pred.features.get("ML_INPUTS", {})
 
-    # 1. Crear DataFrame con los datos del estudiante
-    X_student = pd.DataFrame([{k: float(inputs.get(k, 0)) for k in feature_cols}], columns=feature_cols)
+def _contribuciones(model, feature_cols, X) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    coef_i * x_escalado_i para cada fila de X (una sola transformación para
+    toda la matriz). Retorna (contribuciones (n, k), coefs) o None si el
+    modelo no es lineal.
+    """
+    X = np.asarray(X, dtype=float)
+    if isinstance(model, CompiledModel):
+        clf = model
+        X_scaled = model.transform(X)
+    elif is_sklearn_pipeline(model):
+        import pandas as pd  # solo con el bundle sklearn (sin .npz compilado)
 
-    # 2. Extraer el clasificador y aplicar preprocesamiento
-    if isinstance(model, Pipeline):
         clf = model.steps[-1][1]
-        X_preprocessed = model[:-1].transform(X_student)
-        student_values_scaled = X_preprocessed[0]
+        X_scaled = model[:-1].transform(pd.DataFrame(X, columns=feature_cols))
     else:
         clf = model
-        student_values_scaled = X_student.iloc[0].values
+        X_scaled = X
 
     if not hasattr(clf, "coef_"):
-        return {}
+        return None
+
+    coefs = np.asarray(clf.coef_[0], dtype=float)
+    return np.asarray(X_scaled, dtype=float) * coefs, coefs
 
-    coefs = clf.coef_[0]
+
+def _explicacion_desde_contribuciones(feature_cols, coefs, impactos, features, probabilidad, nivel) -> dict:
+    inputs = features.get("ML_INPUTS", {})
 
     risk_factors = []
     protective_factors = []
 
-    # 3. Iterar calculando el impacto REAL
-    for i, (feature, coef) in enumerate(zip(feature_cols, coefs)):
-        ml_mean_value = float(inputs.get(feature, 0)) 
-        scaled_value = student_values_scaled[i]
-
-        impacto = coef * scaled_value
-        odds = round(math.exp(coef), 3)
+    # Clasificar según el impacto REAL en este estudiante
+    for feature, coef, impacto in zip(feature_cols, coefs, impactos):
+        ml_mean_value = float(inputs.get(feature, 0))
+        impacto = float(impacto)
+        odds = round(math.exp(float(coef)), 3)
 
         meta = CLINICAL_METADATA.get(feature, {})
 
         # ==========================================
-        # TRADUCCIÓN DE UX: Buscar la suma en pred.features (NO en inputs)
+        # TRADUCCIÓN DE UX: Buscar la suma en features (NO en inputs)
         # ==========================================
-        display_value = ml_mean_value 
+        display_value = ml_mean_value
 
         if feature == "X_PANAS_Positivo":
-            display_value = float(pred.features.get("PANAS_POS_SUM", ml_mean_value))
+            display_value = float(features.get("PANAS_POS_SUM", ml_mean_value))
         elif feature == "X_PANAS_Negativo":
-            display_value = float(pred.features.get("PANAS_NEG_SUM", ml_mean_value))
+            display_value = float(features.get("PANAS_NEG_SUM", ml_mean_value))
         elif feature == "X_CASO_MEAN":
-            display_value = float(pred.features.get("CASO_TOTAL", ml_mean_value))
+            display_value = float(features.get("CASO_TOTAL", ml_mean_value))
 
         item = {
             "feature": meta.get("titulo", feature),
@@ -669,8 +1092,7 @@ def build_ml_explanation(pred):
             "impacto": round(abs(impacto), 3),
         }
 
-        # 4. Clasificar dinámicamente según el impacto en ESTE estudiante
-        if impacto > 0.05: 
+        if impacto > 0.05:
             item["direction"] = "up"
             item["interpretacion"] = "Su nivel actual aumenta el riesgo."
             risk_factors.append(item)
@@ -685,20 +1107,67 @@ def build_ml_explanation(pred):
     protective_factors.sort(key=lambda x: x["impacto"], reverse=True)
 
     narrativa = generar_narrativa_clinica(
-        pred.probabilidad,
+        probabilidad,
         risk_factors,
         protective_factors,
-        pred.nivel
+        nivel
     )
 
     return {
-        "probabilidad": round(pred.probabilidad * 100, 2),
-        "nivel": pred.nivel,
-        "risk_factors": risk_factors, # Top 3 dinámico
-        "protective_factors": protective_factors, # Top 3 dinámico
+        "probabilidad": round(probabilidad * 100, 2),
+        "nivel": nivel,
+        "risk_factors": risk_factors,
+        "protective_factors": protective_factors,
         "narrative": narrativa,
     }
 
+
+def _explicaciones_bulk(bundle, feature_cols, X_rows, features_list, probs, niveles) -> list[dict]:
+    """Explicación de cada fila de X_rows con una sola transformación del modelo."""
+    res = _contribuciones(bundle.get("model"), feature_cols, X_rows)
+    if res is None:
+        return [{} for _ in X_rows]
+    contribs, coefs = res
+    return [
+        _explicacion_desde_contribuciones(feature_cols, coefs, contribs[i], features_list[i], float(probs[i]), niveles[i])
+        for i in range(len(X_rows))
+    ]
+
+
+def _set_explicacion(obj, explicacion, version):
+    obj.explicacion = explicacion
+    obj.explicacion_version = version
+
+
+def build_ml_explanation(pred):
+    """
+    Explicación guardada con la predicción (ver actualizar_prediccion_estudiante).
+    Si se generó con otra versión del modelo, se recalcula y se guarda.
+    """
+    if not pred or not pred.features or pred.probabilidad is None:
+        return {}
+
+    bundle = _load_bundle()
+    if not bundle:
+        return pred.explicacion or {}
+
+    version = bundle["version"]
+    if pred.explicacion_version == version and pred.explicacion:
+        return pred.explicacion
+
+    feature_cols = bundle["feature_cols"]
+    inputs = pred.features.get("ML_INPUTS", {})
+    X_row = [float(inputs.get(k, 0)) for k in feature_cols]
+
+    explicacion = _explicaciones_bulk(bundle, feature_cols, [X_row], [pred.features], [pred.probabilidad], [pred.nivel])[0]
+
+    _set_explicacion(pred, explicacion, version)
+    if pred.pk:
+        PrediccionRiesgo.objects.filter(pk=pred.pk).update(
+            explicacion=explicacion, explicacion_version=version
+        )
+    return explicacion
+
 # ===============================
 # Narrativa clínica automática
 # ===============================
@@ -745,155 +1214,15 @@ def generar_narrativa_clinica(prob, risk_factors, protective_factors, nivel):
 
 
 
-from forms.models import ScoringProfile, ScoringRule, Respuesta
-from forms.services import compute_auto_sum_for_session
-
-from forms.models import Respuesta
-from forms.services import compute_auto_sum_for_session
-import numpy as np
-
-
 def score_summary_for_session(session_obj):
+    """
+    Resumen clínico / automático de una sesión para el dashboard.
+    El motor (WHOQOL / PANAS / CASO30 / AUTO) lo decide resultados.motores
+    según ScoringProfile.engine; las respuestas se leen una sola vez.
+    """
+    from .motores import resumen_sesion
 
-    cuestionario_codigo = (session_obj.cuestionario.codigo or "").upper().strip()
-    items = []
-
-    # =========================================================
-    # 🟢 WHOQOL-BREF  (CRITERIO CLÍNICO ESTRICTO)
-    # =========================================================
-    if cuestionario_codigo in ["WHO-QOL", "WHOQOL"]:
-
-        features = _build_whoqol_features_from_session(session_obj)
-
-        phys = features.get("WHOQOL_PHYS_MEAN")
-        psych = features.get("WHOQOL_PSYCH_MEAN")
-        social = features.get("WHOQOL_SOCIAL_MEAN")
-        env = features.get("WHOQOL_ENV_MEAN")
-        total = features.get("WHOQOL_TOTAL_MEAN")
-
-        # 🔎 Criterio clínico estricto:
-        # < 3  = Baja
-        # = 3  = Media
-        # > 3  = Alta
-        if total is not None:
-            if total < 3:
-                nivel = "Baja Calidad de Vida"
-            elif total == 3:
-                nivel = "Calidad de Vida Media"
-            else:
-                nivel = "Alta Calidad de Vida"
-        else:
-            nivel = "Sin datos suficientes"
-
-        items.append({"label": "Dominio Físico", "value": phys, "fmt": "float2"})
-        items.append({"label": "Dominio Psicológico", "value": psych, "fmt": "float2"})
-        items.append({"label": "Dominio Social", "value": social, "fmt": "float2"})
-        items.append({"label": "Dominio Ambiente", "value": env, "fmt": "float2"})
-        items.append({"label": "Promedio General", "value": total, "fmt": "float2"})
-        items.append({"label": "Clasificación", "value": nivel, "fmt": "text"})
-
-        return {
-            "titulo": "Resultados WHOQOL-BREF",
-            "items": items
-        }
-
-    # =========================================================
-    # 🟢 PANAS (CON MEDIA TEÓRICA + CLASIFICACIÓN)
-    # =========================================================
-    # =========================================================
-    # 🟢 PANAS (CON MEDIA TEÓRICA + CLASIFICACIÓN)
-    # =========================================================
-    elif cuestionario_codigo in ["PANAS"]:
-
-        respuestas = Respuesta.objects.filter(
-            sesion=session_obj
-        ).select_related("pregunta")
-
-        afecto_positivo = 0
-        afecto_negativo = 0
-
-        # 🔎 ÍNDICES CLÍNICOS REALES DEL PANAS
-        PANAS_POS_IDX = [1, 3, 5, 9, 10, 12, 14, 16, 17, 19]
-        PANAS_NEG_IDX = [2, 4, 6, 7, 8, 11, 13, 15, 18, 20]
-
-        for r in respuestas:
-            if r.valor_numerico is None:
-                continue
-
-            try:
-                valor = float(r.valor_numerico)
-            except (TypeError, ValueError):
-                continue
-
-            # Sumamos basándonos en si el orden de la pregunta está en la lista oficial
-            if r.pregunta.orden in PANAS_POS_IDX:
-                afecto_positivo += valor
-            elif r.pregunta.orden in PANAS_NEG_IDX:
-                afecto_negativo += valor
-
-        # 🔎 Clasificación clínica
-
-        # AP
-        if afecto_positivo < 25:
-            nivel_ap = "Bajo"
-        elif 30 <= afecto_positivo <= 35:
-            nivel_ap = "Normal"
-        elif afecto_positivo > 40:
-            nivel_ap = "Alto"
-        else:
-            nivel_ap = "Intermedio"
-
-        # AN
-        if afecto_negativo <= 20:
-            nivel_an = "Normal"
-        elif afecto_negativo > 25:
-            nivel_an = "Alto"
-        else:
-            nivel_an = "Elevado moderado"
-
-        items.append({"label": "Afecto Positivo (AP)", "value": afecto_positivo, "fmt": "float2"})
-        items.append({"label": "Nivel AP", "value": nivel_ap, "fmt": "text"})
-
-        items.append({"label": "Afecto Negativo (AN)", "value": afecto_negativo, "fmt": "float2"})
-        items.append({"label": "Nivel AN", "value": nivel_an, "fmt": "text"})
-
-        items.append({"label": "Media Teórica Total", "value": 60, "fmt": "float2"})
-
-        return {
-            "titulo": "Resultados PANAS",
-            "items": items
-        }
-
-    # =========================================================
-    # 🟢 CASO-A30
-    # =========================================================
-    elif cuestionario_codigo in ["CASO-A30", "CASO30", "CASO-A 30"]:
-
-        total, breakdown = compute_auto_sum_for_session(session_obj)
-
-        items.append({"label": "Suma Total", "value": breakdown.get("total"), "fmt": "float2"})
-        items.append({"label": "Promedio", "value": breakdown.get("avg"), "fmt": "float2"})
-
-        return {
-            "titulo": "Resultados CASO-A30",
-            "items": items
-        }
-
-    # =========================================================
-    # 🔵 MOTOR AUTOMÁTICO (RESTO)
-    # =========================================================
-    else:
-
-        total, breakdown = compute_auto_sum_for_session(session_obj)
-
-        items.append({"label": "Suma Total", "value": breakdown.get("total"), "fmt": "float2"})
-        items.append({"label": "Promedio", "value": breakdown.get("avg"), "fmt": "float2"})
-        items.append({"label": "Media teórica", "value": breakdown.get("media_teorica"), "fmt": "float2"})
-
-        return {
-            "titulo": f"Resultados del cuestionario — {cuestionario_codigo}",
-            "items": items
-        }
+    return resumen_sesion(session_obj)
 
 
 
@@ -907,7 +1236,7 @@ def score_summary_for_session(session_obj):
 def _get_numeric_by_codes_debug(session_id: int, codes: list[str]) -> dict[str, float]:
     qs = (
         Respuesta.objects
-        .select_related("pregunta", "opcion_seleccionada")
+        .select_related("pregunta")
         .filter(sesion_id=session_id, pregunta__codigo__in=codes)
     )
     out = {}
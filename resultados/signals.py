@@ -0,0 +1,35 @@
+# resultados/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from forms.models import SesionEvaluacion
+
+from .tasks import encolar_post_envio, programar_recalculo
+
+
+def _es_instrumento_ml(sesion) -> bool:
+    from .services import INSTRUMENT_CODES, _normalize_code
+
+    codigo = _normalize_code(getattr(sesion.cuestionario, "codigo", ""))
+    return any(codigo == _normalize_code(c) for codes in INSTRUMENT_CODES.values() for c in codes)
+
+
+@receiver(post_save, sender=SesionEvaluacion)
+def sesion_completada_recalcula(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Al quedar COMPLETADA una sesión (p. ej. en responder_evaluacion) encola
+    el pipeline post_envio en la misma transacción: calificación y, si es
+    PANAS / WHOQOL / CASO, features + predicción. Corre tras el commit y fuera
+    del hilo del request. Es el único punto que lo encola.
+    """
+    if raw or instance.estado != "COMPLETADA":
+        return
+    if update_fields is not None and "estado" not in update_fields:
+        return
+    encolar_post_envio(instance.pk)
+
+
+@receiver(post_delete, sender=SesionEvaluacion)
+def sesion_eliminada_recalcula(sender, instance, **kwargs):
+    if instance.estado == "COMPLETADA" and _es_instrumento_ml(instance):
+        programar_recalculo(instance.estudiante_id, solo_si_existe=True)
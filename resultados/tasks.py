@@ -0,0 +1,150 @@
+# resultados/tasks.py
+"""
+Trabajo diferido de resultados (fuera del hilo del request).
+
+- en_segundo_plano(fn, ...): ejecuta fn en un pool de hilos del proceso y
+  cierra la conexión a BD del hilo al terminar.
+- programar_recalculo(estudiante_id): tras el commit de la transacción actual,
+  refresca el feature store y la PrediccionRiesgo del estudiante.
+- encolar_post_envio(sesion_id): tarea durable (resultados.cola) que califica
+  la sesión COMPLETADA y refresca features + predicción (triage).
+- encolar_scoring_bulk(trabajo_id): tarea durable que ejecuta un
+  TrabajoScoring (calificación masiva); si el proceso muere la retoma
+  `procesar_cola` cuando vence el lease.
+
+settings:
+    RESULTADOS_TASKS_SYNC = True   -> ejecuta en línea (tests / depuración)
+    RESULTADOS_TASK_WORKERS = 2    -> hilos del pool
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+
+from .cola import encolar, renovar, tarea
+
+logger = logging.getLogger(__name__)
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Perezoso: se crea en el worker (después del fork de gunicorn), no al importar
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(getattr(settings, "RESULTADOS_TASK_WORKERS", 2)),
+                    thread_name_prefix="resultados",
+                )
+    return _executor
+
+
+def _run(fn, *args, **kwargs):
+    close_old_connections()
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        logger.exception("Tarea en segundo plano %s falló", getattr(fn, "__name__", fn))
+    finally:
+        connection.close()
+
+
+def en_segundo_plano(fn, *args, **kwargs) -> Future | None:
+    if getattr(settings, "RESULTADOS_TASKS_SYNC", False):
+        try:
+            fn(*args, **kwargs)
+        except Exception:
+            logger.exception("Tarea %s falló", getattr(fn, "__name__", fn))
+        return None
+    return _get_executor().submit(_run, fn, *args, **kwargs)
+
+
+# ============================================================
+# Tareas
+# ============================================================
+
+def recalcular_estudiante(estudiante_id: int, solo_si_existe: bool = False):
+    """Feature store + PrediccionRiesgo de un estudiante."""
+    from .models import FeatureEstudiante
+    from .services import actualizar_predicciones_bulk, refrescar_feature_store
+
+    # Si se borró el Perfil completo, su fila del store ya no existe: no recrearla
+    if solo_si_existe and not FeatureEstudiante.objects.filter(estudiante_id=estudiante_id).exists():
+        return None
+
+    try:
+        refrescar_feature_store([estudiante_id])
+    except IntegrityError:
+        # Otra tarea creó la fila al mismo tiempo: ahora es un UPDATE
+        refrescar_feature_store([estudiante_id])
+
+    return actualizar_predicciones_bulk([estudiante_id])
+
+
+@tarea("post_envio")
+def post_envio(sesion_id: int):
+    """
+    Pipeline tras el envío de una sesión: CalificacionSesion automática y,
+    si es PANAS / WHOQOL / CASO, features + PrediccionRiesgo del estudiante
+    (de ahí sale la urgencia del triage). Idempotente: se puede reintentar.
+    """
+    from forms.models import CalificacionSesion, SesionEvaluacion
+    from forms.services.scoring import compute_score_for_session
+    from forms.services.scoring_plan import compactar_detalle, get_scoring_plan
+
+    from .signals import _es_instrumento_ml
+
+    sesion = (
+        SesionEvaluacion.objects.select_related("cuestionario")
+        .filter(pk=sesion_id, estado="COMPLETADA")
+        .first()
+    )
+    if sesion is None:
+        return None  # se borró o se reabrió
+
+    total, detalle = compute_score_for_session(sesion)
+    plan = get_scoring_plan(sesion.cuestionario)
+    CalificacionSesion.objects.update_or_create(
+        sesion=sesion,
+        profile=None,  # scoring automático por config
+        defaults={
+            "total": total,
+            "detalle": compactar_detalle(detalle, plan),
+            "config_hash": plan.hash_scoring,
+        },
+    )
+
+    if _es_instrumento_ml(sesion):
+        recalcular_estudiante(sesion.estudiante_id)
+
+
+def encolar_post_envio(sesion_id: int):
+    """Encola post_envio en la transacción actual (una tarea viva por sesión)."""
+    encolar("post_envio", f"post_envio:{sesion_id}", {"sesion_id": sesion_id})
+
+
+@tarea("scoring_bulk")
+def scoring_bulk(trabajo_id: int):
+    """Ejecuta el TrabajoScoring; renueva el lease tras cada chunk."""
+    from forms.services.scoring_bulk import ejecutar_trabajo
+
+    ejecutar_trabajo(trabajo_id, al_avanzar=lambda: renovar(f"scoring_bulk:{trabajo_id}"))
+
+
+def encolar_scoring_bulk(trabajo_id: int):
+    """Encola el TrabajoScoring en la transacción actual."""
+    encolar("scoring_bulk", f"scoring_bulk:{trabajo_id}", {"trabajo_id": trabajo_id}, max_intentos=3)
+
+
+def programar_recalculo(estudiante_id: int, solo_si_existe: bool = False):
+    """Agenda recalcular_estudiante para después del commit actual."""
+    transaction.on_commit(
+        lambda: en_segundo_plano(recalcular_estudiante, estudiante_id, solo_si_existe=solo_si_existe)
+    )
@@ -1,3 +1,722 @@
-from django.test import TestCase
+import joblib
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
 
-# Create your tests here.
+from resultados.ml_compiled import (
+    COMPILED_BUNDLE_PATH,
+    SOURCE_BUNDLE_PATH,
+    CompiledModel,
+    file_sha256,
+    predict_proba_matrix,
+)
+from resultados.ml_registry import ModelRegistry
+
+
+class CompiledModelParityTests(SimpleTestCase):
+    """El modelo compilado (NumPy) debe reproducir el Pipeline de sklearn."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.bundle = joblib.load(SOURCE_BUNDLE_PATH)
+        cls.compiled = CompiledModel.from_bundle(cls.bundle)
+        cls.feature_cols = cls.bundle["feature_cols"]
+
+    def _random_inputs(self, n=500, nan_rate=0.1):
+        rng = np.random.default_rng(0)
+        X = self.compiled.mean + rng.normal(size=(n, len(self.feature_cols))) * self.compiled.scale * 3
+        X[rng.random(X.shape) < nan_rate] = np.nan
+        return X
+
+    def test_predict_proba_matches_sklearn(self):
+        X = self._random_inputs()
+        expected = predict_proba_matrix(self.bundle["model"], self.feature_cols, X)
+        got = self.compiled.predict_proba(X)[:, 1]
+        np.testing.assert_allclose(got, expected, rtol=0, atol=1e-12)
+
+    def test_transform_matches_pipeline_preprocessing(self):
+        import pandas as pd
+
+        X = self._random_inputs(n=50)
+        expected = self.bundle["model"][:-1].transform(pd.DataFrame(X, columns=self.feature_cols))
+        np.testing.assert_allclose(self.compiled.transform(X), expected, rtol=0, atol=1e-12)
+
+    def test_save_load_roundtrip(self):
+        import tempfile
+        from pathlib import Path
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "modelo.npz"
+            self.compiled.save(path)
+            loaded = CompiledModel.load(path)
+
+        X = self._random_inputs(n=20)
+        np.testing.assert_array_equal(loaded.predict_proba(X), self.compiled.predict_proba(X))
+        self.assertEqual(loaded.feature_cols, self.feature_cols)
+        self.assertEqual(loaded.thresholds, self.bundle["thresholds"])
+
+    def test_shipped_artifact_matches_pkl(self):
+        # Misma ruta que en producción: el registro solo usa el .npz si corresponde al .pkl
+        entry = ModelRegistry().get()
+        self.assertTrue(entry.compiled, f"{COMPILED_BUNDLE_PATH} no corresponde al .pkl; corre compilar_modelo")
+        self.assertEqual(entry.bundle["model"].meta["source_sha256"], file_sha256(SOURCE_BUNDLE_PATH))
+
+
+class ModelRegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from pathlib import Path
+
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.pkl = self.tmp / "bundle.pkl"
+        self.npz = self.tmp / "bundle.npz"
+        shutil.copy(SOURCE_BUNDLE_PATH, self.pkl)
+        shutil.copy(COMPILED_BUNDLE_PATH, self.npz)
+
+    def _registry(self, **extra):
+        from unittest import mock
+
+        from resultados import ml_registry
+
+        # Sin espera entre revisiones de mtime
+        self.enterContext(mock.patch.object(ml_registry, "RELOAD_CHECK_SECONDS", 0))
+        return ModelRegistry({"tamizaje": {"path": self.pkl, "compiled": self.npz, **extra}})
+
+    def test_version_from_content_hash_and_compiled_model(self):
+        reg = self._registry()
+        entry = reg.get()
+        sha = file_sha256(self.pkl)
+        self.assertEqual(entry.version, f"tamizaje@{sha[:12]}")
+        self.assertEqual(entry.bundle["version"], entry.version)
+        self.assertTrue(entry.compiled)
+        self.assertIs(reg.get(), entry)
+
+    def test_hot_reload_when_file_changes(self):
+        import os
+
+        reg = self._registry()
+        first = reg.get()
+
+        bundle = joblib.load(self.pkl)
+        bundle["meta"] = {**bundle["meta"], "notes": "nuevo modelo"}
+        joblib.dump(bundle, self.pkl)
+        st = os.stat(self.pkl)
+        os.utime(self.pkl, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        second = reg.get()
+        self.assertNotEqual(first.version, second.version)
+        # El .npz ya no corresponde al .pkl -> cae a sklearn
+        self.assertFalse(second.compiled)
+        self.assertEqual(sorted(reg.versions()), sorted([first.version, second.version]))
+        self.assertIs(reg.get(version=first.version), first)
+
+    def _tocar(self, path, contenido: bytes | None = None, segundos: int = 1):
+        import os
+
+        if contenido is not None:
+            path.write_bytes(contenido)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + segundos * 10**9))
+
+    def test_corrupt_reload_keeps_current_and_is_not_retried(self):
+        from unittest import mock
+
+        reg = self._registry()
+        first = reg.get()
+
+        self._tocar(self.pkl, b"a medio escribir")
+        with mock.patch.object(reg, "_load", wraps=reg._load) as load:
+            self.assertIs(reg.get(), first)
+            self.assertIs(reg.get(), first)  # misma firma rota: no se vuelve a cargar
+        self.assertEqual(load.call_count, 1)
+
+        # .npz ilegible: cae al .pkl en vez de fallar
+        self._tocar(self.npz, b"no es npz")
+        entry = ModelRegistry({"tamizaje": {"path": SOURCE_BUNDLE_PATH, "compiled": self.npz}}).get()
+        self.assertFalse(entry.compiled)
+
+    def test_old_versions_are_pruned(self):
+        from unittest import mock
+
+        from resultados import ml_registry
+
+        self.enterContext(mock.patch.object(ml_registry, "MAX_VERSIONS", 2))
+        reg = self._registry()
+        bundle = joblib.load(self.pkl)
+        versiones = [reg.get().version]
+        for i in range(1, 4):
+            bundle["meta"] = {**bundle["meta"], "notes": f"modelo {i}"}
+            joblib.dump(bundle, self.pkl)
+            self._tocar(self.pkl, segundos=i)
+            versiones.append(reg.get().version)
+
+        self.assertEqual(len(set(versiones)), 4)
+        self.assertEqual(reg.versions(), versiones[-2:])
+
+    def test_expected_hash_mismatch_is_not_loaded(self):
+        reg = self._registry(sha256="0" * 64)
+        self.assertIsNone(reg.get())
+
+
+def _crear_sesiones_instrumentos(perfil, n_sesiones=2):
+    """PANAS, WHO-QOL y CASO-A30 con `n_sesiones` sesiones COMPLETADAS cada uno."""
+    from django.utils import timezone
+
+    from forms.models import Cuestionario, Pregunta, Respuesta, SesionEvaluacion
+
+    # (código, nº ítems, prefijo de Pregunta.codigo; vacío -> fallback por orden)
+    for codigo, n_items, prefix in [("PANAS", 20, "PANAS_"), ("WHO-QOL", 26, ""), ("CASO-A30", 30, "CASO_")]:
+        cu = Cuestionario.objects.create(codigo=codigo, nombre=codigo, estado="published")
+        preguntas = [
+            Pregunta.objects.create(
+                cuestionario=cu, texto=f"{codigo} {i}", tipo_respuesta="ESCALA", orden=i,
+                codigo=f"{prefix}{i:02d}" if prefix else "",
+            )
+            for i in range(1, n_items + 1)
+        ]
+        for k in range(n_sesiones):
+            s = SesionEvaluacion.objects.create(
+                cuestionario=cu, estudiante=perfil, estado="COMPLETADA",
+                fecha_fin=timezone.now() - timezone.timedelta(days=3 * (n_sesiones - 1 - k)),
+            )
+            Respuesta.objects.bulk_create([
+                Respuesta(sesion=s, pregunta=p, valor_numerico=(p.orden + k) % 5 + 1)
+                for p in preguntas
+            ])
+
+
+class BuildFeaturesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Usuario
+
+        cls.perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        _crear_sesiones_instrumentos(cls.perfil)
+
+    def test_matches_per_instrument_builders(self):
+        from resultados.services import (
+            _build_caso_features,
+            _build_panas_features,
+            _build_whoqol_features,
+            build_features,
+        )
+
+        expected = {
+            **_build_panas_features(self.perfil),
+            **_build_whoqol_features(self.perfil),
+            **_build_caso_features(self.perfil),
+        }
+        feats_all, feats_ml = build_features(self.perfil)
+        self.assertEqual(feats_all, expected)
+        self.assertTrue(all(v is not None for v in feats_ml.values()))
+
+    def test_constant_number_of_queries(self):
+        from resultados.services import build_features
+
+        build_features(self.perfil)  # carga el bundle fuera de la medición
+        with self.assertNumQueries(2):
+            build_features(self.perfil)
+
+    def test_bulk_matches_per_student_with_constant_queries(self):
+        from forms.models import Usuario
+        from resultados.services import (
+            _build_caso_features,
+            _build_panas_features,
+            _build_whoqol_features,
+            build_features_bulk,
+        )
+
+        from forms.models import Cuestionario, Respuesta, SesionEvaluacion
+
+        # Otro estudiante con respuestas distintas en los mismos cuestionarios
+        otro = Usuario.objects.create(username="est2", rol="ESTUDIANTE").perfil
+        for cu in Cuestionario.objects.all():
+            s = SesionEvaluacion.objects.create(cuestionario=cu, estudiante=otro, estado="COMPLETADA")
+            Respuesta.objects.bulk_create([
+                Respuesta(sesion=s, pregunta=p, valor_numerico=(p.orden * 3) % 5 + 1)
+                for p in cu.preguntas.all()
+            ])
+        vacio = Usuario.objects.create(username="est3", rol="ESTUDIANTE").perfil
+        perfiles = [self.perfil, otro, vacio]
+
+        with self.assertNumQueries(2):
+            bulk = build_features_bulk([p.pk for p in perfiles])
+        for p in perfiles:
+            esperado = {**_build_panas_features(p), **_build_whoqol_features(p), **_build_caso_features(p)}
+            self.assertEqual(bulk[p.pk], esperado)
+
+        # Las consultas no crecen con la cohorte
+        with self.assertNumQueries(2):
+            build_features_bulk([self.perfil.pk])
+
+
+class ScoreSummaryEngineTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import SesionEvaluacion, Usuario
+
+        cls.perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        _crear_sesiones_instrumentos(cls.perfil, n_sesiones=1)
+        cls.sesiones = {
+            s.cuestionario.codigo: s for s in SesionEvaluacion.objects.select_related("cuestionario")
+        }
+
+    def test_dispatch_by_code_and_single_answers_query(self):
+        from resultados.services import score_summary_for_session
+
+        esperado = {
+            "PANAS": "Resultados PANAS",
+            "WHO-QOL": "Resultados WHOQOL-BREF",
+            "CASO-A30": "Resultados CASO-A30",
+        }
+        for codigo, titulo in esperado.items():
+            s = self.sesiones[codigo]
+            score_summary_for_session(s)  # compila el plan fuera de la medición
+            with self.assertNumQueries(2):  # engine del perfil + respuestas
+                resumen = score_summary_for_session(s)
+            self.assertEqual(resumen["titulo"], titulo)
+
+        items = {i["label"]: i["value"] for i in score_summary_for_session(self.sesiones["PANAS"])["items"]}
+        self.assertEqual(items["Afecto Positivo (AP)"], sum((i % 5) + 1 for i in [1, 3, 5, 9, 10, 12, 14, 16, 17, 19]))
+
+    def test_profile_engine_overrides_code(self):
+        from forms.models import ScoringProfile
+        from resultados.motores import MOTORES, registrar_motor
+        from resultados.services import score_summary_for_session
+
+        s = self.sesiones["CASO-A30"]
+        perfil = ScoringProfile.objects.create(cuestionario=s.cuestionario, nombre="Auto", engine="AUTO")
+        self.assertEqual(score_summary_for_session(s)["titulo"], "Resultados CASO-A30")
+
+        perfil.engine = "PANAS"
+        perfil.save()
+        self.assertEqual(score_summary_for_session(s)["titulo"], "Resultados PANAS")
+
+        self.addCleanup(MOTORES.__setitem__, "PANAS", MOTORES["PANAS"])
+        registrar_motor("PANAS")(lambda sesion, vector: {"titulo": "propio", "items": len(vector.rows)})
+        self.assertEqual(score_summary_for_session(s), {"titulo": "propio", "items": 30})
+
+
+@override_settings(RESULTADOS_TASKS_SYNC=True)
+class FeatureStoreTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Usuario
+
+        cls.perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        cls.vacio = Usuario.objects.create(username="est2", rol="ESTUDIANTE").perfil
+        _crear_sesiones_instrumentos(cls.perfil)
+
+    def test_store_roundtrip_matches_build_features_bulk(self):
+        from resultados.models import FeatureEstudiante
+        from resultados.services import build_features_bulk, features_estudiantes
+
+        ids = [self.perfil.pk, self.vacio.pk]
+        expected = build_features_bulk(ids)
+        self.assertEqual(features_estudiantes(ids), expected)  # calcula y guarda
+        self.assertEqual(FeatureEstudiante.objects.count(), 2)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(features_estudiantes(ids), expected)  # solo lectura
+
+    def test_completed_session_refreshes_store(self):
+        from forms.models import SesionEvaluacion
+        from resultados.models import FeatureEstudiante
+        from resultados.services import build_features_bulk, refrescar_feature_store
+
+        refrescar_feature_store([self.perfil.pk])
+        ultima = SesionEvaluacion.objects.filter(
+            estudiante=self.perfil, cuestionario__codigo="PANAS"
+        ).latest("fecha_fin")
+
+        # Se invalida la sesión más reciente -> el store debe volver a la anterior
+        ultima.estado = "EN_CURSO"
+        ultima.save()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ultima.estado = "COMPLETADA"
+            ultima.fecha_fin = ultima.fecha_fin.replace(year=2000)
+            ultima.save()
+        self.assertEqual(len(callbacks), 1)
+
+        fe = FeatureEstudiante.objects.get(estudiante=self.perfil)
+        self.assertNotEqual(fe.panas_sesion_id, ultima.pk)
+        self.assertEqual(fe.x_panas_positivo, build_features_bulk([self.perfil.pk])[self.perfil.pk]["X_PANAS_Positivo"])
+
+    def test_non_ml_session_is_scored_without_refresh(self):
+        from forms.models import CalificacionSesion, Cuestionario, SesionEvaluacion
+        from resultados.models import FeatureEstudiante, PrediccionRiesgo
+
+        cu = Cuestionario.objects.create(codigo="OTRO", nombre="Otro", estado="published")
+        with self.captureOnCommitCallbacks(execute=True):
+            sesion = SesionEvaluacion.objects.create(cuestionario=cu, estudiante=self.perfil, estado="COMPLETADA")
+        self.assertTrue(CalificacionSesion.objects.filter(sesion=sesion, profile=None).exists())
+        self.assertFalse(FeatureEstudiante.objects.exists())
+        self.assertFalse(PrediccionRiesgo.objects.exists())
+
+    def test_completed_session_refreshes_prediction(self):
+        from forms.models import SesionEvaluacion
+        from resultados.models import PrediccionRiesgo
+
+        ultima = SesionEvaluacion.objects.filter(
+            estudiante=self.perfil, cuestionario__codigo="CASO-A30"
+        ).latest("fecha_fin")
+        ultima.estado = "EN_CURSO"
+        ultima.save()
+        self.assertFalse(PrediccionRiesgo.objects.filter(estudiante=self.perfil).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ultima.estado = "COMPLETADA"
+            ultima.save(update_fields=["estado"])
+
+        pred = PrediccionRiesgo.objects.get(estudiante=self.perfil)
+        self.assertIsNotNone(pred.probabilidad)
+        self.assertEqual(pred.features["CASO_SESSION_ID"], ultima.pk)
+
+
+@override_settings(RESULTADOS_TASKS_SYNC=True)
+class ExplicacionPersistidaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Usuario
+
+        cls.perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        _crear_sesiones_instrumentos(cls.perfil)
+
+    def test_explanation_stored_with_prediction(self):
+        from resultados.services import _load_bundle, actualizar_prediccion_estudiante, build_ml_explanation
+
+        pred = actualizar_prediccion_estudiante(self.perfil)
+        pred.refresh_from_db()
+        self.assertEqual(pred.explicacion_version, _load_bundle()["version"])
+        self.assertIn("narrative", pred.explicacion)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(build_ml_explanation(pred), pred.explicacion)
+
+    def test_explanation_recomputed_when_model_version_changes(self):
+        from resultados.models import PrediccionRiesgo
+        from resultados.services import _load_bundle, actualizar_prediccion_estudiante, build_ml_explanation
+
+        pred = actualizar_prediccion_estudiante(self.perfil)
+        esperado = pred.explicacion
+        PrediccionRiesgo.objects.filter(pk=pred.pk).update(explicacion={"viejo": True}, explicacion_version="tamizaje@000000000000")
+        pred.refresh_from_db()
+
+        self.assertEqual(build_ml_explanation(pred), esperado)
+        pred.refresh_from_db()
+        self.assertEqual(pred.explicacion_version, _load_bundle()["version"])
+
+
+@override_settings(RESULTADOS_TASKS_SYNC=True)
+class RecalcularPrediccionesCommandTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Usuario
+
+        cls.perfiles = [
+            Usuario.objects.create(username=f"est{i}", rol="ESTUDIANTE").perfil for i in range(3)
+        ]
+        _crear_sesiones_instrumentos(cls.perfiles[0])
+
+    def _call(self, *args):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command("recalcular_predicciones", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_changes_without_writing(self):
+        from resultados.models import PrediccionRiesgo
+
+        PrediccionRiesgo.objects.create(estudiante=self.perfiles[0], nivel="BAJO", probabilidad=0.01)
+        out = self._call("--dry-run")
+
+        self.assertIn("cambios de nivel: 1", out)
+        self.assertEqual(PrediccionRiesgo.objects.count(), 1)
+        self.assertEqual(PrediccionRiesgo.objects.get().nivel, "BAJO")
+
+    def test_checkpoint_resumes_pending_chunks(self):
+        import json
+        import tempfile
+        from pathlib import Path
+
+        from resultados.ml_registry import registry
+        from resultados.models import PrediccionRiesgo
+
+        ids = sorted(p.pk for p in self.perfiles)
+        with tempfile.TemporaryDirectory() as tmp:
+            ck = Path(tmp) / "avance.json"
+            ck.write_text(json.dumps({
+                "formato": 2,
+                "modelo_version": registry.current_version(),
+                "chunk_size": 1,
+                "ids": None,
+                "refrescar_features": False,
+                "completados": ids[:2],
+                "stats": {"procesados": 2},
+            }))
+            out = self._call("--chunk-size", "1", "--checkpoint", str(ck))
+            self.assertFalse(ck.exists())
+
+        self.assertIn("2 ya procesados, 1 pendientes", out)
+        self.assertEqual(list(PrediccionRiesgo.objects.values_list("estudiante_id", flat=True)), ids[2:])
+
+    def test_checkpoint_tracks_exact_ids_and_refuses_other_selection(self):
+        import json
+        import tempfile
+        from pathlib import Path
+
+        from django.core.management.base import CommandError
+
+        from resultados.ml_registry import registry
+        from resultados.models import PrediccionRiesgo
+
+        ids = sorted(p.pk for p in self.perfiles)
+        with tempfile.TemporaryDirectory() as tmp:
+            ck = Path(tmp) / "avance.json"
+            cabecera = {
+                "formato": 2, "modelo_version": registry.current_version(), "chunk_size": 1,
+                "ids": None, "refrescar_features": False, "completados": ids[:1], "stats": {},
+            }
+            ck.write_text(json.dumps({**cabecera, "ids": ids[:2]}))
+            with self.assertRaisesMessage(CommandError, "es de otra corrida"):
+                self._call("--checkpoint", str(ck))
+            with self.assertRaisesMessage(CommandError, "es de otra corrida"):
+                self._call("--ids", *map(str, ids[:2]), "--refrescar-features", "--checkpoint", str(ck))
+
+            # Con otro chunk_size, el chunk que empieza en ids[0] también tiene ids[1]: no se salta
+            ck.write_text(json.dumps(cabecera))
+            out = self._call("--chunk-size", "2", "--checkpoint", str(ck))
+
+        self.assertIn("1 ya procesados, 2 pendientes", out)
+        self.assertEqual(
+            sorted(PrediccionRiesgo.objects.values_list("estudiante_id", flat=True)), ids[1:],
+        )
+
+
+class ReclasificarNivelesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Usuario
+        from resultados.models import PrediccionRiesgo
+
+        for i, p in enumerate([None, 0.1, 0.5, 0.9]):
+            perfil = Usuario.objects.create(username=f"est{i}", rol="ESTUDIANTE").perfil
+            PrediccionRiesgo.objects.create(
+                estudiante=perfil, probabilidad=p, nivel="SIN_DATOS" if p is None else "BAJO",
+                explicacion={"narrative": "x"}, explicacion_version="tamizaje@abc",
+            )
+
+    def test_single_update_with_case(self):
+        from resultados.models import PrediccionRiesgo
+        from resultados.services import _nivel_por_prob, reclasificar_niveles
+
+        with self.settings(RESULTADOS_ML_THRESHOLDS={"thr_medio": 0.3, "thr_alto": 0.8}), self.assertNumQueries(1):
+            n = reclasificar_niveles(thr_medio=0.3, thr_alto=0.8)
+
+        self.assertEqual(n, 3)
+        for pred in PrediccionRiesgo.objects.all():
+            self.assertEqual(pred.nivel, _nivel_por_prob(pred.probabilidad, 0.3, 0.8))
+            if pred.probabilidad is not None:
+                self.assertEqual((pred.umbral_medio, pred.umbral_alto), (0.3, 0.8))
+                self.assertEqual(pred.explicacion_version, "")
+
+    def test_cli_thresholds_must_match_settings(self):
+        from io import StringIO
+
+        from django.core.management import CommandError, call_command
+        from resultados.models import PrediccionRiesgo
+
+        with self.settings(RESULTADOS_ML_THRESHOLDS={"thr_medio": 0.3, "thr_alto": 0.8}):
+            with self.assertRaisesMessage(CommandError, "RESULTADOS_ML_THRESHOLDS"):
+                call_command("reclasificar_niveles", thr_medio=0.2, stdout=StringIO())
+        self.assertFalse(PrediccionRiesgo.objects.filter(umbral_medio=0.2).exists())
+
+    def test_settings_override_thresholds(self):
+        from resultados.models import PrediccionRiesgo
+        from resultados.services import reclasificar_niveles
+
+        with self.settings(RESULTADOS_ML_THRESHOLDS={"thr_medio": 0.05, "thr_alto": 0.95}):
+            reclasificar_niveles()
+        self.assertEqual(
+            sorted(PrediccionRiesgo.objects.values_list("nivel", flat=True)),
+            ["MODERADO", "MODERADO", "MODERADO", "SIN_DATOS"],
+        )
+
+
+class BenchmarkScoringTests(TestCase):
+
+    def test_report_and_comparison(self):
+        from resultados.benchmark import comparar, ejecutar_benchmark
+
+        reporte = ejecutar_benchmark(n_estudiantes=3, repeticiones=1)
+        self.assertEqual(reporte["estudiantes"], 3)
+        por_ruta = {(r["ruta"], r["instrumento"]): r for r in reporte["resultados"]}
+        self.assertEqual(len(por_ruta), 14)
+
+        self.assertEqual(por_ruta[("compute_auto_sum_for_session", "WHOQOL")]["consultas_por_sesion"], 1)
+        self.assertEqual(por_ruta[("score_summary_for_session", "CASO")]["consultas_por_sesion"], 2)
+        self.assertEqual(por_ruta[("build_features_bulk", "TODOS")]["consultas"], 2)
+        self.assertTrue(all(r["sesiones_por_segundo"] > 0 for r in reporte["resultados"]))
+
+        self.assertFalse(any(c["regresion"] for c in comparar(reporte, reporte)))
+        lento = {**reporte, "resultados": [
+            {**r, "sesiones_por_segundo": r["sesiones_por_segundo"] / 2} for r in reporte["resultados"]
+        ]}
+        self.assertTrue(all(c["regresion"] for c in comparar(reporte, lento)))
+
+
+@override_settings(RESULTADOS_TASKS_SYNC=True)
+class ColaTareasTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from forms.models import Usuario
+
+        from resultados.models import TareaCola
+
+        cls.perfil = Usuario.objects.create(username="est1", rol="ESTUDIANTE").perfil
+        _crear_sesiones_instrumentos(cls.perfil, n_sesiones=1)
+        TareaCola.objects.all().delete()  # las encoló la señal al crear las sesiones
+
+    def _tarea_temporal(self, tipo, fn):
+        from resultados.cola import TAREAS, tarea
+
+        tarea(tipo)(fn)
+        self.addCleanup(TAREAS.pop, tipo)
+
+    def test_post_envio_runs_once_per_session_after_commit(self):
+        from forms.models import CalificacionSesion, SesionEvaluacion
+        from resultados.models import PrediccionRiesgo, TareaCola
+        from resultados.tasks import encolar_post_envio
+
+        sesion = SesionEvaluacion.objects.get(estudiante=self.perfil, cuestionario__codigo="CASO-A30")
+        SesionEvaluacion.objects.filter(pk=sesion.pk).update(estado="EN_CURSO")
+
+        # Como responder_evaluacion: la señal encola; otro encolado no duplica
+        with self.captureOnCommitCallbacks(execute=True):
+            sesion.estado = "COMPLETADA"
+            sesion.save(update_fields=["estado"])
+            encolar_post_envio(sesion.pk)
+            self.assertFalse(CalificacionSesion.objects.filter(sesion=sesion).exists())
+
+        tarea = TareaCola.objects.get()
+        self.assertEqual((tarea.clave, tarea.estado, tarea.intentos), (f"post_envio:{sesion.pk}", "COMPLETADO", 1))
+        self.assertEqual(CalificacionSesion.objects.filter(sesion=sesion, profile=None).count(), 1)
+        self.assertEqual(PrediccionRiesgo.objects.get(estudiante=self.perfil).features["CASO_SESSION_ID"], sesion.pk)
+
+        # Terminada se vuelve a armar; re-ejecutarla no duplica resultados
+        with self.captureOnCommitCallbacks(execute=True):
+            encolar_post_envio(sesion.pk)
+        self.assertEqual(TareaCola.objects.get().intentos, 1)
+        self.assertEqual(CalificacionSesion.objects.filter(sesion=sesion).count(), 1)
+
+    def test_retries_with_backoff_then_error(self):
+        from django.utils import timezone
+
+        from resultados.cola import encolar, procesar_pendientes
+        from resultados.models import TareaCola
+
+        def falla():
+            raise ValueError("sin conexión")
+
+        self._tarea_temporal("falla", falla)
+        with self.captureOnCommitCallbacks(execute=True):
+            encolar("falla", "falla:1", max_intentos=2)
+
+        tarea = TareaCola.objects.get()
+        self.assertEqual((tarea.estado, tarea.intentos), ("PENDIENTE", 1))
+        self.assertGreater(tarea.disponible_en, timezone.now())
+        self.assertIn("sin conexión", tarea.error)
+        self.assertEqual(procesar_pendientes()["fallidas"], 0)  # aún en backoff
+
+        TareaCola.objects.update(disponible_en=timezone.now())
+        self.assertEqual(procesar_pendientes()["fallidas"], 1)
+        tarea.refresh_from_db()
+        self.assertEqual((tarea.estado, tarea.intentos), ("ERROR", 2))
+
+    def test_worker_reclaims_expired_lease(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        from resultados.models import TareaCola
+
+        hechas = []
+        self._tarea_temporal("marca", lambda n: hechas.append(n))
+        TareaCola.objects.create(
+            tipo="marca", clave="marca:1", payload={"n": 1}, estado="EN_CURSO", intentos=1,
+            bloqueado_hasta=timezone.now() - timezone.timedelta(seconds=1),
+        )
+        TareaCola.objects.create(
+            tipo="marca", clave="marca:2", payload={"n": 2}, estado="EN_CURSO", intentos=1,
+            bloqueado_hasta=timezone.now() + timezone.timedelta(minutes=5),
+        )
+
+        out = StringIO()
+        call_command("procesar_cola", "--una-vez", stdout=out)
+        self.assertIn("ok: 1", out.getvalue())
+        self.assertEqual(hechas, [1])
+        self.assertEqual(TareaCola.objects.get(clave="marca:1").estado, "COMPLETADO")
+
+    def test_enqueue_while_running_runs_again(self):
+        from resultados.cola import encolar, procesar_clave
+        from resultados.models import TareaCola
+
+        vistos = []
+
+        def lee(n):
+            vistos.append(n)
+            if len(vistos) == 1:
+                encolar("lee", "lee:1", {"n": 2})  # llega un cambio mientras corre
+
+        self._tarea_temporal("lee", lee)
+        encolar("lee", "lee:1", {"n": 1})
+        self.assertTrue(procesar_clave("lee:1"))
+
+        self.assertEqual(vistos, [1, 2])
+        tarea = TareaCola.objects.get()
+        self.assertEqual((tarea.estado, tarea.repetir), ("COMPLETADO", False))
+
+
+class ImportTimeBudgetTests(SimpleTestCase):
+    """Arrancar un worker (importar el URLconf) no debe cargar la pila de ML pesada."""
+
+    PROHIBIDOS = {"pandas", "sklearn", "joblib", "scipy"}
+
+    def test_urlconf_does_not_import_heavy_ml_libraries(self):
+        import os
+        import subprocess
+        import sys
+
+        from django.conf import settings
+
+        code = "import django; django.setup(); import importlib; importlib.import_module(%r)" % settings.ROOT_URLCONF
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True, text=True, env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+            cwd=settings.BASE_DIR,
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr[-2000:])
+
+        # "import time: self [us] | cumulative | imported package"
+        cargados = set()
+        for line in proc.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                nombre = line.rsplit("|", 1)[1].strip()
+                cargados.add(nombre.split(".", 1)[0])
+
+        self.assertIn("dashboard", cargados)
+        self.assertFalse(cargados & self.PROHIBIDOS, sorted(cargados & self.PROHIBIDOS))
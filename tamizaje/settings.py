@@ -199,6 +199,12 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cache compartido entre workers de gunicorn: responder_evaluacion invalida las
+# preguntas cacheadas con un token en este cache (forms.services.preguntas).
+# Sin CACHE_URL se usa LocMem (uno por proceso) y las preguntas solo se
+# cachean 30 s. Ej.: CACHE_URL=dbcache://tamizaje_cache (+ manage.py createcachetable)
+CACHES = {'default': env.cache('CACHE_URL', default='locmemcache://')}
 # === Auth redirects ===
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/redirect/'
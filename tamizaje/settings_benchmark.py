@@ -0,0 +1,14 @@
+# tamizaje/settings_benchmark.py
+# Settings para `manage.py benchmark_scoring`: misma app, BD SQLite en memoria
+# (los datos sintéticos nunca tocan la BD real).
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+# Tareas de segundo plano en el mismo hilo: la BD en memoria es por conexión
+RESULTADOS_TASKS_SYNC = True